@@ -0,0 +1,277 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+
+import load_dataset_module
+import profiling_module
+import recommend_module
+import similarity_engine_module
+import similarity_module
+from engine_module import RecommendationEngine
+
+# Queries are sent to the workers in chunks, to amortise the cost of handing them over
+DEFAULT_CHUNK_SIZE = 16
+
+# The number of chunks in flight or waiting to be written, per worker: bounds memory while keeping every worker busy
+CHUNKS_IN_FLIGHT = 4
+
+# The dataset every query of this process runs against (set in the parent, inherited or loaded by workers)
+_dataset = None
+
+
+def recommend_query(dataset, query):
+    """
+    Recommend books for a user ('user'), or books similar to a book ('isbn').
+    """
+    n = int(query.get('n', 10))
+    if query.get('user') is not None:
+        return [{'isbn': isbn, 'predicted_rating': predicted}
+                for isbn, predicted in recommend_module.recommend_for_user(str(query['user']), n, dataset.users)]
+
+    store = dataset.store.select(query.get('ratings', 'all'))
+    item = store.items.get(str(query['isbn']))
+    if item is None:
+        return []
+    ranked = similarity_engine_module.top_similar_items(store, item, n, query.get('metric', 'euclidean'),
+                                                        float(query.get('p', 1)),
+                                                        min_support=int(query.get('min_support', 1)))
+    return [{'isbn': store.items.name(other), 'score': score} for other, score in ranked]
+
+
+def similarity_query(dataset, query):
+    """
+    Compare two books or two users ('kind') on one metric, or on every metric ('all').
+    """
+    data = dataset.users if query.get('kind', 'books') == 'users' else dataset.books
+    value, explanation = similarity_module.compare_pair(str(query['id1']), str(query['id2']), data,
+                                                        query.get('metric', 'all'), float(query.get('p', 1)),
+                                                        query.get('ratings', 'all'))
+    return {'value': value, 'explanation': explanation}
+
+
+def top_books_query(dataset, query):
+    top = load_dataset_module.n_top_books(int(query.get('n', 10)), dataset.books, verbose=False)
+    return [{'isbn': isbn, 'title': details['title'], 'author': details['author'], 'year': details['year']}
+            for isbn, details in top]
+
+
+def top_users_query(dataset, query):
+    top = load_dataset_module.n_top_users(int(query.get('n', 10)), dataset.users, verbose=False)
+    return [{'user_id': user_id, 'ratings': count} for user_id, count in top]
+
+
+# Query operation -> function(dataset, query) returning a JSON-serialisable result
+OPERATIONS = {
+    'recommend': recommend_query,
+    'similarity': similarity_query,
+    'top-books': top_books_query,
+    'top-users': top_users_query
+}
+
+
+def run_query(dataset, index, query):
+    """
+    Run one query and return its output record.
+
+    Parameters:
+    - dataset (Dataset): The dataset to query.
+    - index (int): The position of the query in the input, reported as 'index'.
+    - query (dict): The query: 'op' plus its parameters (and an optional 'id', echoed back).
+      'profile': true profiles the query (see profiling_module), false excludes it from global profiling.
+
+    Returns:
+    - dict: The record written to the JSONL output, with 'result' or 'error'.
+    """
+    record = {'index': index, 'id': query.get('id'), 'op': query.get('op')}
+    start = time.perf_counter()
+    try:
+        if 'malformed' in query:
+            raise ValueError(query['malformed'])
+        operation = OPERATIONS.get(query.get('op'))
+        if operation is None:
+            raise ValueError(f"Unknown op '{query.get('op')}', expected one of: {', '.join(OPERATIONS)}.")
+        profile = query.get('profile')
+        if isinstance(profile, str):
+            profile = profile.lower() in ('1', 'true', 'yes')
+        with profiling_module.profiled(f"{query['op']}-{query.get('id', index)}", profile) as profiling:
+            record['result'] = operation(dataset, query)
+        if profiling.path is not None:
+            record['profile'] = profiling.path
+    except Exception as e:
+        # Any failure is reported in the query's record, so one bad query never stops the run
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+def _init_worker(books_path, ratings_path):
+    # Forked workers inherit the parent's dataset; others load it themselves (from the snapshots when present)
+    global _dataset
+    if _dataset is None:
+        with contextlib.redirect_stdout(sys.stderr):
+            _dataset = RecommendationEngine(books_path, ratings_path).dataset
+
+
+def _run_chunk(chunk):
+    return [run_query(_dataset, index, query) for index, query in chunk]
+
+
+def read_queries(path):
+    """
+    Read queries from a JSONL file (one JSON object per line) or a CSV file with a header row.
+
+    CSV columns are the query fields ('op', 'id', 'isbn', 'user', 'id1', 'id2', 'kind', 'metric', 'n', 'p', ...);
+    empty cells are left out. '-' reads JSONL from standard input.
+
+    Returns:
+    - generator: (index, query) tuples in input order; a malformed line yields a query that reports it.
+    """
+    handle = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+    try:
+        if path.lower().endswith('.csv'):
+            for index, row in enumerate(csv.DictReader(handle)):
+                yield index, {key: value for key, value in row.items() if key and value not in (None, '')}
+            return
+        index = 0
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+                if not isinstance(query, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                query = {'op': None, 'malformed': f"Malformed query line: {e}"}
+            yield index, query
+            index += 1
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def _chunks(queries, size):
+    iterator = iter(queries)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(queries, dataset, workers=None, executor='process', ordered=False, chunk_size=DEFAULT_CHUNK_SIZE,
+              books_path='Books.csv', ratings_path='Book-Ratings.csv'):
+    """
+    Run queries in a pool of workers sharing one loaded dataset, yielding results as they complete.
+
+    Threads share the dataset directly but only scale with the parts of scoring that release the GIL;
+    processes scale with the number of cores. Forked processes share the parent's dataset
+    copy-on-write, other start methods load it once per worker (cheaply, from the snapshots).
+
+    Parameters:
+    - queries (iterable): (index, query) tuples, as yielded by read_queries.
+    - dataset (Dataset): The loaded dataset.
+    - workers (int): The pool size (defaults to the number of CPUs).
+    - executor (str): 'process' or 'thread'.
+    - ordered (bool): Whether to yield results in input order rather than as they complete.
+    - chunk_size (int): The number of queries handed to a worker at a time.
+    - books_path (str): The path of Books.csv, for workers that load the dataset themselves.
+    - ratings_path (str): The path of Book-Ratings.csv, idem.
+
+    Returns:
+    - generator: The output record of each query (see run_query).
+    """
+    global _dataset
+    _dataset = dataset
+    workers = workers or os.cpu_count() or 1
+    if executor == 'process':
+        pool = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(books_path, ratings_path))
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(workers)
+    else:
+        raise ValueError("executor must be 'process' or 'thread'.")
+
+    chunks = _chunks(queries, chunk_size)
+    limit = workers * CHUNKS_IN_FLIGHT
+    with pool:
+        # Keep a bounded window of chunks in flight, topping it up as chunks complete
+        pending = {}
+        for position, chunk in enumerate(islice(chunks, limit)):
+            pending[pool.submit(_run_chunk, chunk)] = position
+        submitted = len(pending)
+        finished = {}
+        next_position = 0
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                position = pending.pop(future)
+                if ordered:
+                    finished[position] = future.result()
+                else:
+                    yield from future.result()
+            while next_position in finished:
+                yield from finished.pop(next_position)
+                next_position += 1
+            # Top the window back up; in order, chunks finished behind a slow one still count against it
+            while len(pending) + len(finished) < limit:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending[pool.submit(_run_chunk, chunk)] = submitted
+                submitted += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a file of queries against the dataset and write JSONL results.')
+    parser.add_argument('queries', help="JSONL or CSV file of queries ('-' for JSONL on standard input)")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: standard output)")
+    parser.add_argument('--books', default='Books.csv', help='path of Books.csv')
+    parser.add_argument('--ratings', default='Book-Ratings.csv', help='path of Book-Ratings.csv')
+    parser.add_argument('--workers', type=int, default=None, help='pool size (default: number of CPUs)')
+    parser.add_argument('--executor', choices=('process', 'thread'), default='process')
+    parser.add_argument('--ordered', action='store_true', help='write results in input order')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--profile-dir', help='profile every query, writing the profiles to this directory')
+    parser.add_argument('--profile-mode', choices=profiling_module.MODES, default='cprofile')
+    parser.add_argument('--profile-keep', type=int, default=profiling_module.DEFAULT_KEEP,
+                        help='number of most recent profiles kept')
+    args = parser.parse_args()
+
+    if args.profile_dir:
+        profiling_module.enable(args.profile_dir, args.profile_mode, args.profile_keep)
+
+    # Loading messages go to standard error, which keeps standard output pure JSONL
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            engine = RecommendationEngine(args.books, args.ratings)
+    except IOError as e:
+        print(f'Error loading dataset: {e}', file=sys.stderr)
+        sys.exit(1)
+
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    start = time.perf_counter()
+    count = errors = 0
+    try:
+        for record in run_batch(read_queries(args.queries), engine.dataset, args.workers, args.executor,
+                                args.ordered, args.chunk_size, args.books, args.ratings):
+            output.write(json.dumps(record) + '\n')
+            count += 1
+            errors += 'error' in record
+    except IOError as e:
+        print(f'Error reading queries: {e}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"Ran {count} queries ({errors} errors) in {elapsed:.2f}s: {count / elapsed if elapsed else 0:.0f} queries/s",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
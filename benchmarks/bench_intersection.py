@@ -0,0 +1,80 @@
+"""
+Microbenchmark of the co-rated intersection used by every similarity metric.
+
+Compares the original approach (string dicts parsed on every call, set intersection
+and a common_ratings dict) with the sorted-array merge/galloping kernel.
+
+Usage:
+    python benchmarks/bench_intersection.py
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intersection_module
+from rating_store_module import RatingStoreBuilder
+
+# (size of the first row, size of the second row, number of common raters)
+CASES = [(50, 50, 10), (500, 500, 100), (20, 2000, 10), (5, 20000, 5)]
+REPEATS = 200
+
+
+def legacy_sums(ratings1, ratings2):
+    """
+    The pre-kernel implementation: parse both string dicts, intersect key sets, build common_ratings.
+    """
+    ratings1 = {key.strip('"'): float(value.strip('"')) for key, value in ratings1.items()}
+    ratings2 = {key.strip('"'): float(value.strip('"')) for key, value in ratings2.items()}
+    common_ratings = {key: (ratings1.get(key, 0), ratings2.get(key, 0)) for key in set(ratings1) & set(ratings2)}
+    return sum((rating1 - rating2) ** 2 for rating1, rating2 in common_ratings.values())
+
+
+def make_case(size1, size2, common, rng):
+    users = rng.sample(range(size1 + size2), size1 + size2 - common)
+    raters1 = users[:size1]
+    raters2 = users[size1 - common:]
+
+    builder = RatingStoreBuilder()
+    legacy1, legacy2 = {}, {}
+    for user in raters1:
+        rating = rng.randint(1, 10)
+        builder.add(str(user), 'book1', rating)
+        legacy1[str(user)] = f'"{rating}"'
+    for user in raters2:
+        rating = rng.randint(1, 10)
+        builder.add(str(user), 'book2', rating)
+        legacy2[str(user)] = f'"{rating}"'
+    store = builder.build()
+    return (legacy1, legacy2), (store.book_ratings('book1'), store.book_ratings('book2'))
+
+
+def measure(function, args):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function(*args)
+    seconds = (time.perf_counter() - start) / REPEATS
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'rows':>14} {'common':>7} {'legacy us':>10} {'kernel us':>10} {'speedup':>8} {'legacy B':>9} {'kernel B':>9}")
+    for size1, size2, common in CASES:
+        legacy_args, kernel_args = make_case(size1, size2, common, rng)
+        legacy_time, legacy_peak = measure(legacy_sums, legacy_args)
+        kernel_time, kernel_peak = measure(intersection_module.co_rated_sums, kernel_args)
+        print(f"{size1:>6} x {size2:<6} {common:>7} {legacy_time * 1e6:>10.1f} {kernel_time * 1e6:>10.1f} "
+              f"{legacy_time / kernel_time:>7.1f}x {legacy_peak:>9} {kernel_peak:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Seeded generator of synthetic Books.csv / Book-Ratings.csv files shaped like Book-Crossing.
+
+Book popularity and user activity both follow power laws (Zipf-like weights 1 / rank ** alpha),
+so a few books and users account for most ratings, as in the real data. Like Book-Crossing,
+about 62% of the ratings are implicit (0) and explicit ratings lean towards the high end.
+Every user rates a book at most once. The same arguments always produce the same files.
+
+Usage:
+    python benchmarks/generate_dataset.py --ratings 1000000 --out benchmarks/data/1m
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from itertools import accumulate
+
+# Book-Crossing has about 1.15M ratings of 271k books by 105k active users
+BOOKS_PER_RATING = 0.24
+USERS_PER_RATING = 0.09
+IMPLICIT_SHARE = 0.62
+POPULARITY_ALPHA = 0.9
+ACTIVITY_ALPHA = 0.8
+
+# The distribution of explicit ratings (1-10) in Book-Crossing, as relative weights
+EXPLICIT_WEIGHTS = [1, 1, 2, 2, 9, 7, 13, 26, 18, 21]
+
+# Heavy users run out of popular books: after this many weighted draws, the rest are drawn uniformly
+REDRAWS = 4
+
+# Named scales accepted by --scale (numbers of ratings)
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+
+def power_law_weights(count, alpha):
+    """
+    Return the cumulative weights 1 / rank ** alpha of count ranks, for random.choices.
+    """
+    return list(accumulate(1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+def generate(out_dir, num_ratings, num_books=None, num_users=None, seed=1, alpha=POPULARITY_ALPHA,
+             activity_alpha=ACTIVITY_ALPHA, implicit_share=IMPLICIT_SHARE):
+    """
+    Write a synthetic Books.csv and Book-Ratings.csv to out_dir.
+
+    Parameters:
+    - out_dir (str): The directory to write the files to (created if missing).
+    - num_ratings (int): The approximate number of ratings (fewer if the heaviest users would rate
+      more than a quarter of the books).
+    - num_books (int): The number of books (defaults to the Book-Crossing ratio).
+    - num_users (int): The number of users (defaults to the Book-Crossing ratio).
+    - seed (int): The random seed.
+    - alpha (float): The power-law exponent of book popularity.
+    - activity_alpha (float): The power-law exponent of user activity.
+    - implicit_share (float): The share of implicit (0) ratings.
+
+    Returns:
+    - dict: The numbers of books, users and ratings written.
+    """
+    rng = random.Random(seed)
+    num_books = num_books or max(10, int(num_ratings * BOOKS_PER_RATING))
+    num_users = num_users or max(10, int(num_ratings * USERS_PER_RATING))
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Popularity ranks are shuffled over the ISBNs, so popular books are spread through the ID space
+    isbns = [f"{number:010d}" for number in rng.sample(range(10 ** 9), num_books)]
+    book_weights = power_law_weights(num_books, alpha)
+    with open(os.path.join(out_dir, 'Books.csv'), 'w', encoding='ISO-8859-1') as file:
+        file.write('"ISBN";"Book-Title";"Book-Author";"Year-Of-Publication";"Publisher";'
+                   '"Image-URL-S";"Image-URL-M";"Image-URL-L"\n')
+        for number, isbn in enumerate(isbns):
+            file.write(f'"{isbn}";"Title {number}";"Author {number % (num_books // 3 + 1)}";'
+                       f'"{rng.randint(1950, 2004)}";"Publisher {number % 997}";"";"";""\n')
+
+    # How many ratings each user gives, drawn from the activity power law
+    activity = Counter(rng.choices(range(num_users), cum_weights=power_law_weights(num_users, activity_alpha),
+                                   k=num_ratings))
+    explicit_weights = list(accumulate(EXPLICIT_WEIGHTS))
+    written = 0
+    with open(os.path.join(out_dir, 'Book-Ratings.csv'), 'w', encoding='ISO-8859-1') as file:
+        file.write('"User-ID";"ISBN";"Book-Rating"\n')
+        for user in range(num_users):
+            wanted = min(activity.get(user, 0), num_books // 4)
+            if not wanted:
+                continue
+            # Draw distinct books by popularity, redrawing the duplicates a few times, then uniformly
+            books = set()
+            for _ in range(REDRAWS):
+                books.update(rng.choices(range(num_books), cum_weights=book_weights, k=wanted - len(books)))
+                if len(books) == wanted:
+                    break
+            while len(books) < wanted:
+                books.add(rng.randrange(num_books))
+            lines = []
+            for book in books:
+                if rng.random() < implicit_share:
+                    rating = 0
+                else:
+                    rating = rng.choices(range(1, 11), cum_weights=explicit_weights)[0]
+                lines.append(f'"{user + 1}";"{isbns[book]}";"{rating}"\n')
+            file.writelines(lines)
+            written += len(lines)
+
+    return {'books': num_books, 'users': len(activity), 'ratings': written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic Book-Crossing-like CSV files.')
+    parser.add_argument('--scale', choices=SCALES, help='named number of ratings (overridden by --ratings)')
+    parser.add_argument('--ratings', type=int, help='number of ratings')
+    parser.add_argument('--books', type=int, help='number of books')
+    parser.add_argument('--users', type=int, help='number of users')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--alpha', type=float, default=POPULARITY_ALPHA, help='book popularity exponent')
+    parser.add_argument('--out', default=None, help='output directory (default: benchmarks/data/<scale>)')
+    args = parser.parse_args()
+
+    num_ratings = args.ratings or SCALES[args.scale or '100k']
+    out_dir = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                       args.scale or str(num_ratings))
+    start = time.perf_counter()
+    counts = generate(out_dir, num_ratings, args.books, args.users, args.seed, args.alpha)
+    print(f"Wrote {counts['ratings']} ratings of {counts['books']} books by {counts['users']} users "
+          f"to {out_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
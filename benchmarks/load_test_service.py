@@ -0,0 +1,137 @@
+"""
+Load test of the HTTP/JSON service (service_module).
+
+Opens a number of keep-alive connections, each sending requests back to back for a fixed
+duration, with a mix of the service's endpoints. IDs are taken from /top-books and /top-users.
+Reports throughput, latency percentiles and errors per endpoint.
+
+Usage:
+    python service_module.py --port 8080 &
+    python benchmarks/load_test_service.py --port 8080 --connections 64 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from urllib.parse import quote
+
+# Relative weight of each endpoint in the request mix
+MIX = [('similar-books', 4), ('similarity', 4), ('recommend', 2), ('books', 3), ('top-books', 1)]
+
+
+async def request(reader, writer, path):
+    """
+    Send one GET over an open connection and return the status and decoded JSON body.
+    """
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    body = await reader.readexactly(length)
+    return status, json.loads(body)
+
+
+def make_path(kind, isbns, users, rng):
+    if kind == 'similar-books':
+        return f"/similar-books?isbn={quote(rng.choice(isbns))}&n=10"
+    if kind == 'similarity':
+        first, second = rng.sample(isbns, 2)
+        return f"/similarity?kind=books&id1={quote(first)}&id2={quote(second)}"
+    if kind == 'recommend':
+        return f"/recommend?user={quote(rng.choice(users))}&n=10"
+    if kind == 'books':
+        return f"/books/{quote(rng.choice(isbns))}"
+    return "/top-books?n=10"
+
+
+async def client(host, port, deadline, isbns, users, seed, latencies, errors):
+    rng = random.Random(seed)
+    kinds = [kind for kind, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            try:
+                status, _ = await request(reader, writer, make_path(kind, isbns, users, rng))
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors[kind] = errors.get(kind, 0) + 1
+                break
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            if status != 200:
+                errors[kind] = errors.get(kind, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name, values, elapsed, errors):
+    values = sorted(values)
+    if not values:
+        print(f"{name:<14}{'-':>10}")
+        return
+    print(f"{name:<14}{len(values):>10}{len(values) / elapsed:>10.0f}"
+          f"{percentile(values, 0.50) * 1000:>10.2f}{percentile(values, 0.95) * 1000:>10.2f}"
+          f"{percentile(values, 0.99) * 1000:>10.2f}{errors:>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Load test the recommendation service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--ids', type=int, default=200, help='number of books and users to draw from')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    except OSError as e:
+        print(f'Error connecting to the service: {e}')
+        sys.exit(1)
+    _, books = await request(reader, writer, f"/top-books?n={args.ids}")
+    _, users = await request(reader, writer, f"/top-users?n={args.ids}")
+    _, before = await request(reader, writer, "/stats")
+    writer.close()
+    isbns = [book['isbn'] for book in books if book['ratings']]
+    users = [user['user_id'] for user in users]
+
+    latencies = {}
+    errors = {}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args.host, args.port, deadline, isbns, users, args.seed + i, latencies, errors)
+                           for i in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.connections} connections, {elapsed:.1f}s")
+    print(f"{'endpoint':<14}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for kind, _ in MIX:
+        report(kind, latencies.get(kind, []), elapsed, errors.get(kind, 0))
+    report('total', [value for values in latencies.values() for value in values], elapsed, sum(errors.values()))
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, after = await request(reader, writer, "/stats")
+    writer.close()
+    for name, batcher in after['batchers'].items():
+        requests = batcher['requests'] - before['batchers'][name]['requests']
+        batches = batcher['batches'] - before['batchers'][name]['batches']
+        if batches:
+            print(f"batcher {name}: {requests} requests in {batches} batches ({requests / batches:.1f} per batch)")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
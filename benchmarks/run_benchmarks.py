@@ -0,0 +1,315 @@
+"""
+Reproducible benchmark suite: ingest, pair similarity, one-vs-all similarity, user recommendations
+and top-N listings, on synthetic data from generate_dataset.py.
+
+Each benchmark is run a few times and reports its best and median time, its throughput
+(operations per second) and, in a separate run under tracemalloc, its peak Python memory.
+Results are written as JSON and can be compared against an earlier run (the baseline).
+
+Usage:
+    python benchmarks/run_benchmarks.py --scale 100k --save baseline-100k.json
+    python benchmarks/run_benchmarks.py --scale 100k --compare baseline-100k.json --fail-on-regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import load_dataset_module
+import recommend_module
+import similarity_module
+from generate_dataset import SCALES, generate
+from lru_module import LruCache
+
+REPEATS = 3
+
+# A benchmark slower than the baseline by more than this fraction counts as a regression
+DEFAULT_THRESHOLD = 0.10
+
+# Slowdowns smaller than this many seconds are timer noise, whatever their fraction
+MIN_REGRESSION_SECONDS = 0.001
+
+PAIR_METRICS = ['euclidean', 'cosine', 'minkowski', 'pearson', 'manhattan']
+
+# The books sampled for pair and one-vs-all queries are drawn from this many of the most rated ones
+POPULAR_POOL = 500
+
+
+class Context:
+    """
+    The dataset files, the loaded data and the sampled query IDs shared by the benchmarks.
+
+    Parameters:
+    - data_dir (str): The directory holding Books.csv and Book-Ratings.csv.
+    - queries (int): The number of pairs scored by the pair benchmarks (one-vs-all and recommendation
+      benchmarks run a tenth as many queries).
+    - seed (int): The seed of the query sampling.
+    """
+
+    def __init__(self, data_dir, queries, seed):
+        self.books_path = os.path.join(data_dir, 'Books.csv')
+        self.ratings_path = os.path.join(data_dir, 'Book-Ratings.csv')
+        # Queries run on the memory-mapped snapshots, as the engine serves them: the first load writes them
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(2):
+                self.books = load_dataset_module.load_books_dataset(self.books_path, self.ratings_path, fresh=True)
+        self.users = load_dataset_module.load_users_dataset(self.ratings_path)
+        self.store = self.books.store
+
+        rng = random.Random(seed)
+        counts = self.store.item_stats.count
+        popular = sorted(range(self.store.num_items), key=lambda item: (-counts[item], item))[:POPULAR_POOL]
+        isbns = [self.store.items.name(item) for item in popular]
+        self.pairs = [tuple(rng.sample(isbns, 2)) for _ in range(queries)]
+        self.targets = [rng.choice(isbns) for _ in range(max(1, queries // 10))]
+        user_counts = self.store.user_stats.count
+        active = sorted(range(self.store.num_users), key=lambda user: (-user_counts[user], user))[:POPULAR_POOL]
+        self.user_ids = [self.store.users.name(rng.choice(active)) for _ in range(max(1, queries // 10))]
+
+
+# Every benchmark takes the context and returns (run, operations): run() performs one repetition of
+# the given number of operations. Work that must not be timed happens before run is returned.
+
+def bench_ingest_csv(ctx):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_dataset_module.load_rating_store(ctx.ratings_path, use_snapshot=False, fresh=True)
+    return run, ctx.store.num_ratings
+
+
+def bench_ingest_snapshot(ctx):
+    def run():
+        load_dataset_module.load_rating_store(ctx.ratings_path, use_snapshot=True, fresh=True)
+    return run, ctx.store.num_ratings
+
+
+def bench_load_books(ctx):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_dataset_module.load_books_dataset(ctx.books_path, ctx.ratings_path, use_snapshot=False, fresh=True)
+    return run, ctx.store.num_ratings
+
+
+def bench_load_users(ctx):
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_dataset_module.load_users_dataset(ctx.ratings_path, use_snapshot=False, fresh=True)
+    return run, ctx.store.num_ratings
+
+
+def pair_benchmark(metric):
+    function = getattr(similarity_module, {
+        'euclidean': 'euclidean_distance',
+        'cosine': 'cosine_similarity',
+        'minkowski': 'minkowski_distance',
+        'pearson': 'pearson_correlation_coefficient',
+        'manhattan': 'manhattan_distance'
+    }[metric])
+
+    def bench(ctx):
+        cache = similarity_module.pair_cache(ctx.books)
+
+        def run():
+            # Measure the computation, not the pair memo
+            cache.clear()
+            for isbn1, isbn2 in ctx.pairs:
+                function(isbn1, isbn2, ctx.books)
+        return run, len(ctx.pairs)
+    return bench
+
+
+def bench_compare_all(ctx):
+    def run():
+        for isbn1, isbn2 in ctx.pairs:
+            similarity_module.compare_all_metrics(isbn1, isbn2, ctx.books)
+    return run, len(ctx.pairs)
+
+
+def one_vs_all_benchmark(metric):
+    def bench(ctx):
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for isbn in ctx.targets:
+                    similarity_module.find_n_similar_books(isbn, 10, ctx.books, metric)
+        return run, len(ctx.targets)
+    return bench
+
+
+def bench_recommend(ctx):
+    def run():
+        # A disabled neighbourhood cache makes every query compute its neighbours
+        for user_id in ctx.user_ids:
+            recommend_module.recommend_for_user(user_id, 10, ctx.users, cache=LruCache(0))
+    return run, len(ctx.user_ids)
+
+
+def bench_top_books(ctx):
+    def run():
+        load_dataset_module.n_top_books(10, ctx.books, verbose=False)
+    return run, 1
+
+
+def bench_top_users(ctx):
+    def run():
+        load_dataset_module.n_top_users(10, ctx.users, verbose=False)
+    return run, 1
+
+
+BENCHMARKS = {
+    'ingest.csv': bench_ingest_csv,
+    'ingest.snapshot': bench_ingest_snapshot,
+    'load.books_dataset': bench_load_books,
+    'load.users_dataset': bench_load_users,
+    **{f'pair.{metric}': pair_benchmark(metric) for metric in PAIR_METRICS},
+    'pair.compare_all': bench_compare_all,
+    'one_vs_all.euclidean': one_vs_all_benchmark('euclidean'),
+    'one_vs_all.cosine': one_vs_all_benchmark('cosine'),
+    'recommend.user': bench_recommend,
+    'top_n.books': bench_top_books,
+    'top_n.users': bench_top_users
+}
+
+
+def measure(run, operations, repeats=REPEATS, memory=True):
+    """
+    Time a benchmark's repetitions and measure its peak memory.
+
+    Returns:
+    - dict: The best and median seconds per repetition, the operations per repetition,
+      the throughput of the best repetition and the peak traced memory in bytes (None if not measured).
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+
+    peak = None
+    if memory:
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'seconds': best,
+        'median_seconds': statistics.median(times),
+        'operations': operations,
+        'ops_per_sec': operations / best if best > 0 else 0.0,
+        'peak_bytes': peak
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each benchmark's change against the baseline.
+
+    Returns:
+    - list: The names of the benchmarks slower than the baseline by more than threshold.
+    """
+    regressions = []
+    print(f"\n{'benchmark':<24}{'baseline s':>12}{'current s':>12}{'change':>9}{'peak change':>13}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<24}{'-':>12}{result['seconds']:>12.4f}{'new':>9}")
+            continue
+        change = result['seconds'] / before['seconds'] - 1 if before['seconds'] else 0.0
+        peak = ''
+        if result['peak_bytes'] and before.get('peak_bytes'):
+            peak = f"{result['peak_bytes'] / before['peak_bytes'] - 1:+.1%}"
+        slower = result['seconds'] - before['seconds'] > MIN_REGRESSION_SECONDS
+        flag = ' REGRESSION' if change > threshold and slower else ''
+        print(f"{name:<24}{before['seconds']:>12.4f}{result['seconds']:>12.4f}{change:>+9.1%}{peak:>13}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite on synthetic Book-Crossing-like data.')
+    parser.add_argument('--scale', choices=SCALES, default='100k', help='number of ratings of the generated data')
+    parser.add_argument('--data-dir', help='use (or generate) the CSV files in this directory')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the data generator and of the query sampling')
+    parser.add_argument('--queries', type=int, default=200, help='pairs scored per pair benchmark')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--only', action='append', help='run the benchmarks whose name starts with this prefix')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc run (faster at large scales)')
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    parser.add_argument('--compare', help='compare the results with this baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='regression threshold (0.1 = 10%%)')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                             f'{args.scale}-seed{args.seed}')
+    if not os.path.exists(os.path.join(data_dir, 'Book-Ratings.csv')):
+        print(f"Generating {args.scale} ratings in {data_dir}...")
+        generate(data_dir, SCALES[args.scale], seed=args.seed)
+
+    ctx = Context(data_dir, args.queries, args.seed)
+    print(f"{ctx.store.num_ratings} ratings, {ctx.store.num_items} books, {ctx.store.num_users} users\n")
+    print(f"{'benchmark':<24}{'ops':>8}{'best s':>11}{'median s':>11}{'ops/s':>13}{'peak MiB':>10}")
+
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        run, operations = bench(ctx)
+        result = measure(run, operations, args.repeats, not args.no_memory)
+        results[name] = result
+        peak = f"{result['peak_bytes'] / 2 ** 20:.1f}" if result['peak_bytes'] is not None else '-'
+        print(f"{name:<24}{operations:>8}{result['seconds']:>11.4f}{result['median_seconds']:>11.4f}"
+              f"{result['ops_per_sec']:>13.1f}{peak:>10}")
+
+    report = {
+        'meta': {
+            'scale': args.scale if not args.data_dir else None,
+            'data_dir': data_dir,
+            'seed': args.seed,
+            'queries': args.queries,
+            'repeats': args.repeats,
+            'ratings': ctx.store.num_ratings,
+            'books': ctx.store.num_items,
+            'users': ctx.store.num_users,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'results': results
+    }
+    if args.save:
+        try:
+            with open(args.save, 'w') as file:
+                json.dump(report, file, indent=2)
+        except IOError as e:
+            print(f'Error writing results: {e}')
+
+    if args.compare:
+        try:
+            with open(args.compare) as file:
+                baseline = json.load(file)
+        except (IOError, ValueError) as e:
+            print(f'Error reading baseline: {e}')
+            return
+        if baseline['meta'].get('ratings') != report['meta']['ratings']:
+            print("\nWarning: the baseline was measured on a different dataset.")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+from intersection_module import co_rated_positions, count_co_rated
+
+# A row becomes a bitmap once it holds at least 1/DENSE_RATIO of the ID space. Its bitmap then costs at most
+# DENSE_RATIO / 32 times its 4-byte sorted IDs, and one AND of two bitmaps is far cheaper than merging the rows
+DENSE_RATIO = 1024
+
+
+class RaterSets:
+    """
+    Interaction sets of every book (its raters) or every user (their books), for fast overlap counts.
+
+    Like roaring bitmap containers, each row is kept in whichever form is cheaper:
+    - dense rows as a big-integer bitmap over the dense IDs, so two dense rows intersect with one AND and a popcount;
+    - sparse rows as the sorted ID slice the rating store already holds (read through its item_slice or
+      user_slice, so ratings buffered since the store was last merged are included), at no extra memory.
+    A sparse row is intersected with any other row through the sorted slices, by the merge/galloping
+    kernel of intersection_module, so no per-call sets are built.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - axis (str): 'items' for the raters of each book, 'users' for the books of each user.
+    - min_dense (int): Rows with at least this many entries are stored as bitmaps
+      (defaults to the ID space size / DENSE_RATIO).
+    """
+
+    def __init__(self, store, axis='items', min_dense=None):
+        if axis == 'items':
+            self.row_slice, self.num_rows, self.universe = store.item_slice, store.num_items, store.num_users
+        elif axis == 'users':
+            self.row_slice, self.num_rows, self.universe = store.user_slice, store.num_users, store.num_items
+        else:
+            raise ValueError(f"Unknown axis '{axis}', expected 'items' or 'users'.")
+        self.store = store
+        self.axis = axis
+        self.min_dense = max(1, self.universe // DENSE_RATIO) if min_dense is None else min_dense
+        self.bitmaps = {}
+        for row in range(self.num_rows):
+            if self.size(row) >= self.min_dense:
+                self._make_dense(row)
+
+    def _make_dense(self, row):
+        bits = bytearray((self.universe + 7) // 8)
+        for idx in self.members(row):
+            bits[idx >> 3] |= 1 << (idx & 7)
+        self.bitmaps[row] = int.from_bytes(bits, 'little')
+
+    def nbytes(self):
+        """
+        Return the number of bytes held by the bitmaps (sparse rows share the rating store's columns).
+        """
+        return len(self.bitmaps) * ((self.universe + 7) // 8)
+
+    def size(self, row):
+        _, _, start, stop = self.row_slice(row)
+        return stop - start
+
+    def members(self, row):
+        """
+        Return the sorted dense IDs of a row as a zero-copy memoryview.
+        """
+        ids, _, start, stop = self.row_slice(row)
+        return memoryview(ids)[start:stop]
+
+    def overlap(self, row1, row2):
+        """
+        Return the number of IDs two rows have in common.
+        """
+        bitmap1, bitmap2 = self.bitmaps.get(row1), self.bitmaps.get(row2)
+        if bitmap1 is not None and bitmap2 is not None:
+            return (bitmap1 & bitmap2).bit_count()
+        return count_co_rated(self.members(row1), self.members(row2))
+
+    def has_overlap(self, row1, row2):
+        """
+        Return whether two rows share at least one ID, stopping at the first common one.
+        """
+        bitmap1, bitmap2 = self.bitmaps.get(row1), self.bitmaps.get(row2)
+        if bitmap1 is not None and bitmap2 is not None:
+            return (bitmap1 & bitmap2) != 0
+        return next(co_rated_positions(self.members(row1), self.members(row2)), None) is not None
+
+    def jaccard(self, row1, row2):
+        """
+        Return the Jaccard similarity |A & B| / |A | B| of two rows (0 when both are empty).
+        """
+        common = self.overlap(row1, row2)
+        union = self.size(row1) + self.size(row2) - common
+        return common / union if union else 0.0
+
+    def overlaps(self, row, candidates, min_support=1):
+        """
+        Return the overlap of a row with every candidate that shares at least min_support IDs with it.
+
+        Meant as a support-threshold filter ahead of the exact metrics: candidates too small to reach
+        min_support are dropped by size alone, and the result can be passed to
+        similarity_engine_module.rank_candidates as its overlaps.
+
+        Returns:
+        - dict: Candidate row -> overlap, for the candidates passing the threshold.
+        """
+        counts = {}
+        size = self.size
+        bitmap = self.bitmaps.get(row)
+        # Against a dense row, sparse candidates are looked up bit by bit in a byte copy made once per call
+        bits = bitmap.to_bytes((self.universe + 7) // 8, 'little') if bitmap is not None else None
+        for other in candidates:
+            if other == row or size(other) < min_support:
+                continue
+            if bits is not None and other not in self.bitmaps:
+                common = sum(bits[idx >> 3] >> (idx & 7) & 1 for idx in self.members(other))
+            else:
+                common = self.overlap(row, other)
+            if common >= min_support:
+                counts[other] = common
+        return counts
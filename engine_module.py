@@ -0,0 +1,181 @@
+import threading
+import time
+
+import load_dataset_module
+import profiling_module
+import recommend_module
+import similarity_engine_module
+import similarity_module
+import snapshot_module
+from rating_store_module import BookProfile, UserProfile
+
+DEFAULT_POLL_INTERVAL = 5.0
+
+
+class Dataset:
+    """
+    One immutable generation of the book and user data, as served by a RecommendationEngine.
+
+    Each generation has a private rating store, which the loaders never hand to other callers (such as
+    load_dataset_module.tail_ratings), so nothing outside the engine can change it.
+    Readers never change a dataset they share with other threads; the one thing a query may build
+    lazily, the explicit/implicit split of the ratings, is built once under the store's lock on first use,
+    so starting or reloading the engine does not pay for it.
+
+    Parameters:
+    - books (BookProfile): The book data returned by load_dataset_module.load_books_dataset.
+    - fingerprints (dict): Path -> fingerprint of the CSV files the data was loaded from.
+    - generation (int): The number of datasets loaded before this one.
+    """
+
+    def __init__(self, books, fingerprints, generation=0):
+        self.books = books
+        self.users = UserProfile(books.store)
+        self.store = books.store
+        self.fingerprints = fingerprints
+        self.generation = generation
+        self.loaded_at = time.time()
+
+
+class RecommendationEngine:
+    """
+    Serve queries from an immutable dataset snapshot that is rebuilt and swapped in when the CSV files change.
+
+    The current dataset is a single reference: readers take it once per query and keep using it,
+    so queries in flight finish on the dataset they started with while a reload builds the next one.
+    Swapping the reference is atomic, so the read path needs no locks; only reloads are serialised.
+
+    Parameters:
+    - books_path (str): The path of the Books.csv file.
+    - ratings_path (str): The path of the Book-Ratings.csv file.
+    - use_snapshot (bool): Whether to read and write the binary snapshots.
+    - workers (int): The number of processes used to parse the CSV files.
+    - poll_interval (float): Seconds between checks of the CSV files once watching has started.
+    """
+
+    def __init__(self, books_path='Books.csv', ratings_path='Book-Ratings.csv', use_snapshot=True, workers=1,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        self.books_path = books_path
+        self.ratings_path = ratings_path
+        self.use_snapshot = use_snapshot
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.dataset = self._load(0)
+        if self.dataset is None:
+            raise IOError(f"Could not load {books_path} and {ratings_path}.")
+
+    def _fingerprints(self):
+        return {path: snapshot_module.fingerprint(path, with_hash=False)
+                for path in (self.books_path, self.ratings_path)}
+
+    def _load(self, generation):
+        # Fingerprint first: a file changing during the load is then picked up by the next check
+        try:
+            fingerprints = self._fingerprints()
+        except OSError as e:
+            print(f'Error loading dataset: {e}')
+            return None
+        # A private store: the process-wide one may be shared with, and changed by, other callers
+        books = load_dataset_module.load_books_dataset(self.books_path, self.ratings_path, self.use_snapshot,
+                                                       self.workers, shared=False)
+        if not isinstance(books, BookProfile):
+            return None
+        return Dataset(books, fingerprints, generation)
+
+    def is_stale(self):
+        """
+        Return whether the CSV files changed since the current dataset was loaded.
+        """
+        try:
+            return self._fingerprints() != self.dataset.fingerprints
+        except OSError:
+            return False
+
+    def reload(self):
+        """
+        Build a new dataset from the CSV files and swap it in; the old one stays valid for its readers.
+
+        Returns:
+        - bool: Whether a new dataset was swapped in (a failed load keeps the current one).
+        """
+        with self._reload_lock:
+            start = time.perf_counter()
+            dataset = self._load(self.dataset.generation + 1)
+            if dataset is None:
+                return False
+            self.dataset = dataset
+            print(f"Reloaded dataset (generation {dataset.generation}) in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def start(self):
+        """
+        Start watching the CSV files in a background thread, reloading whenever they change.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """
+        Stop the background watcher and wait for it to finish.
+        """
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            if self.is_stale():
+                self.reload()
+
+    def similar_books(self, isbn, n, metric='euclidean', p=1, min_support=1, ratings='all', profile=None):
+        """
+        Return the n books most similar to a book, without printing.
+
+        The profile argument of every query method is passed to profiling_module.profiled: True profiles
+        the query even when profiling is off, False never profiles it, None follows the global setting.
+
+        Returns:
+        - list: (ISBN, metric value) tuples, most similar first (empty if the book has no ratings).
+        """
+        with profiling_module.profiled(f'similar_books-{isbn}-{metric}', profile):
+            dataset = self.dataset
+            store = dataset.store.select(ratings)
+            item = store.items.get(isbn)
+            if item is None:
+                return []
+            ranked = similarity_engine_module.top_similar_items(store, item, n, metric, p, min_support=min_support)
+            return [(store.items.name(other), score) for other, score in ranked]
+
+    def recommend_for_user(self, user_id, n, profile=None, **options):
+        """
+        Return the n books recommended to a user (see recommend_module.recommend_for_user for the options).
+        """
+        with profiling_module.profiled(f'recommend-{user_id}', profile):
+            return recommend_module.recommend_for_user(user_id, n, self.dataset.users, **options)
+
+    def compare(self, id1, id2, kind='books', profile=None, **options):
+        """
+        Compare two books (kind='books') or two users (kind='users') on every measure at once.
+
+        Returns:
+        - tuple: The results dictionary and explanation of similarity_module.compare_all_metrics.
+        """
+        with profiling_module.profiled(f'compare-{kind}-{id1}-{id2}', profile):
+            dataset = self.dataset
+            data = dataset.books if kind == 'books' else dataset.users
+            return similarity_module.compare_all_metrics(id1, id2, data, **options)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
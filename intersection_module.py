@@ -0,0 +1,152 @@
+from bisect import bisect_left
+
+# Switch from a linear merge to galloping search when one row is this many times longer than the other
+GALLOP_RATIO = 8
+
+
+def _gallop(ids, target, lo, hi):
+    """
+    Return the first position in ids[lo:hi] holding a value >= target.
+
+    Probes 1, 2, 4, ... positions ahead of lo, then binary-searches the last window,
+    so skipping k entries costs O(log k) instead of O(k).
+    """
+    step = 1
+    probe = lo
+    while probe < hi and ids[probe] < target:
+        lo = probe + 1
+        probe = lo + step
+        step *= 2
+    return bisect_left(ids, target, lo, min(probe, hi))
+
+
+def co_rated_positions(ids1, ids2):
+    """
+    Stream the positions of the IDs two sorted rows have in common, without building any containers.
+
+    A linear merge is used for rows of similar length; when one row is much longer,
+    each ID of the shorter row is located in the longer one by galloping search.
+
+    Parameters:
+    - ids1, ids2 (sequence): Dense IDs sorted in ascending order.
+
+    Yields:
+    - tuple: (position in ids1, position in ids2) for every common ID, in ascending ID order.
+    """
+    len1, len2 = len(ids1), len(ids2)
+    if not len1 or not len2:
+        return
+
+    if len1 * GALLOP_RATIO < len2:
+        pos2 = 0
+        for pos1 in range(len1):
+            pos2 = _gallop(ids2, ids1[pos1], pos2, len2)
+            if pos2 == len2:
+                return
+            if ids2[pos2] == ids1[pos1]:
+                yield pos1, pos2
+                pos2 += 1
+        return
+
+    if len2 * GALLOP_RATIO < len1:
+        pos1 = 0
+        for pos2 in range(len2):
+            pos1 = _gallop(ids1, ids2[pos2], pos1, len1)
+            if pos1 == len1:
+                return
+            if ids1[pos1] == ids2[pos2]:
+                yield pos1, pos2
+                pos1 += 1
+        return
+
+    pos1 = pos2 = 0
+    id1, id2 = ids1[0], ids2[0]
+    while True:
+        if id1 < id2:
+            pos1 += 1
+            if pos1 == len1:
+                return
+            id1 = ids1[pos1]
+        elif id2 < id1:
+            pos2 += 1
+            if pos2 == len2:
+                return
+            id2 = ids2[pos2]
+        else:
+            yield pos1, pos2
+            pos1 += 1
+            pos2 += 1
+            if pos1 == len1 or pos2 == len2:
+                return
+            id1, id2 = ids1[pos1], ids2[pos2]
+
+
+def co_rated_sums(ratings1, ratings2, p=1):
+    """
+    Accumulate the sums every metric needs in one pass over the co-rated entries of two rows.
+
+    Parameters:
+    - ratings1, ratings2 (RatingsView): The two rows to compare (two books or two users).
+    - p (float): The order of the |rating1 - rating2| ** p power sum.
+
+    Returns:
+    - tuple: (n, sum1, sum2, sum1_sq, sum2_sq, product_sum, power_sum) over the co-rated entries.
+    """
+    ids1, values1 = ratings1.row()
+    ids2, values2 = ratings2.row()
+
+    n = sum1 = sum2 = sum1_sq = sum2_sq = product_sum = power_sum = 0
+    for pos1, pos2 in co_rated_positions(ids1, ids2):
+        rating1 = values1[pos1]
+        rating2 = values2[pos2]
+        n += 1
+        sum1 += rating1
+        sum2 += rating2
+        sum1_sq += rating1 * rating1
+        sum2_sq += rating2 * rating2
+        product_sum += rating1 * rating2
+        power_sum += abs(rating1 - rating2) ** p
+
+    return n, sum1, sum2, sum1_sq, sum2_sq, product_sum, power_sum
+
+
+def co_rated_sums_multi(ratings1, ratings2, p_values):
+    """
+    Like co_rated_sums, but accumulate the absolute difference sum and a power sum for every p in one pass.
+
+    Parameters:
+    - ratings1, ratings2 (RatingsView): The two rows to compare (two books or two users).
+    - p_values (sequence): The orders of the |rating1 - rating2| ** p power sums.
+
+    Returns:
+    - tuple: (n, sum1, sum2, sum1_sq, sum2_sq, product_sum, abs_diff_sum, power_sums),
+      where power_sums lists one sum per entry of p_values.
+    """
+    ids1, values1 = ratings1.row()
+    ids2, values2 = ratings2.row()
+
+    n = sum1 = sum2 = sum1_sq = sum2_sq = product_sum = abs_diff_sum = 0
+    power_sums = [0] * len(p_values)
+    orders = list(enumerate(p_values))
+    for pos1, pos2 in co_rated_positions(ids1, ids2):
+        rating1 = values1[pos1]
+        rating2 = values2[pos2]
+        diff = abs(rating1 - rating2)
+        n += 1
+        sum1 += rating1
+        sum2 += rating2
+        sum1_sq += rating1 * rating1
+        sum2_sq += rating2 * rating2
+        product_sum += rating1 * rating2
+        abs_diff_sum += diff
+        for idx, p in orders:
+            power_sums[idx] += diff ** p
+
+    return n, sum1, sum2, sum1_sq, sum2_sq, product_sum, abs_diff_sum, power_sums
+
+
+def count_co_rated(ids1, ids2):
+    """
+    Return the number of IDs two sorted rows have in common.
+    """
+    return sum(1 for _ in co_rated_positions(ids1, ids2))
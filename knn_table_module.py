@@ -0,0 +1,143 @@
+import argparse
+from array import array
+
+import load_dataset_module
+import similarity_engine_module
+import snapshot_module
+from rating_store_module import ID_TYPECODE
+
+# Type codes of the fixed-width neighbour table
+SCORE_TYPECODE = 'f'
+EMPTY_SLOT = -1
+
+DEFAULT_TABLE_PATH = 'knn.table'
+
+
+class KnnTable:
+    """
+    Precomputed top-K neighbours of every book, stored as fixed-width ID and score arrays.
+
+    Row i holds the K best neighbours of the book with table ID i, best first,
+    padded with EMPTY_SLOT when fewer than K books qualified. Only neighbours with at least
+    min_support co-rated users were kept, so the table only answers queries asking for the same support.
+    """
+
+    def __init__(self, items, neighbours, scores, k, metric, p, min_support):
+        self.items = items
+        self.neighbours = neighbours
+        self.scores = scores
+        self.k = k
+        self.metric = metric
+        self.p = p
+        self.min_support = min_support
+
+    def __contains__(self, isbn):
+        return isbn in self.items
+
+    @property
+    def num_rows(self):
+        return len(self.neighbours) // self.k if self.k else 0
+
+    def answers(self, metric, p, num_books, min_support=1):
+        """
+        Return whether the table can answer a query for this metric, number of books and minimum support.
+        """
+        if metric != self.metric or num_books > self.k or min_support != self.min_support:
+            return False
+        return metric != 'minkowski' or p == self.p
+
+    def neighbours_of(self, isbn, num_books=None):
+        """
+        Return the precomputed neighbours of a book, or None if the book was added after the table was built.
+
+        Returns:
+        - list: (ISBN, score) tuples, most similar first.
+        """
+        # The ID table may be the store's live one, which also holds the books interned after the build
+        row = self.items.get(isbn)
+        if row is None or row >= self.num_rows:
+            return None
+
+        num_books = self.k if num_books is None else min(num_books, self.k)
+        start = row * self.k
+        result = []
+        for slot in range(start, start + num_books):
+            neighbour = self.neighbours[slot]
+            if neighbour == EMPTY_SLOT:
+                break
+            result.append((self.items.name(neighbour), self.scores[slot]))
+        return result
+
+
+def build_knn_table(store, k=20, metric='cosine', p=1, min_support=2):
+    """
+    Compute the top-K most similar books of every book in the store.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - k (int): The number of neighbours kept per book.
+    - metric (str): One of similarity_engine_module.METRICS.
+    - p (float): The Minkowski order.
+    - min_support (int): The minimum number of co-rated users a neighbour needs.
+
+    Returns:
+    - KnnTable: The neighbour table, with rows in the store's book ID order.
+    """
+    similarity_engine_module.check_metric(metric)
+    num_items = store.num_items
+    neighbours = array(ID_TYPECODE, [EMPTY_SLOT]) * (num_items * k)
+    scores = array(SCORE_TYPECODE, [0.0]) * (num_items * k)
+
+    for item in range(num_items):
+        ranked = similarity_engine_module.top_similar_items(store, item, k, metric, p, min_support=min_support)
+        start = item * k
+        for slot, (other, score) in enumerate(ranked, start):
+            neighbours[slot] = other
+            scores[slot] = score
+
+    return KnnTable(store.items, neighbours, scores, k, metric, p, min_support)
+
+
+def save_knn_table(table_path, table):
+    """
+    Write a neighbour table to a memory-mappable file.
+    """
+    sections = {'neighbours': table.neighbours, 'scores': table.scores}
+    sections.update(snapshot_module.id_table_sections('item_names', table.items))
+    metadata = {'k': table.k, 'metric': table.metric, 'p': table.p, 'min_support': table.min_support}
+    snapshot_module.write_snapshot(table_path, None, sections, metadata)
+
+
+def load_knn_table(table_path=DEFAULT_TABLE_PATH):
+    """
+    Memory-map a neighbour table written by save_knn_table, or return None if it is missing.
+    """
+    mapped = snapshot_module.map_snapshot(table_path)
+    if mapped is None:
+        return None
+
+    header, sections = mapped
+    metadata = header['metadata']
+    items = snapshot_module.mapped_id_table('item_names', sections)
+    return KnnTable(items, sections['neighbours'], sections['scores'],
+                    metadata['k'], metadata['metric'], metadata['p'], metadata['min_support'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the offline item-item nearest neighbour table.')
+    parser.add_argument('--ratings', default='Book-Ratings.csv', help='path of Book-Ratings.csv')
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH, help='path of the table to write')
+    parser.add_argument('--k', type=int, default=20, help='neighbours kept per book')
+    parser.add_argument('--metric', default='cosine', choices=similarity_engine_module.METRICS)
+    parser.add_argument('--p', type=float, default=1, help='Minkowski order')
+    parser.add_argument('--min-support', type=int, default=2, help='minimum number of co-rated users')
+    args = parser.parse_args()
+
+    store = load_dataset_module.load_rating_store(args.ratings)
+    table = build_knn_table(store, args.k, args.metric, args.p, args.min_support)
+    save_knn_table(args.output, table)
+    print(f"Wrote the {args.k} nearest neighbours of {store.num_items} books to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
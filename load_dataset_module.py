@@ -1,47 +1,426 @@
+import io
+import os
+import time
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import add
+
+import metrics_module
+import snapshot_module
+from rating_stats_module import RatingStats
+from rating_store_module import (ID_TYPECODE, MAX_RATING, MIN_RATING, OFFSET_TYPECODE, RATING_TYPECODE, BookProfile,
+                                 IdTable, RatingStore, RatingStoreBuilder, UserProfile, build_rows)
+from topk_module import top_k
+
+# Size of the blocks read from the ratings file by the streaming ingest
+INGEST_CHUNK_SIZE = 1 << 20
+
+# Rating stores already built, keyed by the path of the ratings file they were loaded from
+_rating_stores = {}
+
+
+def load_rating_store(ratings_path='Book-Ratings.csv', use_snapshot=True, workers=1, fresh=False, shared=True):
+    """
+    Load the ratings CSV file into a compact rating store shared by the book and user datasets.
+
+    The file is only parsed once per process; later calls return the same store.
+    With use_snapshot, a binary snapshot next to the CSV file is memory-mapped instead of parsing,
+    and (re)written whenever it is missing or the CSV file has changed.
+
+    Parameters:
+    - ratings_path (str): The path of the Book-Ratings.csv file.
+    - use_snapshot (bool): Whether to read and write the binary snapshot.
+    - workers (int): The number of processes used to parse the CSV file (1 parses serially).
+    - fresh (bool): Load a new store even if one was loaded before (later calls then return the new one).
+    - shared (bool): False loads a private store, which is neither taken from nor handed to other calls.
+
+    Returns:
+    - RatingStore: The interned, array-backed ratings.
+    """
+    store = None if fresh or not shared else _rating_stores.get(ratings_path)
+    if store is not None:
+        return store
+
+    snapshot_path = ratings_path + snapshot_module.SNAPSHOT_SUFFIX
+    if use_snapshot:
+        with metrics_module.timer('load.ratings', source='snapshot'):
+            store = snapshot_module.load_store_snapshot(snapshot_path, ratings_path)
+
+    if store is None:
+        with metrics_module.timer('load.ratings', source='csv'):
+            if workers > 1:
+                store, stats = ingest_ratings_parallel(ratings_path, workers)
+            else:
+                store, stats = ingest_ratings(ratings_path)
+        metrics_module.increment('load.ratings_rows', stats['rows'])
+        metrics_module.increment('load.ratings_malformed', stats['malformed'])
+        print(f"Loaded {stats['rows']} ratings in {stats['seconds']:.2f}s "
+              f"({stats['rows_per_sec']:.0f} rows/sec, {stats['malformed']} malformed lines skipped)")
+
+        if use_snapshot:
+            try:
+                with metrics_module.timer('load.snapshot_write', kind='ratings'):
+                    snapshot_module.save_store_snapshot(snapshot_path, ratings_path, store)
+            except OSError as e:
+                print(f'Error writing snapshot: {e}')
+
+    if shared:
+        _rating_stores[ratings_path] = store
+    return store
+
+
+def ingest_ratings(ratings_path='Book-Ratings.csv', chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Stream the ratings CSV file once and build the book-keyed and user-keyed indexes together.
+
+    The file is read in large blocks and each line goes straight into the store builder,
+    so no per-row lists are kept beyond the final rating columns.
+
+    Parameters:
+    - ratings_path (str): The path of the Book-Ratings.csv file.
+    - chunk_size (int): The number of characters read per block.
+
+    Returns:
+    - tuple: The RatingStore and a dictionary of ingest statistics
+      (rows, malformed, seconds, rows_per_sec).
+    """
+    start = time.perf_counter()
+    builder = RatingStoreBuilder()
+    rows = 0
+    malformed = 0
+    expect_header = True
+    remainder = ''
+
+    with open(ratings_path, encoding='ISO-8859-1', newline='') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                lines = [remainder] if remainder else []
+            else:
+                lines = (remainder + chunk).split('\n')
+                # The last piece may be a partial line; keep it for the next block
+                remainder = lines.pop()
+
+            added, skipped = _parse_rating_lines(lines, builder.add, expect_header and bool(lines))
+            rows += added
+            malformed += skipped
+            expect_header = expect_header and not lines
+
+            if not chunk:
+                break
+
+    store = builder.build()
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'malformed': malformed,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0
+    }
+    return store, stats
+
+
+def _parse_book_line(line):
+    # Split the line into parts and strip whitespace from each part
+    parts = line.strip().split(';')
+    isbn, title, author, year = map(str.strip, parts[:4])
+    return isbn.strip('""'), title, author, year
+
+
+def parse_books_file(books_path='Books.csv'):
+    """
+    Parse Books.csv into a list of (isbn, title, author, year) records.
+    """
+    with open(books_path, encoding='ISO-8859-1') as file:
+        return [_parse_book_line(line) for line in file]
+
+
+def split_byte_ranges(path, num_ranges):
+    """
+    Split a file into at most num_ranges contiguous byte ranges, each ending just after a newline.
+
+    Returns:
+    - list: (start, end) byte offsets covering the whole file in order.
+    """
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as file:
+        for part in range(1, num_ranges):
+            target = size * part // num_ranges
+            if target <= bounds[-1]:
+                continue
+            # Move the boundary forward to the start of the next line
+            file.seek(target - 1)
+            file.readline()
+            boundary = file.tell()
+            if bounds[-1] < boundary < size:
+                bounds.append(boundary)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_byte_range(path, start, end):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        return file.read(end - start).decode('ISO-8859-1')
+
+
+def _parse_ratings_range(ratings_path, start, end):
+    """
+    Parse one byte range of the ratings CSV file into compact partial arrays (process pool worker).
+
+    IDs are interned locally in order of first appearance; the parent maps them to global IDs.
+    """
+    builder = RatingStoreBuilder()
+    text = _read_byte_range(ratings_path, start, end)
+    rows, malformed = _parse_rating_lines(text.split('\n'), builder.add, start == 0)
+    return (builder.users.names, builder.items.names,
+            builder.row_users, builder.row_items, builder.row_ratings, rows, malformed)
+
+
+def _parse_books_range(books_path, start, end):
+    """
+    Parse one byte range of Books.csv into records (process pool worker).
+    """
+    text = _read_byte_range(books_path, start, end)
+    # Read through a universal-newlines stream so lines split exactly as they do in parse_books_file
+    return [_parse_book_line(line) for line in io.StringIO(text, newline=None)]
+
+
+def ingest_ratings_parallel(ratings_path='Book-Ratings.csv', workers=None, ranges_per_worker=4):
+    """
+    Parse the ratings CSV file in newline-aligned byte ranges across a process pool.
+
+    The work per rating runs in the workers, in three rounds: each byte range is parsed with
+    locally interned IDs; after the parent interns the names in file order, each range is mapped
+    to global IDs and split into contiguous blocks of books and of users; then each block is sorted,
+    deduplicated and summed into statistics. The parent only interns names and concatenates the
+    blocks, so the store is identical to the one ingest_ratings builds.
+
+    Parameters:
+    - ratings_path (str): The path of the Book-Ratings.csv file.
+    - workers (int): The number of worker processes (defaults to the number of CPUs).
+    - ranges_per_worker (int): How many byte ranges (and row blocks) to cut per worker, to balance uneven ones.
+
+    Returns:
+    - tuple: The RatingStore and a dictionary of ingest statistics
+      (rows, malformed, seconds, rows_per_sec).
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    ranges = split_byte_ranges(ratings_path, workers * ranges_per_worker)
+
+    items = IdTable()
+    users = IdTable()
+    rows = 0
+    malformed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        starts = [range_start for range_start, _ in ranges]
+        ends = [range_end for _, range_end in ranges]
+        partials = list(executor.map(_parse_ratings_range, repeat(ratings_path), starts, ends))
+
+        # Intern the names range by range, so global IDs follow first appearance in the file
+        user_maps = []
+        item_maps = []
+        for user_names, isbn_names, _, _, _, added, skipped in partials:
+            user_maps.append(array(ID_TYPECODE, map(users.intern, user_names)))
+            item_maps.append(array(ID_TYPECODE, map(items.intern, isbn_names)))
+            rows += added
+            malformed += skipped
+
+        num_blocks = len(ranges)
+        item_bounds = _block_bounds(len(items), num_blocks)
+        user_bounds = _block_bounds(len(users), num_blocks)
+        item_chunks = [[] for _ in range(num_blocks)]
+        user_chunks = [[] for _ in range(num_blocks)]
+        local_rows = ((local_users, local_items, ratings) for _, _, local_users, local_items, ratings, _, _ in partials)
+        for item_blocks, user_blocks in executor.map(_partition_ratings_range, local_rows, user_maps, item_maps,
+                                                     repeat(item_bounds), repeat(user_bounds)):
+            for block, chunk in enumerate(item_blocks):
+                item_chunks[block].append(chunk)
+            for block, chunk in enumerate(user_blocks):
+                user_chunks[block].append(chunk)
+        del partials
+
+        item_blocks = executor.map(build_rows, item_bounds[:-1], item_bounds[1:], repeat(len(users)), item_chunks)
+        user_blocks = executor.map(build_rows, user_bounds[:-1], user_bounds[1:], repeat(len(items)), user_chunks)
+        item_ptr, item_users, item_ratings, item_stats = _concatenate_blocks(item_blocks)
+        user_ptr, user_items, user_ratings, user_stats = _concatenate_blocks(user_blocks)
+
+    store = RatingStore(items, users, item_ptr, item_users, item_ratings, user_ptr, user_items, user_ratings,
+                        item_stats, user_stats)
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': rows,
+        'malformed': malformed,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else 0.0
+    }
+    return store, stats
+
+
+def _block_bounds(num_rows, num_blocks):
+    # Contiguous blocks of dense IDs of about the same width
+    return [num_rows * block // num_blocks for block in range(num_blocks + 1)]
+
+
+def _partition_ratings_range(local_rows, user_map, item_map, item_bounds, user_bounds):
+    """
+    Map one parsed range to global IDs and split it by book block and by user block (process pool worker).
+
+    Returns:
+    - tuple: Per book block (books, users, ratings) arrays and per user block (users, books, ratings) arrays.
+    """
+    local_users, local_items, ratings = local_rows
+    users = array(ID_TYPECODE, map(user_map.__getitem__, local_users))
+    items = array(ID_TYPECODE, map(item_map.__getitem__, local_items))
+    return _split_blocks(items, users, ratings, item_bounds), _split_blocks(users, items, ratings, user_bounds)
+
+
+def _split_blocks(keys, others, ratings, bounds):
+    blocks = [(array(ID_TYPECODE), array(ID_TYPECODE), array(RATING_TYPECODE)) for _ in bounds[1:]]
+    for key, other, rating in zip(keys, others, ratings):
+        block_keys, block_others, block_ratings = blocks[bisect_right(bounds, key) - 1]
+        block_keys.append(key)
+        block_others.append(other)
+        block_ratings.append(rating)
+    return blocks
+
+
+def _concatenate_blocks(blocks):
+    """
+    Join the row blocks built by build_rows into whole columns and statistics.
+    """
+    ptr = array(OFFSET_TYPECODE, [0])
+    ids = array(ID_TYPECODE)
+    values = array(RATING_TYPECODE)
+    columns = {name: [] for name in ('count', 'total', 'total_sq', 'mean', 'norm')}
+    for block_ptr, block_ids, block_values, block_stats in blocks:
+        ptr.extend(map(add, block_ptr[1:], repeat(len(ids))))
+        ids.extend(block_ids)
+        values.extend(block_values)
+        for name, parts in columns.items():
+            parts.append(getattr(block_stats, name))
+
+    # There is always at least one block, even for an empty file
+    stats = {}
+    for name, parts in columns.items():
+        stats[name] = column = array(parts[0].typecode)
+        for part in parts:
+            column.extend(part)
+    return ptr, ids, values, RatingStats(**stats)
+
+
+def parse_books_file_parallel(books_path='Books.csv', workers=None, ranges_per_worker=4):
+    """
+    Parse Books.csv in newline-aligned byte ranges across a process pool.
+
+    Returns:
+    - list: The same (isbn, title, author, year) records as parse_books_file, in file order.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = split_byte_ranges(books_path, workers * ranges_per_worker)
+
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        starts = [range_start for range_start, _ in ranges]
+        ends = [range_end for _, range_end in ranges]
+        for partial in executor.map(_parse_books_range, repeat(books_path), starts, ends):
+            records.extend(partial)
+    return records
+
+
+def load_book_catalog(books_path='Books.csv', use_snapshot=True, workers=1):
+    """
+    Return the Books.csv records as a BookCatalog, memory-mapped from the binary snapshot when possible.
+
+    A stale or missing snapshot is rewritten from the CSV file and then mapped, so the parsed
+    records do not stay in memory; without snapshots the catalog is built in memory.
+    """
+    snapshot_path = books_path + snapshot_module.SNAPSHOT_SUFFIX
+    if use_snapshot:
+        with metrics_module.timer('load.books', source='snapshot'):
+            catalog = snapshot_module.load_books_snapshot(snapshot_path, books_path)
+        if catalog is not None:
+            return catalog
+
+    with metrics_module.timer('load.books', source='csv'):
+        if workers > 1:
+            records = parse_books_file_parallel(books_path, workers)
+        else:
+            records = parse_books_file(books_path)
+    if use_snapshot:
+        try:
+            with metrics_module.timer('load.snapshot_write', kind='books'):
+                snapshot_module.save_books_snapshot(snapshot_path, books_path, records)
+            catalog = snapshot_module.load_books_snapshot(snapshot_path, books_path)
+            if catalog is not None:
+                return catalog
+        except OSError as e:
+            print(f'Error writing snapshot: {e}')
+    return snapshot_module.book_catalog(records)
+
+
+def _parse_rating_lines(lines, add, expect_header=False):
+    """
+    Parse lines of the ratings CSV file and pass every valid (user ID, ISBN, rating) triple to add.
+
+    Lines with a rating outside MIN_RATING to MAX_RATING count as malformed.
+
+    Parameters:
+    - lines (iterable): The lines to parse, without their trailing newline.
+    - add (callable): Called with each parsed user ID, ISBN and integer rating.
+    - expect_header (bool): Whether the first line is the file's header and should not count as malformed.
+
+    Returns:
+    - tuple: The number of ratings added and the number of malformed lines skipped.
+    """
+    rows = 0
+    malformed = 0
+    for line in lines:
+        is_header, expect_header = expect_header, False
+
+        parts = line.split(';')
+        if len(parts) != 3:
+            if line.strip():
+                malformed += 1
+            continue
+
+        user_id, isbn, rating = parts
+        try:
+            rating = int(rating.strip().strip('"'))
+        except ValueError:
+            if not is_header:
+                malformed += 1
+            continue
+        # Out-of-range ratings are malformed (they would not fit the store's rating column either)
+        if not MIN_RATING <= rating <= MAX_RATING:
+            malformed += 1
+            continue
+
+        add(user_id.strip().strip('"'), isbn.strip().strip('"'), rating)
+        rows += 1
+
+    return rows, malformed
+
+
 # Returns a nested dictionary of books (ISBN, title, author, year, and ratings)
-def load_books_dataset():
+def load_books_dataset(books_path='Books.csv', ratings_path='Book-Ratings.csv', use_snapshot=True, workers=1,
+                       fresh=False, shared=True):
     """
-    Load the book dataset from the CSV file and return a dictionary containing book information.
+    Load the book dataset from the CSV files and return a mapping of ISBN to book information.
+
+    Titles, authors and years are decoded from the (memory-mapped) book catalog only when a book
+    is looked up, with the recently used ones cached (see BookProfile). Each book's 'ratings' entry
+    is a read-only view (user ID -> rating) on the shared rating store, which keeps up with ratings
+    added later through append_ratings. fresh and shared are passed to load_rating_store.
     """
+    books_data = {}
     try:
-        books_data = {}
-    
-        # Load Books.csv file and extract information for each book
-        with open('Books.csv', encoding='ISO-8859-1') as file:
-            for line in file:
-                # Split the line into parts and strip whitespace from each part
-                parts = line.strip().split(';')
-                isbn, title, author, year = map(str.strip, parts[:4])
-                isbn = isbn.strip('""')
-                
-                # Initialize the ratings sub-dictionary for each book
-                books_data[isbn] = {
-                    'title': title,
-                    'author': author,
-                    'year': year,
-                    'ratings': {}
-                }
-
-        # Load Book-Ratings.csv file and append ratings to corresponding books
-        with open('Book-Ratings.csv', encoding='ISO-8859-1') as file:
-            for line in file:
-                # Split the line into parts and strip whitespace from each part
-                parts = line.strip().split(';')
-                user_id, isbn, rating = map(str.strip, parts)
-                isbn = isbn.strip('""')
-                user_id = user_id.strip('""')
-                
-                if isbn in books_data:
-                    # Add the rating to the ratings sub-dictionary of the corresponding book
-                    books_data[isbn]['ratings'][user_id] = rating
-                else:
-                    # If the book doesn't exist in the dataset, create a new entry
-                    books_data[isbn] = {
-                        'title': 'N/A',
-                        'author': 'N/A',
-                        'year': 'N/A',
-                        'ratings': {user_id: rating}
-                    }
+        store = load_rating_store(ratings_path, use_snapshot, workers, fresh, shared)
+        books_data = BookProfile(store, load_book_catalog(books_path, use_snapshot, workers))
 
     except IOError as e:
         print(f'Error loading dataset: {e}')
@@ -50,27 +429,15 @@ def load_books_dataset():
 
 
 # Returns a nested dictionary of users (UserID, ISBN, Book-Rating)
-def load_users_dataset():
+def load_users_dataset(ratings_path='Book-Ratings.csv', use_snapshot=True, workers=1, fresh=False):
     """
-    Load the user dataset from the CSV file and return a dictionary containing user ratings.
+    Load the user dataset from the CSV file and return a mapping of user ID to that user's ratings.
+
+    Each user's ratings are a read-only view (ISBN -> rating) on the shared rating store.
     """
+    users_data = {}
     try:
-        users_data = {}
-
-        # Load Book-Ratings.csv file and organize ratings by user ID
-        with open('Book-Ratings.csv', encoding='ISO-8859-1') as file:
-            for line in file:
-                # Split the line into parts and strip whitespace from each part
-                user_id, isbn, rating = map(str.strip, line.split(';'))
-                user_id = user_id.strip('""')
-                isbn = isbn.strip('""')
-                
-                if user_id in users_data:
-                    # Add the rating to the user's ratings dictionary
-                    users_data[user_id][isbn] = rating
-                else:
-                    # If the user doesn't exist in the dataset, create a new entry
-                    users_data[user_id] = {isbn: rating}
+        users_data = UserProfile(load_rating_store(ratings_path, use_snapshot, workers, fresh))
 
     except IOError as e:
         print(f'Error loading dataset: {e}')
@@ -78,13 +445,112 @@ def load_users_dataset():
     return users_data
 
 
-def n_top_books(number, books):
-    # Sort the dictionary items by the 'title' key in the inner dictionary values in ascending order
-    sorted_books = sorted(books.items(), key=lambda x: x[1]['title'], reverse=False)
-    
-    # Get the items
-    n_books = sorted_books[:number]
+def append_ratings(triples, books):
+    """
+    Add new ratings to loaded datasets in place, instead of reloading the CSV files.
+
+    The rating store (and with it every book and user view, the statistics and the caches
+    registered on the store) is updated; books not seen before show up with 'N/A' details.
+
+    Parameters:
+    - triples (iterable): (user ID, ISBN, rating) triples.
+    - books (BookProfile): The book data returned by load_books_dataset.
+
+    Returns:
+    - int: The number of ratings that were added or changed.
+    """
+    store = books.store
+    with metrics_module.timer('load.append_ratings'):
+        changes = store.add_ratings(triples)
+    metrics_module.increment('load.appended_ratings', len(changes))
+    return len(changes)
+
+
+def apply_ratings_log(log_path, books, offset=0):
+    """
+    Apply the ratings appended to a ratings log (same format as Book-Ratings.csv) since a byte offset.
+
+    Only complete lines are read; a partially written last line is left for the next call.
+
+    Parameters:
+    - log_path (str): The path of the append-only ratings log.
+    - books (BookProfile): The book data returned by load_books_dataset.
+    - offset (int): The byte offset up to which the log has already been applied.
+
+    Returns:
+    - tuple: The new offset, the number of ratings read and the number of malformed lines skipped.
+    """
+    try:
+        with open(log_path, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+    except IOError as e:
+        print(f'Error reading ratings log: {e}')
+        return offset, 0, 0
+
+    end = data.rfind(b'\n') + 1
+    if not end:
+        return offset, 0, 0
+
+    triples = []
+    lines = data[:end].decode('ISO-8859-1').split('\n')
+    rows, malformed = _parse_rating_lines(lines, lambda *triple: triples.append(triple), expect_header=offset == 0)
+    append_ratings(triples, books)
+    return offset + end, rows, malformed
+
+
+def tail_ratings(log_path, books, poll_interval=1.0, from_end=False, stop=None):
+    """
+    Follow a ratings log, applying new ratings as they are appended (like tail -f).
+
+    Each poll applies everything appended since the last one as a single batch.
+    A log that shrinks (rotated or truncated) is read again from the start.
+
+    Parameters:
+    - log_path (str): The path of the append-only ratings log.
+    - books (BookProfile): The book data returned by load_books_dataset.
+    - poll_interval (float): Seconds between polls.
+    - from_end (bool): Skip the ratings already in the log when tailing starts.
+    - stop (threading.Event): Optional event that ends tailing when set (otherwise runs until interrupted).
+
+    Returns:
+    - int: The byte offset up to which the log was applied.
+    """
+    offset = os.path.getsize(log_path) if from_end and os.path.exists(log_path) else 0
+    while stop is None or not stop.is_set():
+        if os.path.exists(log_path) and os.path.getsize(log_path) < offset:
+            offset = 0
+        start = time.perf_counter()
+        offset, rows, malformed = apply_ratings_log(log_path, books, offset)
+        if rows or malformed:
+            print(f"Applied {rows} ratings in {(time.perf_counter() - start) * 1000:.1f} ms "
+                  f"({malformed} malformed lines skipped)")
+
+        if stop is None:
+            time.sleep(poll_interval)
+        else:
+            stop.wait(poll_interval)
+    return offset
+
+
+def n_top_books(number, books, verbose=True):
+    """
+    Print (unless verbose is False) and return the first n books ordered by title.
+
+    Returns:
+    - list: (ISBN, book details) tuples.
+    """
+    # Select the n books with the smallest title in a bounded heap; only the n kept are fully decoded
+    n_books = []
+    # A failed load leaves an empty dictionary, which lists no books
+    if isinstance(books, BookProfile):
+        with metrics_module.timer('listing.top_books'):
+            top_titles = top_k(books.titles(), number, key=lambda x: x[1], largest=False)
+            n_books = [(isbn, books[isbn]) for isbn, _ in top_titles]
     
+    if not verbose:
+        return n_books
+
     # Print the top 10 items with formatted details
     print(f"\nTop {number} books and their details:")
     for item in n_books:
@@ -95,15 +561,31 @@ def n_top_books(number, books):
         print("Year:", book_details['year'])
         print()
 
+    return n_books
 
-def n_top_users(number, users):
-    # Sort the dictionary items by the number of ratings in descending order
-    sorted_users = sorted(users.items(), key=lambda x: len(x[1]), reverse=True)
-    
-    # Get the top users
-    top_users = sorted_users[:number]
+
+def n_top_users(number, users, verbose=True):
+    """
+    Print (unless verbose is False) and return the n users with the most ratings.
+
+    Returns:
+    - list: (user ID, number of ratings) tuples.
+    """
+    # Select the users with the most ratings from the precomputed counts in a bounded heap
+    top_users = []
+    # A failed load leaves an empty dictionary, which lists no users
+    if isinstance(users, UserProfile):
+        counts = users.store.user_stats.count
+        with metrics_module.timer('listing.top_users'):
+            top_users = [(users.store.users.name(user), counts[user])
+                         for user in top_k(range(len(counts)), number, key=counts.__getitem__)]
     
+    if not verbose:
+        return top_users
+
     # Print the top users with formatted details
     print(f"\nTop {number} users:")
-    for user_id, user_data in top_users:
+    for user_id, _ in top_users:
         print("User ID:", user_id)
+
+    return top_users
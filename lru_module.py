@@ -0,0 +1,102 @@
+from collections import OrderedDict
+
+
+class LruCache:
+    """
+    Size-bounded mapping that evicts the least recently used entry when full.
+
+    Hits, misses, evictions and invalidations are counted so the cache can be sized (see stats).
+    A cache can be tied to a data version: check_version drops every entry once the version moves on.
+    It can be shared between threads without a lock: every step is a single dictionary operation
+    and a lost race costs at most a recomputation.
+
+    Parameters:
+    - maxsize (int): The maximum number of entries kept (0 disables caching).
+    - version (int): The data version the entries are valid for.
+    """
+
+    def __init__(self, maxsize=1024, version=0):
+        self.maxsize = maxsize
+        self.version = version
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key (marking it as recently used), or default if it is not cached.
+        """
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        try:
+            self.entries.move_to_end(key)
+        except KeyError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """
+        Cache a value, evicting the least recently used entries beyond maxsize.
+        """
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        try:
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        except KeyError:
+            pass
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """
+        Drop every entry whose key satisfies predicate(key).
+        """
+        for key in list(self.entries):
+            if predicate(key):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def check_version(self, version):
+        """
+        Drop every entry if the data version differs from the one the entries were cached for.
+        """
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.version = version
+
+    def stats(self):
+        """
+        Return the cache counters and occupancy as a dictionary.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'version': self.version
+        }
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,175 @@
+import argparse
+import random
+import time
+from array import array
+
+import load_dataset_module
+import similarity_engine_module
+
+# Universal hashing h(x) = (a * x + b) mod MERSENNE_PRIME over dense user IDs
+MERSENNE_PRIME = (1 << 31) - 1
+SIGNATURE_TYPECODE = 'I'
+
+
+class LshIndex:
+    """
+    MinHash signatures of every book's rater set, bucketed with banded locality-sensitive hashing.
+
+    Two books land in the same bucket of a band when their signatures agree on all rows of that band,
+    which happens with probability J ** rows for rater sets with Jaccard similarity J.
+    With b bands, books become candidates with probability 1 - (1 - J ** rows) ** bands.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - bands (int): The number of bands.
+    - rows (int): The number of signature rows per band.
+    - seed (int): Seed of the hash functions.
+    """
+
+    def __init__(self, store, bands=20, rows=5, seed=1):
+        self.store = store
+        self.bands = bands
+        self.rows = rows
+        self.num_hashes = bands * rows
+        self.signatures = minhash_signatures(store, self.num_hashes, seed)
+        self.buckets = self._bucket()
+
+    def _bucket(self):
+        buckets = {}
+        num_hashes, rows = self.num_hashes, self.rows
+        for item in range(self.store.num_items):
+            _, _, lo, hi = self.store.item_slice(item)
+            if lo == hi:
+                continue
+            start = item * num_hashes
+            for band in range(self.bands):
+                band_start = start + band * rows
+                key = (band, self.signatures[band_start:band_start + rows].tobytes())
+                buckets.setdefault(key, []).append(item)
+        return buckets
+
+    def candidates(self, item):
+        """
+        Return the books sharing at least one bucket with the target, in ascending ID order.
+        """
+        start = item * self.num_hashes
+        found = set()
+        for band in range(self.bands):
+            band_start = start + band * self.rows
+            key = (band, self.signatures[band_start:band_start + self.rows].tobytes())
+            found.update(self.buckets.get(key, ()))
+        found.discard(item)
+        return sorted(found)
+
+
+def minhash_signatures(store, num_hashes, seed=1):
+    """
+    Compute num_hashes MinHash values of every book's set of raters.
+
+    Returns:
+    - array: num_items * num_hashes values; row i holds the signature of book i
+      (all MERSENNE_PRIME for books without ratings).
+    """
+    rng = random.Random(seed)
+    num_items, num_users = store.num_items, store.num_users
+    item_slice = store.item_slice
+    signatures = array(SIGNATURE_TYPECODE, [MERSENNE_PRIME]) * (num_items * num_hashes)
+
+    for hash_index in range(num_hashes):
+        a = rng.randrange(1, MERSENNE_PRIME)
+        b = rng.randrange(0, MERSENNE_PRIME)
+        # Hash every user once, then take the minimum over each book's raters
+        hashed = array(SIGNATURE_TYPECODE, [(a * user + b) % MERSENNE_PRIME for user in range(num_users)])
+        lookup = hashed.__getitem__
+        for item in range(num_items):
+            item_users, _, lo, hi = item_slice(item)
+            if lo < hi:
+                signatures[item * num_hashes + hash_index] = min(map(lookup, item_users[lo:hi]))
+
+    return signatures
+
+
+def approximate_similar_items(store, index, item, k, metric='euclidean', p=1, min_support=1):
+    """
+    Return the k most similar books among the target's LSH bucket-mates, scored with the exact metric.
+
+    Returns:
+    - list: (book ID, metric value) tuples, most similar first.
+    """
+    return similarity_engine_module.rank_candidates(store, item, index.candidates(item), k, metric, p, min_support)
+
+
+def measure_recall(store, index, items, k=10, metric='cosine', p=1, min_support=1):
+    """
+    Compare approximate search against exact search on sample books.
+
+    Recall@k is tie-aware: an approximate result counts as a hit if it scores at least as well as the
+    exact k-th result, since many books share the same score and either one is a correct answer.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - index (LshIndex or SimHashIndex): The approximate index to evaluate.
+    - items (iterable): The dense IDs of the books to query.
+    - k (int): The number of results per query.
+    - metric (str): One of similarity_engine_module.METRICS.
+
+    Returns:
+    - dict: Mean recall@k, mean candidates scored and mean latency (seconds) of both modes.
+    """
+    largest = metric not in similarity_engine_module.DISTANCE_METRICS
+    recall_sum = 0.0
+    candidates_sum = 0
+    exact_seconds = approx_seconds = 0.0
+    queries = 0
+
+    for item in items:
+        start = time.perf_counter()
+        exact = similarity_engine_module.top_similar_items(store, item, k, metric, p, min_support=min_support)
+        exact_seconds += time.perf_counter() - start
+        if not exact:
+            continue
+
+        start = time.perf_counter()
+        approx = approximate_similar_items(store, index, item, k, metric, p, min_support)
+        approx_seconds += time.perf_counter() - start
+
+        cutoff = exact[-1][1]
+        hits = sum(1 for _, score in approx if (score >= cutoff if largest else score <= cutoff))
+        recall_sum += min(hits, len(exact)) / len(exact)
+        candidates_sum += len(index.candidates(item))
+        queries += 1
+
+    queries = queries or 1
+    return {
+        'recall': recall_sum / queries,
+        'candidates': candidates_sum / queries,
+        'exact_seconds': exact_seconds / queries,
+        'approx_seconds': approx_seconds / queries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure MinHash/LSH recall@k against exact search.')
+    parser.add_argument('--ratings', default='Book-Ratings.csv', help='path of Book-Ratings.csv')
+    parser.add_argument('--bands', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=5)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--metric', default='cosine', choices=similarity_engine_module.METRICS)
+    parser.add_argument('--sample', type=int, default=100, help='number of books queried')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    store = load_dataset_module.load_rating_store(args.ratings)
+    start = time.perf_counter()
+    index = LshIndex(store, args.bands, args.rows, args.seed)
+    print(f"Built LSH index ({args.bands} bands x {args.rows} rows) in {time.perf_counter() - start:.2f}s")
+
+    rated = [item for item in range(store.num_items) if store.item_stats.count[item]]
+    sample = random.Random(args.seed).sample(rated, min(args.sample, len(rated)))
+    report = measure_recall(store, index, sample, args.k, args.metric)
+    print(f"recall@{args.k}: {report['recall']:.3f}, candidates scored: {report['candidates']:.0f}, "
+          f"exact: {report['exact_seconds'] * 1000:.2f} ms, approximate: {report['approx_seconds'] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
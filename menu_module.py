@@ -1,5 +1,7 @@
 
 import load_dataset_module
+import profiling_module
+import recommend_module
 import similarity_module
 
 def get_details_menu(book_profile, user_profile):
@@ -43,9 +45,10 @@ def find_similar_users_menu(user_profile):
         print("\nChoose a method to calculate similarity:")
         print("1. Pearson Correlation Coefficient")
         print("2. Manhattan Distance")
-        print("3. Back to Main Menu")
+        print("3. Compare All Measures")
+        print("4. Back to Main Menu")
 
-        choice = input("\nEnter your choice (1-3): ")
+        choice = input("\nEnter your choice (1-4): ")
 
         if choice == "1":
             user1 = input("\nEnter the first user: ")
@@ -64,10 +67,17 @@ def find_similar_users_menu(user_profile):
             print("Explanation:", explanation)
             
         elif choice == "3":
+            user1 = input("\nEnter the first user: ")
+            user2 = input("\nEnter the second user: ")
+            
+            _, explanation = similarity_module.compare_all_metrics(user1, user2, user_profile)
+            print("\n" + explanation)
+            
+        elif choice == "4":
             break
             
         else:
-            print("Invalid choice. Please enter a number between 1 and 3.")
+            print("Invalid choice. Please enter a number between 1 and 4.")
 
 
 def find_similar_books_menu(book_profile):    
@@ -79,9 +89,10 @@ def find_similar_books_menu(book_profile):
         print("1. Euclidean Distance")
         print("2. Cosine similarity")
         print("3. Minkowski Distance")
-        print("4. Back to Main Menu")
+        print("4. Compare All Measures")
+        print("5. Back to Main Menu")
 
-        choice = input("\nEnter your choice (1-4): ")
+        choice = input("\nEnter your choice (1-5): ")
 
         if choice == "1":
             book1 = input("\nEnter the first book: ")
@@ -108,7 +119,68 @@ def find_similar_books_menu(book_profile):
             print("Explanation:", explanation)
             
         elif choice == "4":
+            book1 = input("\nEnter the first book: ")
+            book2 = input("\nEnter the second book: ")
+            
+            _, explanation = similarity_module.compare_all_metrics(book1, book2, book_profile)
+            print("\n" + explanation)
+            
+        elif choice == "5":
             break
             
         else:
-            print("Invalid choice. Please enter a number between 1 and 4.")
\ No newline at end of file
+            print("Invalid choice. Please enter a number between 1 and 5.")
+
+def recommend_books_menu(book_profile, user_profile):
+    """
+    Display menu options for recommending books.
+    """
+    while True:
+        print("\nChoose how to recommend books:")
+        print("1. Books Similar to a Book")
+        print("2. Books for a User")
+        print("3. Back to Main Menu")
+
+        choice = input("\nEnter your choice (1-3): ")
+
+        if choice == "1":
+            print("\nGet 'N' number of similar books:")
+            ISBN = input("\nEnter the ISBN: ")
+            try:
+                number = int(input("\nEnter the total number of required book recommendation: "))
+            except ValueError:
+                print("\nInvalid input for number. Please enter an integer.")
+                continue
+
+            # Profiled when BOOKREC_PROFILE names a directory (see profiling_module)
+            with profiling_module.profiled(f'find_n_similar_books-{ISBN}'):
+                similarity_module.find_n_similar_books(ISBN, number, book_profile)
+
+        elif choice == "2":
+            user_id = input("\nEnter the user ID: ")
+            if user_id not in user_profile:
+                print("User not found in data.")
+                continue
+
+            try:
+                number = int(input("\nEnter the total number of required book recommendation: "))
+            except ValueError:
+                print("\nInvalid input for number. Please enter an integer.")
+                continue
+
+            with profiling_module.profiled(f'recommend-{user_id}'):
+                recommendations = recommend_module.recommend_for_user(user_id, number, user_profile)
+            if not recommendations:
+                print("No recommendations found for this user.")
+            for isbn, predicted in recommendations:
+                details = book_profile.get(isbn, {})
+                print("\nBook ID:", isbn)
+                print("Title:", details.get('title', 'N/A'))
+                print("Author:", details.get('author', 'N/A'))
+                print(f"Predicted Rating: {predicted:.2f}")
+
+        elif choice == "3":
+            break
+
+        else:
+            print("Invalid choice. Please enter a number between 1 and 3.")
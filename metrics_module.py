@@ -0,0 +1,282 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Instrumentation is off unless this variable is set (to anything but 0) or enable() is called
+ENABLE_VARIABLE = 'BOOKREC_METRICS'
+
+# When set, a snapshot is written to this file at exit (Prometheus text for .prom/.txt, JSON otherwise)
+DUMP_VARIABLE = 'BOOKREC_METRICS_FILE'
+
+# Upper bounds of the latency buckets in seconds: powers of two from 1 microsecond to about 67 seconds
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(27))
+
+PROMETHEUS_PREFIX = 'bookrec_'
+
+enabled = os.environ.get(ENABLE_VARIABLE, '0') not in ('', '0')
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class Histogram:
+    """
+    Latency histogram over fixed buckets, cheap to update and to merge across runs.
+
+    Quantiles are estimated by interpolating inside the bucket that holds them, so their
+    error is bounded by the bucket width (a factor of two).
+    """
+
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        Return the estimated q-quantile (0 <= q <= 1) of the observed values, or 0.0 if there are none.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(max(estimate, self.min), self.max)
+            seen += count
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.50),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': list(self.counts)
+        }
+
+
+class _Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _observe(self.key, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable():
+    """
+    Turn instrumentation on (it starts off unless BOOKREC_METRICS is set).
+    """
+    global enabled
+    enabled = True
+
+
+def disable():
+    """
+    Turn instrumentation off; the values recorded so far are kept.
+    """
+    global enabled
+    enabled = False
+
+
+def reset():
+    """
+    Drop every recorded counter and histogram.
+    """
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def _observe(key, seconds):
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def timer(name, **labels):
+    """
+    Return a context manager recording the duration of its block in the histogram of name and labels.
+
+    When instrumentation is off, a shared no-op context manager is returned instead.
+
+    Parameters:
+    - name (str): The operation or stage, e.g. 'similarity.one_vs_all.scoring'.
+    - labels: Extra dimensions of the measurement, e.g. metric='cosine'.
+    """
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(_key(name, labels))
+
+
+def observe(name, seconds, **labels):
+    """
+    Record a duration measured by the caller (ignored when instrumentation is off).
+    """
+    if enabled:
+        _observe(_key(name, labels), seconds)
+
+
+def increment(name, amount=1, **labels):
+    """
+    Add amount to the counter of name and labels (ignored when instrumentation is off).
+    """
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def snapshot():
+    """
+    Return every counter and histogram as a JSON-serialisable dictionary.
+
+    Returns:
+    - dict: 'enabled', 'timestamp', 'counters' and 'histograms' (lists of entries with 'name' and 'labels';
+      histogram entries carry count, sum, min, max, mean, p50, p95, p99 in seconds and the bucket counts).
+    """
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        histograms = [{'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                      for (name, labels), histogram in sorted(_histograms.items())]
+    return {'enabled': enabled, 'timestamp': time.time(), 'bucket_bounds': list(BUCKETS),
+            'counters': counters, 'histograms': histograms}
+
+
+def to_json(indent=None):
+    return json.dumps(snapshot(), indent=indent)
+
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + ''.join(char if char.isalnum() else '_' for char in name)
+
+
+def _prometheus_labels(labels, extra=None):
+    items = list(labels.items()) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+def to_prometheus():
+    """
+    Return the counters and histograms in the Prometheus text exposition format.
+
+    Counters become NAME_total and histograms NAME_seconds (with cumulative buckets, _sum and _count),
+    where NAME is the operation name prefixed with 'bookrec_' and with dots replaced by underscores.
+    """
+    data = snapshot()
+    lines = []
+    typed = set()
+    for counter in data['counters']:
+        name = _prometheus_name(counter['name']) + '_total'
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} counter')
+        lines.append(f"{name}{_prometheus_labels(counter['labels'])} {counter['value']}")
+
+    for histogram in data['histograms']:
+        name = _prometheus_name(histogram['name']) + '_seconds'
+        if name not in typed:
+            typed.add(name)
+            lines.append(f'# TYPE {name} histogram')
+        labels = histogram['labels']
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram['buckets']):
+            cumulative += count
+            lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': f'{bound:.6g}'})} {cumulative}")
+        lines.append(f"{name}_bucket{_prometheus_labels(labels, {'le': '+Inf'})} {histogram['count']}")
+        lines.append(f"{name}_sum{_prometheus_labels(labels)} {histogram['sum']}")
+        lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+def dump(path, fmt=None):
+    """
+    Write a snapshot to a file.
+
+    Parameters:
+    - path (str): The file to write.
+    - fmt (str): 'json' or 'prometheus' (by default Prometheus for .prom and .txt files, JSON otherwise).
+    """
+    if fmt is None:
+        fmt = 'prometheus' if path.endswith(('.prom', '.txt')) else 'json'
+    text = to_prometheus() if fmt == 'prometheus' else to_json(indent=2)
+    try:
+        with open(path, 'w') as file:
+            file.write(text)
+    except IOError as e:
+        print(f'Error writing metrics: {e}')
+
+
+def report(file=None):
+    """
+    Print a table of the counters and of the latency percentiles per operation.
+    """
+    data = snapshot()
+    for counter in data['counters']:
+        labels = ','.join(f'{key}={value}' for key, value in counter['labels'].items())
+        print(f"{counter['name']:<40}{labels:<48}{counter['value']:>12}", file=file)
+    print(f"{'operation':<40}{'labels':<48}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total s':>10}",
+          file=file)
+    for histogram in data['histograms']:
+        labels = ','.join(f'{key}={value}' for key, value in histogram['labels'].items())
+        print(f"{histogram['name']:<40}{labels:<48}{histogram['count']:>8}{histogram['p50'] * 1000:>10.3f}"
+              f"{histogram['p95'] * 1000:>10.3f}{histogram['p99'] * 1000:>10.3f}{histogram['sum']:>10.3f}", file=file)
+
+
+if os.environ.get(DUMP_VARIABLE):
+    atexit.register(dump, os.environ[DUMP_VARIABLE])
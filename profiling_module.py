@@ -0,0 +1,325 @@
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# Profiling is off unless this variable names an output directory, or enable() is called
+DIRECTORY_VARIABLE = 'BOOKREC_PROFILE'
+# 'cprofile' (deterministic, per function) or 'sample' (statistical stack sampler, per line)
+MODE_VARIABLE = 'BOOKREC_PROFILE_MODE'
+
+DEFAULT_DIRECTORY = 'profiles'
+DEFAULT_KEEP = 50
+SAMPLE_INTERVAL = 0.001
+MODES = ('cprofile', 'sample')
+
+# Flame graphs deeper than this are cut, and cycles in the cProfile call graph are not followed
+MAX_STACK_DEPTH = 64
+
+# The file extensions written per query; the retention cap counts queries, not files
+EXTENSIONS = ('.pstats', '.folded', '.txt')
+
+
+class ProfileSettings:
+    """
+    Where and how queries are profiled.
+
+    Parameters:
+    - directory (str): The directory the profiles are written to (created if missing).
+    - mode (str): 'cprofile' or 'sample'.
+    - keep (int): The number of most recent query profiles kept; older ones are deleted.
+    - min_seconds (float): Only keep the profiles of queries that took at least this long.
+    - interval (float): Seconds between two samples in 'sample' mode.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, mode='cprofile', keep=DEFAULT_KEEP, min_seconds=0.0,
+                 interval=SAMPLE_INTERVAL):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', expected one of: {', '.join(MODES)}.")
+        self.directory = directory
+        self.mode = mode
+        self.keep = keep
+        self.min_seconds = min_seconds
+        self.interval = interval
+
+
+# The global settings (None when profiling is off) and the settings used by queries that force profiling
+settings = (ProfileSettings(os.environ[DIRECTORY_VARIABLE], os.environ.get(MODE_VARIABLE, 'cprofile'))
+            if os.environ.get(DIRECTORY_VARIABLE) else None)
+_forced_settings = ProfileSettings()
+
+_sequence = itertools.count()
+_lock = threading.Lock()
+# Profilers cannot nest: a query profiled inside another one is covered by the outer profile
+_active = threading.local()
+# The switch interval is process-wide: the first running sampler saves it and the last one restores it
+_samplers_running = 0
+_saved_switch_interval = None
+
+
+def enable(directory=DEFAULT_DIRECTORY, mode='cprofile', keep=DEFAULT_KEEP, min_seconds=0.0,
+           interval=SAMPLE_INTERVAL):
+    """
+    Profile every query from now on (see ProfileSettings for the parameters).
+    """
+    global settings
+    settings = ProfileSettings(directory, mode, keep, min_seconds, interval)
+
+
+def disable():
+    """
+    Stop profiling queries that do not ask for it themselves.
+    """
+    global settings
+    settings = None
+
+
+class _NoProfile:
+    __slots__ = ()
+    path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_PROFILE = _NoProfile()
+
+
+def profiled(name, force=None):
+    """
+    Return a context manager profiling its block as one query.
+
+    Parameters:
+    - name (str): The query's name, used in the file names (e.g. 'similar_books-0451524934').
+    - force (bool): True to profile this query even when profiling is off, False to never profile it,
+      None to follow the global setting.
+
+    Returns:
+    - context manager: Its path attribute is set, on exit, to the written profile's path without
+      extension (None if nothing was written).
+    """
+    if force is False or (force is None and settings is None) or getattr(_active, 'running', False):
+        return _NO_PROFILE
+    return QueryProfile(name, settings if settings is not None else _forced_settings)
+
+
+class QueryProfile:
+    """
+    Profile of one query, written to the settings' directory when the query finishes.
+
+    'cprofile' mode writes NAME.pstats (load it with pstats.Stats) and NAME.folded, collapsed stacks
+    rebuilt from the cProfile call graph. 'sample' mode writes NAME.folded, with one frame per
+    function and line so the hot lines show, and NAME.txt, the lines with the most samples.
+    The .folded files are in the collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.settings = settings
+        self.path = None
+        self.profiler = None
+        self.sampler = None
+        self.skipped = False
+
+    def __enter__(self):
+        _active.running = True
+        if self.settings.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+        else:
+            self.sampler = StackSampler(threading.get_ident(), self.settings.interval)
+            self.sampler.start()
+        self.start = time.perf_counter()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another thread holds the interpreter-wide profiler (Python 3.12+): skip this query
+                self.profiler = None
+                self.skipped = True
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+        elapsed = time.perf_counter() - self.start
+        if self.sampler is not None:
+            self.sampler.stop()
+        _active.running = False
+
+        if not self.skipped and elapsed >= self.settings.min_seconds:
+            try:
+                self.path = self._write(elapsed)
+            except OSError as e:
+                print(f'Error writing profile: {e}')
+
+    def _write(self, elapsed):
+        directory = self.settings.directory
+        os.makedirs(directory, exist_ok=True)
+        with _lock:
+            sequence = next(_sequence)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', self.name)[:80]
+        stem = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence:06d}-{safe_name}"
+        path = os.path.join(directory, stem)
+
+        if self.profiler is not None:
+            stats = pstats.Stats(self.profiler)
+            stats.dump_stats(path + '.pstats')
+            stacks = folded_from_stats(stats)
+        else:
+            stacks = self.sampler.stacks
+            with open(path + '.txt', 'w') as file:
+                file.write(f"{self.name}: {elapsed * 1000:.2f} ms, {self.sampler.samples} samples "
+                           f"every {self.settings.interval * 1000:g} ms\n\n")
+                file.write(hot_lines_report(stacks))
+
+        with open(path + '.folded', 'w') as file:
+            for stack, weight in sorted(stacks.items()):
+                file.write(f"{stack} {weight}\n")
+
+        prune(directory, self.settings.keep)
+        return path
+
+
+class StackSampler:
+    """
+    Sample the stack of one thread at a fixed interval from a background thread.
+
+    Sampling needs the GIL, which a busy thread only hands over every sys.getswitchinterval() seconds,
+    so the switch interval is lowered to the sampling interval while any sampler is running, and
+    restored to its original value when the last one stops.
+
+    Parameters:
+    - thread_id (int): The ident of the thread to sample.
+    - interval (float): Seconds between two samples.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        global _samplers_running, _saved_switch_interval
+        with _lock:
+            if _samplers_running == 0:
+                _saved_switch_interval = sys.getswitchinterval()
+            _samplers_running += 1
+            sys.setswitchinterval(min(sys.getswitchinterval(), self.interval))
+        self._thread.start()
+
+    def stop(self):
+        global _samplers_running
+        self._stop.set()
+        self._thread.join()
+        with _lock:
+            _samplers_running -= 1
+            if _samplers_running == 0:
+                sys.setswitchinterval(_saved_switch_interval)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            frames = []
+            while frame is not None and len(frames) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            # Skip the samples taken while the profile itself is being stopped
+            if any(entry.startswith('__exit__ (profiling_module.py') for entry in frames):
+                continue
+            self.stacks[';'.join(reversed(frames))] += 1
+            self.samples += 1
+
+
+def _label(function):
+    filename, line, name = function
+    if filename == '~':
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def folded_from_stats(stats, unit=1e-6):
+    """
+    Rebuild collapsed stacks from a cProfile call graph, weighted in microseconds.
+
+    cProfile records caller -> callee edges, not whole stacks, so a function's time is split between
+    its callers in proportion to the time of each call edge. The result is exact for call trees
+    and an estimate where a function is reached by several paths.
+
+    Returns:
+    - Counter: 'outer;...;inner' stack -> self time spent there, in units.
+    """
+    entries = stats.stats
+    callees = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+    roots = [function for function, entry in entries.items() if not any(caller in entries for caller in entry[4])]
+    if not roots:
+        roots = [max(entries, key=lambda function: entries[function][3])]
+
+    stacks = Counter()
+
+    def walk(function, share, path, on_path):
+        _, _, own, cumulative, _ = entries[function]
+        path = path + (_label(function),)
+        fraction = share / cumulative if cumulative else 0.0
+        weight = int(own * fraction / unit)
+        if weight:
+            stacks[';'.join(path)] += weight
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in callees.get(function, ()):
+            if callee not in on_path:
+                walk(callee, edge_time * fraction, path, on_path | {callee})
+
+    for root in roots:
+        walk(root, entries[root][3], (), frozenset((root,)))
+    return stacks
+
+
+def hot_lines_report(stacks, limit=30):
+    """
+    Return a text table of the lines with the most samples, counted where the time is spent (self)
+    and anywhere on the stack (total).
+    """
+    own = Counter()
+    total = Counter()
+    samples = sum(stacks.values()) or 1
+    for stack, weight in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += weight
+        for frame in set(frames):
+            total[frame] += weight
+
+    lines = [f"{'self %':>7}{'total %':>9}  line"]
+    for frame, weight in own.most_common(limit):
+        lines.append(f"{weight / samples:>7.1%}{total[frame] / samples:>9.1%}  {frame}")
+    return '\n'.join(lines) + '\n'
+
+
+def prune(directory, keep):
+    """
+    Delete the oldest query profiles in a directory beyond the keep most recent ones.
+    """
+    stems = sorted({name[:-len(extension)] for name in os.listdir(directory)
+                    for extension in EXTENSIONS if name.endswith(extension)})
+    for stem in stems[:max(0, len(stems) - keep)]:
+        for extension in EXTENSIONS:
+            try:
+                os.remove(os.path.join(directory, stem + extension))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,104 @@
+import math
+from array import array
+
+# Array type codes used for the statistics columns
+COUNT_TYPECODE = 'i'
+TOTAL_TYPECODE = 'q'
+DERIVED_TYPECODE = 'd'
+
+
+class RatingStats:
+    """
+    Per-row rating statistics of the store: count, sum, sum of squares, mean and L2 norm.
+
+    One instance covers every book (or every user), indexed by dense ID, in compact arrays.
+    The columns are computed once at load time and then kept up to date as ratings change.
+    """
+
+    def __init__(self, count, total, total_sq, mean, norm):
+        self.count = count
+        self.total = total
+        self.total_sq = total_sq
+        self.mean = mean
+        self.norm = norm
+
+    @classmethod
+    def from_rows(cls, ptr, values):
+        """
+        Compute the statistics of every row of a CSR/CSC column.
+
+        Parameters:
+        - ptr (array): Row offsets into values (one more entry than there are rows).
+        - values (array): The ratings of all rows, back to back.
+
+        Returns:
+        - RatingStats: The statistics of each row.
+        """
+        num_rows = len(ptr) - 1
+        count = array(COUNT_TYPECODE, bytes(num_rows * array(COUNT_TYPECODE).itemsize))
+        total = array(TOTAL_TYPECODE, bytes(num_rows * array(TOTAL_TYPECODE).itemsize))
+        total_sq = array(TOTAL_TYPECODE, bytes(num_rows * array(TOTAL_TYPECODE).itemsize))
+        mean = array(DERIVED_TYPECODE, bytes(num_rows * array(DERIVED_TYPECODE).itemsize))
+        norm = array(DERIVED_TYPECODE, bytes(num_rows * array(DERIVED_TYPECODE).itemsize))
+
+        for idx in range(num_rows):
+            row = values[ptr[idx]:ptr[idx + 1]]
+            n = len(row)
+            if not n:
+                continue
+            row_sum = sum(row)
+            row_sum_sq = sum(rating * rating for rating in row)
+            count[idx] = n
+            total[idx] = row_sum
+            total_sq[idx] = row_sum_sq
+            mean[idx] = row_sum / n
+            norm[idx] = math.sqrt(row_sum_sq)
+
+        return cls(count, total, total_sq, mean, norm)
+
+    def __len__(self):
+        return len(self.count)
+
+    def grow(self, size):
+        """
+        Extend the columns with empty rows so that IDs up to size - 1 are valid.
+        """
+        missing = size - len(self.count)
+        if missing <= 0:
+            return
+        self.count.extend([0] * missing)
+        self.total.extend([0] * missing)
+        self.total_sq.extend([0] * missing)
+        self.mean.extend([0.0] * missing)
+        self.norm.extend([0.0] * missing)
+
+    def add(self, idx, rating):
+        """
+        Account for a new rating in row idx.
+        """
+        self.count[idx] += 1
+        self.total[idx] += rating
+        self.total_sq[idx] += rating * rating
+        self._refresh(idx)
+
+    def remove(self, idx, rating):
+        """
+        Account for a rating removed from row idx.
+        """
+        self.count[idx] -= 1
+        self.total[idx] -= rating
+        self.total_sq[idx] -= rating * rating
+        self._refresh(idx)
+
+    def replace(self, idx, old_rating, new_rating):
+        """
+        Account for a rating in row idx changing from old_rating to new_rating.
+        """
+        self.total[idx] += new_rating - old_rating
+        self.total_sq[idx] += new_rating * new_rating - old_rating * old_rating
+        self._refresh(idx)
+
+    def _refresh(self, idx):
+        n = self.count[idx]
+        self.mean[idx] = self.total[idx] / n if n else 0.0
+        self.norm[idx] = math.sqrt(self.total_sq[idx])
@@ -0,0 +1,1024 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from itertools import compress, repeat
+from operator import add, mul, not_
+
+from lru_module import LruCache
+from rating_stats_module import RatingStats
+
+# Array type codes used by the rating store
+ID_TYPECODE = 'i'       # dense integer IDs for books and users
+OFFSET_TYPECODE = 'q'   # row offsets into the sorted columns
+RATING_TYPECODE = 'b'   # Book-Crossing ratings are integers from 0 to 10
+
+# The ratings accepted by the loaders and by add_ratings
+MIN_RATING = 0
+MAX_RATING = 10
+
+# Added ratings wait in per-row buffers until they exceed 1/DELTA_RATIO of the ratings (and DELTA_MIN_SIZE
+# entries); only then does the writer merge them into new sorted columns in one pass
+DELTA_RATIO = 32
+DELTA_MIN_SIZE = 1024
+
+# Book details decoded and kept in memory at a time, and the details of rated books missing from Books.csv
+BOOK_CACHE_SIZE = 4096
+PLACEHOLDER_DETAILS = ('N/A', 'N/A', 'N/A')
+
+# Which ratings the similarity APIs use: every interaction (rating 0 counted as a real zero) or explicit ratings only
+RATING_KINDS = ('all', 'explicit')
+
+
+class IdTable:
+    """
+    Intern string IDs (ISBNs or user IDs) to dense integer IDs.
+
+    IDs are handed out in order of first appearance, so the same input always produces the same table.
+    """
+
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+
+    def intern(self, name):
+        """
+        Return the dense ID of a name, assigning the next free ID if it has not been seen before.
+        """
+        idx = self.index.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self.index[name] = idx
+            self.names.append(name)
+        return idx
+
+    def get(self, name, default=None):
+        return self.index.get(name, default)
+
+    def name(self, idx):
+        return self.names[idx]
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class RatingsView(Mapping):
+    """
+    Read-only mapping view over one row of the rating store.
+
+    A book's row maps user IDs to ratings and a user's row maps ISBNs to ratings,
+    so it can stand in for the nested dictionaries the loaders used to return.
+    """
+
+    __slots__ = ('keys_table', 'ids', '_values', 'start', 'stop')
+
+    def __init__(self, keys_table, ids, values, start, stop):
+        self.keys_table = keys_table
+        self.ids = ids
+        self._values = values
+        self.start = start
+        self.stop = stop
+
+    def _position(self, name):
+        idx = self.keys_table.get(name)
+        if idx is None:
+            return -1
+        pos = bisect_left(self.ids, idx, self.start, self.stop)
+        if pos < self.stop and self.ids[pos] == idx:
+            return pos
+        return -1
+
+    def __getitem__(self, name):
+        pos = self._position(name)
+        if pos < 0:
+            raise KeyError(name)
+        return self._values[pos]
+
+    def __contains__(self, name):
+        return self._position(name) >= 0
+
+    def __iter__(self):
+        names = self.keys_table.names
+        ids = self.ids
+        for pos in range(self.start, self.stop):
+            yield names[ids[pos]]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def row(self):
+        """
+        Return the sorted dense IDs and ratings of this row as zero-copy memoryviews.
+        """
+        return (memoryview(self.ids)[self.start:self.stop],
+                memoryview(self._values)[self.start:self.stop])
+
+    def by_id(self):
+        """
+        Return the row as a dictionary of dense ID to rating.
+        """
+        ids, values = self.row()
+        return dict(zip(ids, values))
+
+
+class BookRatingsView(RatingsView):
+    """
+    View over one book's ratings that follows the store, so it stays valid as ratings are added.
+
+    Unlike a plain RatingsView it does not pin the row; the book's current row is looked up on every access.
+    """
+
+    __slots__ = ('store', 'isbn')
+
+    def __init__(self, store, isbn):
+        self.store = store
+        self.isbn = isbn
+
+    def _view(self):
+        return self.store.book_ratings(self.isbn)
+
+    def __getitem__(self, user_id):
+        return self._view()[user_id]
+
+    def __contains__(self, user_id):
+        return user_id in self._view()
+
+    def __iter__(self):
+        return iter(self._view())
+
+    def __len__(self):
+        return len(self._view())
+
+    def row(self):
+        return self._view().row()
+
+
+class PendingRows:
+    """
+    Changes to some rows of CSR columns that have not been merged into the columns yet.
+
+    rows maps a row to {ID: new rating, or None to delete the entry}; ID-only columns use 0 for present entries.
+    """
+
+    __slots__ = ('rows', 'size')
+
+    def __init__(self):
+        self.rows = {}
+        self.size = 0
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def set(self, row, key, value):
+        entries = self.rows.get(row)
+        if entries is None:
+            entries = self.rows[row] = {}
+        if key not in entries:
+            self.size += 1
+        entries[key] = value
+
+    def get(self, row, key):
+        """
+        Return (True, value) if the entry of key in row has a pending change, else (False, None).
+        """
+        entries = self.rows.get(row)
+        if entries is None or key not in entries:
+            return False, None
+        return True, entries[key]
+
+    def merged_row(self, ptr, ids, values, row):
+        """
+        Return a row's sorted IDs and ratings (None for ID-only columns) as arrays, with its pending changes applied.
+        """
+        lo, hi = (ptr[row], ptr[row + 1]) if row < len(ptr) - 1 else (0, 0)
+        row_ids, row_values = _merge_row(ids[lo:hi], values[lo:hi] if values is not None else None, self.rows[row])
+        if values is None:
+            return array(ids.typecode, row_ids), None
+        return array(ids.typecode, row_ids), array(values.typecode, row_values)
+
+    def row_slice(self, columns, row):
+        """
+        Return (ids, values, start, stop) for a row of (ptr, ids, values) columns, with its pending changes applied.
+        """
+        ptr, ids, values = columns
+        if row in self.rows:
+            row_ids, row_values = self.merged_row(ptr, ids, values, row)
+            return row_ids, row_values, 0, len(row_ids)
+        return ids, values, ptr[row], ptr[row + 1]
+
+    def merged(self, columns):
+        """
+        Return new (ptr, ids, values) columns with every pending change applied; the given columns are not changed.
+        """
+        return _splice(*columns, self.rows)
+
+
+def _column(axis, index):
+    """
+    Return a read-only property for one of the (ptr, ids, values) columns of an axis.
+    """
+    return property(lambda self: getattr(self, axis)[index])
+
+
+class RatingStore:
+    """
+    Compact rating store shared by the book and user views.
+
+    Ratings are held once, sorted both by book (CSR style) and by user (CSC style):
+    - item_ptr[i]:item_ptr[i + 1] is the slice of item_users / item_ratings rated for book i.
+    - user_ptr[u]:user_ptr[u + 1] is the slice of user_items / user_ratings rated by user u.
+    Within a row the IDs are sorted in ascending order.
+    Per-book and per-user statistics (count, sum, sum of squares, mean, norm) are kept in item_stats and user_stats.
+
+    Book-Crossing encodes implicit interactions as rating 0. The columns above hold every interaction;
+    explicit holds the same IDs with the non-zero ratings only and implicit the rating-0 interactions
+    as ID-only rows. Both are split off on first use (once, even if several threads ask at the same time).
+
+    version counts changes to the ratings, so caches of derived results can tell when they are stale.
+    Ratings can be added in place with add_ratings; callbacks registered with on_change hear about every change.
+    Added ratings are buffered per row (see PendingRows) and merged by the writer once the buffers grow
+    past the DELTA_RATIO threshold. The columns above hold the merged ratings only: item_slice, user_slice
+    and the views apply a row's buffered changes on the fly, so readers go through them for current rows.
+    A merge builds new columns and swaps each orientation's (ptr, ids, values) tuple in one assignment,
+    so rows already handed out (e.g. the memoryviews of RatingsView.row) stay valid and unchanged.
+    Reads may run in several threads at once, but not while ratings are being added.
+    """
+
+    item_ptr = _column('_by_item', 0)
+    item_users = _column('_by_item', 1)
+    item_ratings = _column('_by_item', 2)
+    user_ptr = _column('_by_user', 0)
+    user_items = _column('_by_user', 1)
+    user_ratings = _column('_by_user', 2)
+
+    def __init__(self, items, users, item_ptr, item_users, item_ratings, user_ptr, user_items, user_ratings,
+                 item_stats=None, user_stats=None):
+        self.items = items
+        self.users = users
+        self._by_item = (item_ptr, item_users, item_ratings)
+        self._by_user = (user_ptr, user_items, user_ratings)
+        self._pending_items = PendingRows()
+        self._pending_users = PendingRows()
+        # Ratings added minus ratings deleted by the pending changes
+        self._pending_net = 0
+        self._merge_lock = threading.Lock()
+        self._split_lock = threading.Lock()
+        if item_stats is None:
+            item_stats = RatingStats.from_rows(item_ptr, item_ratings)
+        if user_stats is None:
+            user_stats = RatingStats.from_rows(user_ptr, user_ratings)
+        self.item_stats = item_stats
+        self.user_stats = user_stats
+        self._explicit = None
+        self._implicit = None
+        self.version = 0
+        self.listeners = []
+
+    @property
+    def num_items(self):
+        return len(self.items)
+
+    @property
+    def num_users(self):
+        return len(self.users)
+
+    @property
+    def num_ratings(self):
+        return len(self._by_item[1]) + self._pending_net
+
+    def item_slice(self, item):
+        """
+        Return (ids, values, start, stop): a book's sorted user IDs and ratings are ids[start:stop] and
+        values[start:stop], with its buffered changes applied.
+        """
+        # The buffers are read before the columns: a merge swaps the columns in before it clears them
+        return self._pending_items.row_slice(self._by_item, item)
+
+    def user_slice(self, user):
+        """
+        Return (ids, values, start, stop) for a user's sorted book IDs and ratings, as item_slice does for a book.
+        """
+        return self._pending_users.row_slice(self._by_user, user)
+
+    def columns(self):
+        """
+        Return the book-major and user-major (ptr, ids, values) columns with the buffered changes applied.
+
+        Nothing is merged into the store: with changes pending, the columns returned are new copies.
+        """
+        return self._pending_items.merged(self._by_item), self._pending_users.merged(self._by_user)
+
+    def item_view(self, item):
+        """
+        Return the ratings of a book, given its dense ID, as a view keyed by user ID.
+        """
+        return RatingsView(self.users, *self.item_slice(item))
+
+    def user_view(self, user):
+        """
+        Return the ratings of a user, given its dense ID, as a view keyed by ISBN.
+        """
+        return RatingsView(self.items, *self.user_slice(user))
+
+    def book_ratings(self, isbn):
+        """
+        Return the ratings of a book as a view keyed by user ID (empty if the book has no ratings).
+        """
+        item = self.items.get(isbn)
+        if item is None:
+            _, ids, values = self._by_item
+            return RatingsView(self.users, ids, values, 0, 0)
+        return self.item_view(item)
+
+    def ratings_by_user(self, user_id):
+        """
+        Return the ratings of a user as a view keyed by ISBN (empty if the user has no ratings).
+        """
+        user = self.users.get(user_id)
+        if user is None:
+            _, ids, values = self._by_user
+            return RatingsView(self.items, ids, values, 0, 0)
+        return self.user_view(user)
+
+    @property
+    def explicit(self):
+        """
+        The store restricted to explicit (non-zero) ratings, sharing this store's ID tables.
+        """
+        if self._explicit is None:
+            self._split_implicit()
+        return self._explicit
+
+    @property
+    def implicit(self):
+        """
+        The implicit (rating 0) interactions as ID-only rows, sharing this store's ID tables.
+        """
+        if self._implicit is None:
+            self._split_implicit()
+        return self._implicit
+
+    def select(self, ratings='all'):
+        """
+        Return the store the similarity APIs should use for one of RATING_KINDS.
+        """
+        if ratings == 'all':
+            return self
+        if ratings == 'explicit':
+            return self.explicit
+        raise ValueError(f"Unknown ratings '{ratings}', expected one of {', '.join(RATING_KINDS)}.")
+
+    def _split_implicit(self):
+        # Concurrent first queries wait for one split instead of each running their own
+        with self._split_lock:
+            if self._explicit is not None:
+                return
+            by_item, by_user = self.columns()
+            item_ptr, item_users, item_ratings, implicit_item_ptr, implicit_item_users = _split_rows(*by_item)
+            user_ptr, user_items, user_ratings, implicit_user_ptr, implicit_user_items = _split_rows(*by_user)
+
+            explicit = RatingStore(self.items, self.users, item_ptr, item_users, item_ratings,
+                                   user_ptr, user_items, user_ratings)
+            explicit._explicit = explicit
+            explicit._implicit = ImplicitInteractions(self.items, self.users,
+                                                      array(OFFSET_TYPECODE, [0]) * len(item_ptr),
+                                                      array(ID_TYPECODE),
+                                                      array(OFFSET_TYPECODE, [0]) * len(user_ptr),
+                                                      array(ID_TYPECODE))
+            # The implicit half goes first: a reader that sees the explicit store also finds the implicit one
+            self._implicit = ImplicitInteractions(self.items, self.users, implicit_item_ptr, implicit_item_users,
+                                                  implicit_user_ptr, implicit_user_items)
+            self._explicit = explicit
+
+    def on_change(self, callback):
+        """
+        Register callback(store, changes) to be called after ratings change (see add_ratings for changes).
+        """
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def rating(self, item, user):
+        """
+        Return the rating of a book by a user, given their dense IDs, or None if there is none.
+        """
+        pending, rating = self._pending_items.get(item, user)
+        if pending:
+            return rating
+        ptr, ids, values = self._by_item
+        if item >= len(ptr) - 1:
+            return None
+        lo, hi = ptr[item], ptr[item + 1]
+        pos = bisect_left(ids, user, lo, hi)
+        if pos < hi and ids[pos] == user:
+            return values[pos]
+        return None
+
+    def add_rating(self, user_id, isbn, rating):
+        return self.add_ratings([(user_id, isbn, rating)])
+
+    def add_ratings(self, triples):
+        """
+        Add or update ratings in place, without rebuilding the store.
+
+        Both orientations, the statistics and (once split off) the explicit and implicit stores are
+        updated; as when loading, the last rating of a user for a book wins. New entries go to per-row
+        buffers that are merged into new sorted columns only when they grow past 1/DELTA_RATIO of the
+        ratings, so each rating costs O(1) amortized.
+
+        The whole batch is checked first: if any rating is not an integer from MIN_RATING to MAX_RATING,
+        a ValueError is raised and nothing is changed.
+
+        Parameters:
+        - triples (iterable): (user ID, ISBN, rating) triples.
+
+        Returns:
+        - list: (book ID, user ID, old rating or None, new rating) for every rating that changed.
+        """
+        triples = list(triples)
+        for user_id, isbn, rating in triples:
+            if not isinstance(rating, int) or not MIN_RATING <= rating <= MAX_RATING:
+                raise ValueError(f"Invalid rating {rating!r} of book {isbn} by user {user_id}: "
+                                 f"expected an integer from {MIN_RATING} to {MAX_RATING}.")
+
+        self._thaw()
+        latest = {}
+        for user_id, isbn, rating in triples:
+            latest[self.items.intern(isbn), self.users.intern(user_id)] = rating
+        self._grow()
+
+        changes = []
+        for (item, user), rating in sorted(latest.items()):
+            old = self.rating(item, user)
+            if old != rating:
+                changes.append((item, user, old, rating))
+        if not changes:
+            return changes
+
+        self._apply(changes)
+        if self._explicit is not None and self._explicit is not self:
+            self._apply_split(changes)
+        return changes
+
+    def _apply(self, changes):
+        """
+        Apply (book, user, old rating, new rating) changes; an old rating of None inserts, a new one of None deletes.
+        """
+        pending_items, pending_users = self._pending_items, self._pending_users
+        for item, user, old, new in changes:
+            if old is None:
+                self.item_stats.add(item, new)
+                self.user_stats.add(user, new)
+                self._pending_net += 1
+            elif new is None:
+                self.item_stats.remove(item, old)
+                self.user_stats.remove(user, old)
+                self._pending_net -= 1
+            else:
+                self.item_stats.replace(item, old, new)
+                self.user_stats.replace(user, old, new)
+                if not pending_items.get(item, user)[0]:
+                    # An entry already in the columns gets its new value in place
+                    ptr, ids, values = self._by_item
+                    values[_find(ptr, ids, item, user)] = new
+                    ptr, ids, values = self._by_user
+                    values[_find(ptr, ids, user, item)] = new
+                    continue
+            pending_items.set(item, user, new)
+            pending_users.set(user, item, new)
+
+        if pending_items.size > max(DELTA_MIN_SIZE, len(self._by_item[1]) // DELTA_RATIO):
+            self.merge()
+        self.version += 1
+        for callback in self.listeners:
+            callback(self, changes)
+
+    def merge(self):
+        """
+        Merge the buffered changes into new sorted columns, in one pass over each column.
+
+        Called by the writer (add_ratings does it once the buffers pass the threshold). The old
+        columns are left untouched, so readers still holding rows of them are not affected.
+        """
+        with self._merge_lock:
+            if self._pending_items:
+                self._by_item = self._pending_items.merged(self._by_item)
+                self._pending_items = PendingRows()
+            if self._pending_users:
+                self._by_user = self._pending_users.merged(self._by_user)
+                self._pending_users = PendingRows()
+            self._pending_net = 0
+
+    def _apply_split(self, changes):
+        # Explicit ratings move in and out of the explicit store; rating-0 entries in and out of the implicit one
+        explicit_changes = []
+        implicit = self._implicit
+        implicit._thaw()
+        implicit._grow()
+        for item, user, old, new in changes:
+            old_explicit, new_explicit = old or None, new or None
+            if old_explicit != new_explicit:
+                explicit_changes.append((item, user, old_explicit, new_explicit))
+            if (old == 0) != (new == 0):
+                implicit.set(item, user, new == 0)
+
+        explicit = self._explicit
+        explicit._thaw()
+        explicit._grow()
+        if explicit_changes:
+            explicit._apply(explicit_changes)
+        if implicit._pending_items.size > max(DELTA_MIN_SIZE, len(implicit._by_item[1]) // DELTA_RATIO):
+            implicit.merge()
+
+    def _grow(self):
+        # Give books and users interned since the last change empty rows
+        self._by_item = _grown(self._by_item, self.num_items)
+        self._by_user = _grown(self._by_user, self.num_users)
+        self.item_stats.grow(self.num_items)
+        self.user_stats.grow(self.num_users)
+
+    def _thaw(self):
+        """
+        Replace memory-mapped (read-only) columns and ID tables with mutable copies before the first change.
+        """
+        if not isinstance(self.items, IdTable):
+            self.items = IdTable(self.items)
+        if not isinstance(self.users, IdTable):
+            self.users = IdTable(self.users)
+        self._by_item = _thawed_columns(self._by_item)
+        self._by_user = _thawed_columns(self._by_user)
+        for stats in (self.item_stats, self.user_stats):
+            _thaw_columns(stats, ('count', 'total', 'total_sq', 'mean', 'norm'))
+        for derived in (self._explicit, self._implicit):
+            if derived is not None:
+                derived.items = self.items
+                derived.users = self.users
+
+    def nbytes(self):
+        """
+        Return the number of bytes held by the rating columns (excluding the ID tables).
+        """
+        return sum(len(column) * column.itemsize for column in self._by_item + self._by_user)
+
+
+class ImplicitInteractions:
+    """
+    Implicit (rating 0) interactions held as ID-only CSR rows, sorted both by book and by user.
+
+    It has the same row layout as a RatingStore without the rating columns, so the rater
+    bitsets of bitset_module.RaterSets can be built over it as well. Changes are buffered
+    per row and merged by the writer as in RatingStore; the slices and rows apply them on the fly.
+    """
+
+    item_ptr = _column('_by_item', 0)
+    item_users = _column('_by_item', 1)
+    user_ptr = _column('_by_user', 0)
+    user_items = _column('_by_user', 1)
+
+    def __init__(self, items, users, item_ptr, item_users, user_ptr, user_items):
+        self.items = items
+        self.users = users
+        self._by_item = (item_ptr, item_users, None)
+        self._by_user = (user_ptr, user_items, None)
+        self._pending_items = PendingRows()
+        self._pending_users = PendingRows()
+        # Interactions added minus interactions removed by the pending changes
+        self._pending_net = 0
+        self._merge_lock = threading.Lock()
+
+    @property
+    def num_items(self):
+        return len(self.items)
+
+    @property
+    def num_users(self):
+        return len(self.users)
+
+    @property
+    def num_interactions(self):
+        return len(self._by_item[1]) + self._pending_net
+
+    def item_slice(self, item):
+        """
+        Return (ids, None, start, stop): ids[start:stop] are the book's sorted user IDs, buffered changes applied.
+        """
+        return self._pending_items.row_slice(self._by_item, item)
+
+    def user_slice(self, user):
+        """
+        Return (ids, None, start, stop) for a user's sorted book IDs, as item_slice does for a book.
+        """
+        return self._pending_users.row_slice(self._by_user, user)
+
+    def item_row(self, item):
+        """
+        Return the sorted dense IDs of the users who interacted with a book, as a zero-copy memoryview.
+        """
+        ids, _, start, stop = self.item_slice(item)
+        return memoryview(ids)[start:stop]
+
+    def user_row(self, user):
+        """
+        Return the sorted dense IDs of the books a user interacted with, as a zero-copy memoryview.
+        """
+        ids, _, start, stop = self.user_slice(user)
+        return memoryview(ids)[start:stop]
+
+    def set(self, item, user, present):
+        """
+        Buffer the addition (present=True) or removal of an interaction.
+        """
+        value = 0 if present else None
+        self._pending_items.set(item, user, value)
+        self._pending_users.set(user, item, value)
+        self._pending_net += 1 if present else -1
+
+    def merge(self):
+        with self._merge_lock:
+            if self._pending_items:
+                self._by_item = self._pending_items.merged(self._by_item)
+                self._pending_items = PendingRows()
+            if self._pending_users:
+                self._by_user = self._pending_users.merged(self._by_user)
+                self._pending_users = PendingRows()
+            self._pending_net = 0
+
+    def _grow(self):
+        self._by_item = _grown(self._by_item, self.num_items)
+        self._by_user = _grown(self._by_user, self.num_users)
+
+    def _thaw(self):
+        self._by_item = _thawed_columns(self._by_item)
+        self._by_user = _thawed_columns(self._by_user)
+
+    def nbytes(self):
+        columns = self._by_item[:2] + self._by_user[:2]
+        return sum(len(column) * column.itemsize for column in columns)
+
+
+class UserProfile(Mapping):
+    """
+    Mapping of user ID to that user's ratings, backed by a rating store.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __getitem__(self, user_id):
+        user = self.store.users.get(user_id)
+        if user is None:
+            raise KeyError(user_id)
+        return self.store.user_view(user)
+
+    def __contains__(self, user_id):
+        return user_id in self.store.users
+
+    def __iter__(self):
+        return iter(self.store.users)
+
+    def __len__(self):
+        return self.store.num_users
+
+
+class BookProfile(Mapping):
+    """
+    Mapping of ISBN to book details ('title', 'author', 'year' and 'ratings'), decoded on demand.
+
+    Titles, authors and years stay in a book catalog (snapshot_module.BookCatalog, usually memory-mapped)
+    and only the recently used ones are cached, so resident memory is dominated by the ratings.
+    'ratings' entries are views on the shared rating store. Books that were rated but are missing
+    from Books.csv, including books first rated after loading, get 'N/A' details.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - catalog (BookCatalog): The Books.csv records.
+    - cache_size (int): The number of books whose details are kept decoded.
+    """
+
+    def __init__(self, store, catalog, cache_size=BOOK_CACHE_SIZE):
+        self.store = store
+        self.catalog = catalog
+        self.cache = LruCache(cache_size)
+        # Entries assigned explicitly, which take precedence over the catalog
+        self.extra = {}
+        self._uncatalogued = (None, 0)
+
+    def details(self, isbn):
+        """
+        Return the (title, author, year) of a book, or None if the book is unknown.
+        """
+        details = self.cache.get(isbn)
+        if details is None:
+            details = self.catalog.details(isbn)
+            if details is None:
+                if isbn not in self.store.items:
+                    return None
+                details = PLACEHOLDER_DETAILS
+            self.cache.put(isbn, details)
+        return details
+
+    def __getitem__(self, isbn):
+        entry = self.extra.get(isbn)
+        if entry is not None:
+            return entry
+        details = self.details(isbn)
+        if details is None:
+            raise KeyError(isbn)
+        title, author, year = details
+        return {'title': title, 'author': author, 'year': year, 'ratings': BookRatingsView(self.store, isbn)}
+
+    def __setitem__(self, isbn, entry):
+        self.extra[isbn] = entry
+
+    def __contains__(self, isbn):
+        return isbn in self.extra or isbn in self.catalog or isbn in self.store.items
+
+    def _uncatalogued_books(self):
+        # Rated books missing from Books.csv, after the catalogued ones (the order the dictionary used to have)
+        catalog = self.catalog
+        for isbn in self.store.items:
+            if isbn not in catalog:
+                yield isbn
+        for isbn in self.extra:
+            if isbn not in catalog and isbn not in self.store.items:
+                yield isbn
+
+    def __iter__(self):
+        yield from self.catalog
+        yield from self._uncatalogued_books()
+
+    def __len__(self):
+        # The store only grows, so the count of uncatalogued books is recomputed only when it did
+        size = (self.store.num_items, len(self.extra))
+        if self._uncatalogued[0] != size:
+            self._uncatalogued = (size, sum(1 for _ in self._uncatalogued_books()))
+        return len(self.catalog) + self._uncatalogued[1]
+
+    def titles(self):
+        """
+        Generate (ISBN, title) for every book, in iteration order, without filling the details cache.
+        """
+        extra = self.extra
+        for isbn, title, _, _ in self.catalog.records():
+            yield isbn, extra[isbn]['title'] if isbn in extra else title
+        for isbn in self._uncatalogued_books():
+            yield isbn, extra[isbn]['title'] if isbn in extra else PLACEHOLDER_DETAILS[0]
+
+
+class RatingStoreBuilder:
+    """
+    Accumulate (user, ISBN, rating) triples and build a RatingStore from them.
+    """
+
+    def __init__(self):
+        self.items = IdTable()
+        self.users = IdTable()
+        self.row_users = array(ID_TYPECODE)
+        self.row_items = array(ID_TYPECODE)
+        self.row_ratings = array(RATING_TYPECODE)
+
+    def add(self, user_id, isbn, rating):
+        self.row_users.append(self.users.intern(user_id))
+        self.row_items.append(self.items.intern(isbn))
+        self.row_ratings.append(rating)
+
+    def build(self):
+        """
+        Sort the accumulated ratings by book and by user and return the resulting RatingStore.
+
+        If a user rated the same book more than once, the last rating wins (as it did with the old dictionaries).
+        """
+        num_items = len(self.items)
+        num_users = len(self.users)
+        row_users, row_items, row_ratings = self.row_users, self.row_items, self.row_ratings
+
+        # Two stable counting sorts give book-major order with users ascending inside each book
+        _, by_user = _counting_sort(row_users, num_users, range(len(row_users)))
+        _, by_item = _counting_sort(row_items, num_items, by_user)
+
+        # Gather the book-major columns, keeping only the last rating of duplicate (book, user) pairs
+        item_counts = [0] * (num_items + 1)
+        item_users = array(ID_TYPECODE)
+        item_ratings = array(RATING_TYPECODE)
+        sorted_items = array(ID_TYPECODE)
+        last = len(by_item) - 1
+        for pos, row in enumerate(by_item):
+            item, user = row_items[row], row_users[row]
+            if pos < last:
+                next_row = by_item[pos + 1]
+                if row_items[next_row] == item and row_users[next_row] == user:
+                    continue
+            item_counts[item + 1] += 1
+            sorted_items.append(item)
+            item_users.append(user)
+            item_ratings.append(row_ratings[row])
+        item_ptr = array(OFFSET_TYPECODE, _prefix_sums(item_counts))
+
+        # Re-sort the deduplicated columns by user; books stay ascending inside each user
+        user_ptr, by_user = _counting_sort(item_users, num_users, range(len(item_users)))
+        user_items = array(ID_TYPECODE, (sorted_items[row] for row in by_user))
+        user_ratings = array(RATING_TYPECODE, (item_ratings[row] for row in by_user))
+
+        return RatingStore(self.items, self.users, item_ptr, item_users, item_ratings,
+                           user_ptr, user_items, user_ratings)
+
+
+def build_rows(lo, hi, num_others, chunks):
+    """
+    Build the sorted CSR rows lo .. hi - 1 of one orientation of the store from unsorted ratings.
+
+    Used by the parallel ingest, where each worker builds a contiguous block of rows and the
+    blocks are concatenated. As in RatingStoreBuilder.build, the last of duplicate ratings wins.
+
+    Parameters:
+    - lo (int): The first row (book or user dense ID) of the block.
+    - hi (int): One past the last row of the block.
+    - num_others (int): The number of distinct IDs on the other side (users for book rows).
+    - chunks (list): (row IDs, other IDs, ratings) arrays of the block's ratings, in file order.
+
+    Returns:
+    - tuple: The row offsets (starting at 0), the sorted other IDs, the ratings and the rows' RatingStats.
+    """
+    keys = array(ID_TYPECODE)
+    others = array(ID_TYPECODE)
+    ratings = array(RATING_TYPECODE)
+    for chunk_keys, chunk_others, chunk_ratings in chunks:
+        keys.extend(chunk_keys)
+        others.extend(chunk_others)
+        ratings.extend(chunk_ratings)
+
+    # A stable sort on (row, other ID) keeps duplicates in file order, so the last one of each run wins
+    composite = list(map(add, map(mul, keys, repeat(num_others)), others))
+    order = sorted(range(len(composite)), key=composite.__getitem__)
+
+    counts = [0] * (hi - lo + 1)
+    ids = array(ID_TYPECODE)
+    values = array(RATING_TYPECODE)
+    last = len(order) - 1
+    for pos, row in enumerate(order):
+        if pos < last and composite[order[pos + 1]] == composite[row]:
+            continue
+        counts[keys[row] - lo + 1] += 1
+        ids.append(others[row])
+        values.append(ratings[row])
+    ptr = array(OFFSET_TYPECODE, _prefix_sums(counts))
+    return ptr, ids, values, RatingStats.from_rows(ptr, values)
+
+
+def _split_rows(ptr, ids, values):
+    """
+    Split CSR rows into explicit (non-zero) ratings and ID-only implicit (zero) interactions, keeping rows sorted.
+
+    Returns:
+    - tuple: (explicit ptr, explicit IDs, explicit ratings, implicit ptr, implicit IDs).
+    """
+    explicit_ptr = array(OFFSET_TYPECODE, [0])
+    explicit_ids = array(ID_TYPECODE)
+    explicit_values = array(RATING_TYPECODE)
+    implicit_ptr = array(OFFSET_TYPECODE, [0])
+    implicit_ids = array(ID_TYPECODE)
+
+    for row in range(len(ptr) - 1):
+        lo, hi = ptr[row], ptr[row + 1]
+        row_ids, row_values = ids[lo:hi], values[lo:hi]
+        explicit_ids.extend(compress(row_ids, row_values))
+        explicit_values.extend(filter(None, row_values))
+        implicit_ids.extend(compress(row_ids, map(not_, row_values)))
+        explicit_ptr.append(len(explicit_ids))
+        implicit_ptr.append(len(implicit_ids))
+
+    return explicit_ptr, explicit_ids, explicit_values, implicit_ptr, implicit_ids
+
+
+def _thaw_columns(owner, names):
+    for name in names:
+        setattr(owner, name, _thawed(getattr(owner, name)))
+
+
+def _thawed(column):
+    if isinstance(column, array):
+        return column
+    thawed = array(column.format)
+    thawed.frombytes(column.cast('B'))
+    return thawed
+
+
+def _thawed_columns(columns):
+    return tuple(column if column is None else _thawed(column) for column in columns)
+
+
+def _grown(columns, num_rows):
+    # A new offsets array rather than an in-place extend, which fails while a reader holds a view of it
+    ptr, ids, values = columns
+    missing = num_rows + 1 - len(ptr)
+    if missing <= 0:
+        return columns
+    return ptr + array(ptr.typecode, [ptr[-1]]) * missing, ids, values
+
+
+def _find(ptr, ids, row, key):
+    return bisect_left(ids, key, ptr[row], ptr[row + 1])
+
+
+def _splice(ptr, ids, values, rows):
+    """
+    Build new CSR columns with entries inserted and deleted in some rows, keeping every row sorted.
+
+    The unchanged stretches between the changed rows are copied with slice operations and their
+    offsets shifted a stretch at a time, so the cost is a copy of the columns plus the changed rows.
+    The given columns are not modified.
+
+    Parameters:
+    - ptr (array): The row offsets.
+    - ids (array): The sorted IDs of every row.
+    - values (array): The ratings of every row, or None for ID-only columns.
+    - rows (dict): Row -> {ID: new rating, or None to delete the entry}.
+
+    Returns:
+    - tuple: The new (ptr, ids, values) columns (the given ones if there are no changes).
+    """
+    if not rows:
+        return ptr, ids, values
+
+    new_ptr = array(ptr.typecode)
+    new_ids = array(ids.typecode)
+    new_values = array(values.typecode) if values is not None else None
+    copied = 0
+    next_row = 0
+    shift = 0
+    for row in sorted(rows):
+        lo, hi = ptr[row], ptr[row + 1]
+        # Copy the untouched entries and offsets up to this row
+        new_ids.extend(ids[copied:lo])
+        if values is not None:
+            new_values.extend(values[copied:lo])
+        new_ptr.extend(map(add, ptr[next_row:row + 1], repeat(shift)))
+
+        row_ids, row_values = _merge_row(ids[lo:hi], values[lo:hi] if values is not None else None, rows[row])
+        new_ids.extend(row_ids)
+        if values is not None:
+            new_values.extend(row_values)
+
+        shift += len(row_ids) - (hi - lo)
+        copied = hi
+        next_row = row + 1
+
+    new_ids.extend(ids[copied:])
+    if values is not None:
+        new_values.extend(values[copied:])
+    new_ptr.extend(map(add, ptr[next_row:], repeat(shift)))
+    return new_ptr, new_ids, new_values
+
+
+def _merge_row(ids, values, changes):
+    """
+    Apply {ID: new rating, or None to delete} changes to one sorted row.
+
+    Returns:
+    - tuple: The row's sorted IDs and their ratings (None if values is None) as lists.
+    """
+    merged = dict(zip(ids, values if values is not None else repeat(0)))
+    for key, value in changes.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    row_ids = sorted(merged)
+    return row_ids, [merged[key] for key in row_ids] if values is not None else None
+
+
+def _prefix_sums(counts):
+    for idx in range(1, len(counts)):
+        counts[idx] += counts[idx - 1]
+    return counts
+
+
+def _counting_sort(keys, num_keys, order):
+    """
+    Stable counting sort of row numbers by key.
+
+    Parameters:
+    - keys (array): The key of every row.
+    - num_keys (int): The number of distinct keys (keys are 0 .. num_keys - 1).
+    - order (iterable): The row numbers to sort, in their current order.
+
+    Returns:
+    - tuple: The row offsets per key and the sorted row numbers.
+    """
+    counts = [0] * (num_keys + 1)
+    for key in keys:
+        counts[key + 1] += 1
+    ptr = array(OFFSET_TYPECODE, _prefix_sums(counts))
+
+    next_slot = list(ptr[:-1])
+    rows = array(OFFSET_TYPECODE, bytes(len(keys) * array(OFFSET_TYPECODE).itemsize))
+    for row in order:
+        key = keys[row]
+        rows[next_slot[key]] = row
+        next_slot[key] += 1
+    return ptr, rows
@@ -0,0 +1,189 @@
+import weakref
+from collections import Counter
+
+import metrics_module
+from lru_module import LruCache
+from similarity_engine_module import SIMILARITY_METRICS, dense_vector, score_bound, score_sparse_row
+from topk_module import TopK, top_k
+
+DEFAULT_NEIGHBOURS = 30
+NEIGHBOURHOOD_CACHE_SIZE = 1024
+
+# Book-Crossing ratings are integers from 0 to 10; predictions are clipped to that range
+MIN_RATING = 0
+MAX_RATING = 10
+
+# One neighbourhood cache per rating store, dropped together with the store
+_neighbourhood_caches = weakref.WeakKeyDictionary()
+
+
+def neighbourhood_cache(store):
+    """
+    Return the LRU cache of user neighbourhoods for a rating store, creating it on first use.
+
+    The cache follows the store's changes: see invalidate_ratings.
+    """
+    cache = _neighbourhood_caches.get(store)
+    if cache is None:
+        cache = LruCache(NEIGHBOURHOOD_CACHE_SIZE)
+        _neighbourhood_caches[store] = cache
+        store.on_change(invalidate_ratings)
+    return cache
+
+
+def invalidate_ratings(store, changes):
+    """
+    Drop the cached neighbourhoods that changed ratings can affect.
+
+    A rating only changes the similarities of its user and of the book's other raters,
+    so only their neighbourhoods are dropped. Registered as a change callback of the store.
+
+    Parameters:
+    - store (RatingStore): The updated rating store.
+    - changes (list): (book ID, user ID, old rating, new rating) tuples, as returned by RatingStore.add_ratings.
+    """
+    cache = _neighbourhood_caches.get(store)
+    if not cache:
+        return
+    affected = set()
+    for item, user, _, _ in changes:
+        affected.update(store.item_view(item).row()[0])
+        affected.add(user)
+    cache.discard_where(lambda key: key[0] in affected)
+
+
+def nearest_users(store, user, k=DEFAULT_NEIGHBOURS, metric='pearson', min_support=2, max_items=None):
+    """
+    Return the k users most similar to the given one, among those sharing rated books with them.
+
+    Candidates come from the book-to-raters index (the book rows of the store): the user's books ->
+    their raters, so only users with common ratings are ever scored and no user is scanned otherwise.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - user (int): The dense ID of the user.
+    - k (int): The number of neighbours to return.
+    - metric (str): 'pearson' or 'cosine'.
+    - min_support (int): The minimum number of co-rated books a neighbour needs.
+    - max_items (int): Expand at most this many of the user's books, preferring those with the fewest raters.
+
+    Returns:
+    - list: (user ID, similarity) tuples with positive similarity, most similar first.
+    """
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"Neighbourhoods need a similarity metric: {', '.join(SIMILARITY_METRICS)}.")
+
+    item_slice, user_slice = store.item_slice, store.user_slice
+    view = store.user_view(user)
+    books, _ = view.row()
+
+    # Count the books every co-rater shares with the user
+    exact = max_items is None or len(books) <= max_items
+    if not exact:
+        count = store.item_stats.count
+        books = sorted(books, key=lambda item: (count[item], item))[:max_items]
+    co_raters = Counter()
+    for item in books:
+        item_users, _, start, stop = item_slice(item)
+        co_raters.update(item_users[start:stop])
+    co_raters.pop(user, None)
+
+    vector = dense_vector(store.num_items, view)
+    top = TopK(k)
+    best_possible = score_bound(metric)
+    for other in sorted(co_raters):
+        if not top.could_enter(best_possible):
+            break
+        overlap = co_raters[other]
+        if exact and (overlap < min_support or not top.could_enter(score_bound(metric, overlap))):
+            continue
+        n, similarity = score_sparse_row(vector, *user_slice(other), metric)
+        if n >= min_support and similarity > 0:
+            top.push(other, similarity)
+
+    return top.results()
+
+
+def predict_ratings(store, user, neighbours, min_neighbours=1):
+    """
+    Predict the user's ratings of the books their neighbours rated and they did not.
+
+    The prediction is the user's mean rating plus the similarity-weighted average of the
+    neighbours' deviations from their own means.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - user (int): The dense ID of the user.
+    - neighbours (list): (user ID, similarity) tuples, as returned by nearest_users.
+    - min_neighbours (int): The minimum number of neighbours who must have rated a book.
+
+    Returns:
+    - dict: Book ID -> predicted rating.
+    """
+    user_slice = store.user_slice
+    mean = store.user_stats.mean
+    seen = set(store.user_view(user).row()[0])
+
+    deviations = {}
+    weights = {}
+    votes = Counter()
+    for other, similarity in neighbours:
+        offset = mean[other]
+        user_items, user_ratings, lo, hi = user_slice(other)
+        for item, rating in zip(user_items[lo:hi], user_ratings[lo:hi]):
+            if item in seen:
+                continue
+            deviations[item] = deviations.get(item, 0.0) + similarity * (rating - offset)
+            weights[item] = weights.get(item, 0.0) + similarity
+            votes[item] += 1
+
+    base = mean[user]
+    return {item: max(MIN_RATING, min(MAX_RATING, base + deviations[item] / weights[item]))
+            for item in deviations if votes[item] >= min_neighbours}
+
+
+def recommend_for_user(user_id, n, data, k=DEFAULT_NEIGHBOURS, metric='pearson', min_support=2, min_neighbours=1,
+                       max_items=None, ratings='explicit', cache=None):
+    """
+    Recommend books to a user by user-based collaborative filtering.
+
+    The user's k nearest neighbours are found through the book-to-raters index and cached in a bounded
+    LRU (see invalidate_ratings); unseen books are then ranked by their predicted rating.
+
+    Parameters:
+    - user_id (str): The ID of the user.
+    - n (int): The number of books to recommend.
+    - data (dict): The user data (or book data) returned by load_dataset_module.
+    - k (int): The number of neighbours.
+    - metric (str): 'pearson' or 'cosine'.
+    - min_support (int): The minimum number of co-rated books a neighbour needs.
+    - min_neighbours (int): The minimum number of neighbours who must have rated a recommended book.
+    - max_items (int): Optional cap on how many of the user's books are expanded into candidate neighbours.
+    - ratings (str): 'explicit' to ignore implicit interactions (rating 0), 'all' to count them as zero ratings.
+    - cache (LruCache): The neighbourhood cache (defaults to the store's own, see neighbourhood_cache).
+
+    Returns:
+    - list: (ISBN, predicted rating) tuples, best first (empty if the user is unknown).
+    """
+    store = data.store.select(ratings)
+    user = store.users.get(user_id)
+    if user is None:
+        return []
+
+    if cache is None:
+        cache = neighbourhood_cache(store)
+    key = (user, k, metric, min_support, max_items)
+    neighbours = cache.get(key)
+    if neighbours is None:
+        metrics_module.increment('recommend.neighbourhood_cache', result='miss')
+        with metrics_module.timer('recommend.neighbours', metric=metric):
+            neighbours = nearest_users(store, user, k, metric, min_support, max_items)
+        cache.put(key, neighbours)
+    else:
+        metrics_module.increment('recommend.neighbourhood_cache', result='hit')
+
+    with metrics_module.timer('recommend.prediction'):
+        predictions = predict_ratings(store, user, neighbours, min_neighbours)
+    with metrics_module.timer('recommend.sorting'):
+        best = top_k(sorted(predictions.items()), n, key=lambda entry: entry[1])
+    return [(store.items.name(item), predicted) for item, predicted in best]
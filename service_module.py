@@ -0,0 +1,457 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import load_dataset_module
+import metrics_module
+import profiling_module
+import recommend_module
+import similarity_engine_module
+import similarity_module
+from engine_module import RecommendationEngine
+from lru_module import LruCache
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Requests of the same kind arriving within BATCH_WINDOW seconds are deduplicated and dispatched as one batch
+BATCH_WINDOW = 0.002
+MAX_BATCH_SIZE = 64
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    """
+    A request that cannot be answered, with the HTTP status to report.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Coalesce requests arriving within a short window into batches run in an executor.
+
+    Identical requests in the same window share a single result. The distinct keys of a batch are
+    split into groups of keys that share work, and each group is handed to the executor on its own,
+    so independent requests run concurrently instead of one after another on a single thread.
+    The snapshot is taken once per batch and passed to every group, so a whole batch is answered
+    from the same state. The handler returns one result per key of its group, in order; an
+    exception returned in place of a result is raised to that key's callers only.
+
+    Parameters:
+    - handler (callable): handler(state, keys) -> list of results, run in the executor for each group.
+    - executor (Executor): Where groups run, so scoring never blocks the event loop.
+    - window (float): Seconds to wait for more requests after the first of a batch.
+    - max_size (int): Flush as soon as this many distinct requests are waiting.
+    - snapshot (callable): snapshot() -> the state the batch is answered from (None if not given).
+    - group (callable): group(key) -> the group of a key; by default every key is a group of its own.
+    """
+
+    def __init__(self, handler, executor, window=BATCH_WINDOW, max_size=MAX_BATCH_SIZE, snapshot=None, group=None):
+        self.handler = handler
+        self.executor = executor
+        self.window = window
+        self.max_size = max_size
+        self.snapshot = snapshot
+        self.group = group
+        self.pending = {}
+        self.timer = None
+        self.batches = 0
+        self.groups = 0
+        self.requests = 0
+
+    async def submit(self, key):
+        loop = asyncio.get_running_loop()
+        self.requests += 1
+        future = self.pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self.pending[key] = future
+            if len(self.pending) >= self.max_size:
+                self._flush()
+            elif self.timer is None:
+                self.timer = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if not batch:
+            return
+        self.batches += 1
+        state = self.snapshot() if self.snapshot is not None else None
+
+        # Split the batch into groups, then dispatch each group to the executor separately
+        groups = {}
+        for key in batch:
+            groups.setdefault(key if self.group is None else self.group(key), []).append(key)
+        self.groups += len(groups)
+        loop = asyncio.get_running_loop()
+        for keys in groups.values():
+            task = loop.run_in_executor(self.executor, self.handler, state, keys)
+            task.add_done_callback(lambda done, keys=keys: _resolve(batch, keys, done))
+
+    def stats(self):
+        return {'requests': self.requests, 'batches': self.batches, 'groups': self.groups,
+                'mean_batch': self.requests / self.batches if self.batches else 0.0}
+
+
+def _resolve(batch, keys, done):
+    error = done.exception()
+    results = [error] * len(keys) if error is not None else done.result()
+    for key, result in zip(keys, results):
+        future = batch[key]
+        if future.done():
+            continue
+        if isinstance(result, Exception):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+def _each(name, function, keys):
+    # Run a batch key by key, so one failing request does not fail the whole batch (nor share its profile)
+    results = []
+    for key in keys:
+        try:
+            with profiling_module.profiled(f"{name}-{'-'.join(map(str, key[:2]))}"):
+                results.append(function(*key))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+class RecommendationService:
+    """
+    Asyncio HTTP/JSON front end to a RecommendationEngine, exposing the menu's operations.
+
+    Endpoints (all GET, JSON responses):
+    - /health: the dataset generation and size.
+    - /books/<isbn>: a book's details and number of ratings.
+    - /top-books?n=10 and /top-users?n=10: the menu's top-N listings.
+    - /similarity?kind=books|users&id1=..&id2=..&metric=all|euclidean|cosine|minkowski|pearson|manhattan
+      (optional p and ratings): pair similarity.
+    - /similar-books?isbn=..&n=10 (optional metric, p, min_support, ratings): one-vs-all recommendations.
+    - /recommend?user=..&n=10: user-based recommendations.
+    - /stats: batching and cache counters.
+    - /metrics (optional format=json): the metrics_module instrumentation, in Prometheus text format by default.
+
+    Requests are micro-batched per endpoint (see MicroBatcher) and identical ones are answered once.
+    Beyond that, /similar-books requests for the same book and /recommend requests for the same user
+    share their work; /similarity and the listings run each distinct request on its own (pairs still
+    go through the pair memo, listings through a per-generation cache).
+
+    Parameters:
+    - engine (RecommendationEngine): The engine whose current dataset answers the requests.
+    - threads (int): The number of executor threads running the batches.
+    - window (float): The micro-batching window in seconds.
+    - max_batch (int): The maximum number of distinct requests per batch.
+    """
+
+    def __init__(self, engine, threads=4, window=BATCH_WINDOW, max_batch=MAX_BATCH_SIZE):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='scoring')
+        self.listings = LruCache(64)
+        snapshot = lambda: engine.dataset
+        self.batchers = {
+            'similar-books': MicroBatcher(self._similar_books_batch, self.executor, window, max_batch, snapshot,
+                                          group=lambda key: (key[0], key[5])),
+            'similarity': MicroBatcher(self._similarity_batch, self.executor, window, max_batch, snapshot),
+            'recommend': MicroBatcher(self._recommend_batch, self.executor, window, max_batch, snapshot,
+                                      group=lambda key: key[0]),
+            'top': MicroBatcher(self._top_batch, self.executor, window, max_batch, snapshot)
+        }
+        self.routes = {
+            'health': self.health,
+            'books': self.book_details,
+            'top-books': self.top_books,
+            'top-users': self.top_users,
+            'similarity': self.similarity,
+            'similar-books': self.similar_books,
+            'recommend': self.recommend,
+            'stats': self.stats,
+            'metrics': self.metrics
+        }
+        self.served = 0
+
+    # Batch handlers, run in the executor for each group of a batch, against the batch's dataset generation
+
+    def _similar_books_batch(self, dataset, keys):
+        # One group per book and rating selection: the candidates and target vector are shared by its keys
+        isbn, ratings = keys[0][0], keys[0][5]
+        with profiling_module.profiled(f'similar_books-{isbn}-{len(keys)}'):
+            store = dataset.store.select(ratings)
+            item = store.items.get(isbn)
+            if item is None:
+                return [[] for _ in keys]
+            queries = [(n, metric, p, min_support) for _, n, metric, p, min_support, _ in keys]
+            try:
+                ranked = similarity_engine_module.top_similar_items_batch(store, item, queries)
+            except Exception:
+                # A bad query fails the shared call: answer the keys one by one so it only fails itself
+                ranked = _each('similar_books', lambda *query: similarity_engine_module.top_similar_items_batch(
+                    store, item, [query])[0], queries)
+            return [result if isinstance(result, Exception) else
+                    [{'isbn': store.items.name(other), 'score': score} for other, score in result]
+                    for result in ranked]
+
+    def _similarity_batch(self, dataset, keys):
+
+        def pair(kind, id1, id2, metric, p, ratings):
+            data = dataset.books if kind == 'books' else dataset.users
+            value, explanation = similarity_module.compare_pair(id1, id2, data, metric, p, ratings)
+            if metric == 'all' and 'minkowski' in value:
+                value = dict(value, minkowski={str(order): distance for order, distance in value['minkowski'].items()})
+            return {'value': value, 'explanation': explanation}
+
+        return _each('similarity', pair, keys)
+
+    def _recommend_batch(self, dataset, keys):
+        # One group per user: the books are ranked once for the largest n and cut for the other keys
+        users = dataset.users
+        largest = max(n for _, n in keys)
+        result, = _each('recommend', lambda user_id, n: [
+            {'isbn': isbn, 'predicted_rating': predicted}
+            for isbn, predicted in recommend_module.recommend_for_user(user_id, n, users)], [(keys[0][0], largest)])
+        if isinstance(result, Exception):
+            return [result] * len(keys)
+        return [result[:max(n, 0)] for _, n in keys]
+
+    def _top_batch(self, dataset, keys):
+
+        def listing(kind, n):
+            # Listings only change with the dataset, so they are cached per generation
+            cache_key = (dataset.generation, kind, n)
+            result = self.listings.get(cache_key)
+            if result is None:
+                if kind == 'books':
+                    result = [_book_json(isbn, details)
+                              for isbn, details in load_dataset_module.n_top_books(n, dataset.books, verbose=False)]
+                else:
+                    result = [{'user_id': user_id, 'ratings': count}
+                              for user_id, count in load_dataset_module.n_top_users(n, dataset.users, verbose=False)]
+                self.listings.put(cache_key, result)
+            return result
+
+        return _each('top', listing, keys)
+
+    # Endpoints
+
+    async def health(self, path, query):
+        dataset = self.engine.dataset
+        return {'status': 'ok', 'generation': dataset.generation, 'books': dataset.store.num_items,
+                'users': dataset.store.num_users, 'ratings': dataset.store.num_ratings}
+
+    async def book_details(self, path, query):
+        if len(path) != 2:
+            raise RequestError(404, "Use /books/<isbn>.")
+        isbn = unquote(path[1])
+        books = self.engine.dataset.books
+        if isbn not in books:
+            raise RequestError(404, "Book not found in data.")
+        return _book_json(isbn, books[isbn])
+
+    async def top_books(self, path, query):
+        return await self.batchers['top'].submit(('books', _int(query, 'n', 10)))
+
+    async def top_users(self, path, query):
+        return await self.batchers['top'].submit(('users', _int(query, 'n', 10)))
+
+    async def similarity(self, path, query):
+        kind = _param(query, 'kind', 'books')
+        if kind not in ('books', 'users'):
+            raise RequestError(400, "kind must be 'books' or 'users'.")
+        metric = _param(query, 'metric', 'all')
+        if metric != 'all' and metric not in similarity_module.PAIR_FUNCTIONS:
+            raise RequestError(400, f"Unknown metric '{metric}'.")
+        key = (kind, _param(query, 'id1'), _param(query, 'id2'), metric, _float(query, 'p', 1),
+               _param(query, 'ratings', 'all'))
+        return await self.batchers['similarity'].submit(key)
+
+    async def similar_books(self, path, query):
+        key = (_param(query, 'isbn'), _int(query, 'n', 10), _param(query, 'metric', 'euclidean'),
+               _float(query, 'p', 1), _int(query, 'min_support', 1), _param(query, 'ratings', 'all'))
+        return await self.batchers['similar-books'].submit(key)
+
+    async def recommend(self, path, query):
+        return await self.batchers['recommend'].submit((_param(query, 'user'), _int(query, 'n', 10)))
+
+    async def stats(self, path, query):
+        dataset = self.engine.dataset
+        cache = similarity_module.pair_cache(dataset.books)
+        return {'served': self.served,
+                'batchers': {name: batcher.stats() for name, batcher in self.batchers.items()},
+                'pair_cache': cache.stats()}
+
+    async def metrics(self, path, query):
+        if _param(query, 'format', 'prometheus') == 'json':
+            return metrics_module.snapshot()
+        return metrics_module.to_prometheus()
+
+    # HTTP plumbing
+
+    async def dispatch(self, method, target):
+        """
+        Answer one request.
+
+        Returns:
+        - tuple: The HTTP status and the response body (JSON-serialisable, or a string sent as plain text).
+        """
+        if method != 'GET':
+            return 405, {'error': "Only GET is supported."}
+        url = urlsplit(target)
+        path = [part for part in url.path.split('/') if part]
+        endpoint = path[0] if path else 'health'
+        route = self.routes.get(endpoint)
+        if route is None:
+            return 404, {'error': f"Unknown endpoint '{url.path}'."}
+        with metrics_module.timer('service.request', endpoint=endpoint):
+            try:
+                return 200, await route(path, parse_qs(url.query))
+            except RequestError as e:
+                return e.status, {'error': str(e)}
+            except (KeyError, ValueError) as e:
+                return 400, {'error': str(e)}
+            except Exception as e:
+                return 500, {'error': repr(e)}
+
+    async def handle_connection(self, reader, writer):
+        """
+        Serve the requests of one HTTP/1.1 connection (keep-alive until the client closes it).
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split(' ')
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' and (version == 'HTTP/1.1' or connection == 'keep-alive')
+                length = _content_length(headers)
+                if length is None:
+                    # Without a valid length the body cannot be skipped, so the connection ends after the reply
+                    status, body = 400, {'error': "Invalid Content-Length header."}
+                    keep_alive = False
+                else:
+                    if length:
+                        try:
+                            await reader.readexactly(length)
+                        except asyncio.IncompleteReadError:
+                            break
+                    status, body = await self.dispatch(method, target)
+                self.served += 1
+                if isinstance(body, str):
+                    payload, content_type = body.encode(), 'text/plain; version=0.0.4'
+                else:
+                    payload, content_type = json.dumps(body).encode(), 'application/json'
+                writer.write(f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Listen for requests until cancelled.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f"Serving on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def _content_length(headers):
+    # The request body's length, or None if the header is not a non-negative integer
+    try:
+        length = int(headers.get('content-length', 0) or 0)
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    if values:
+        return values[0]
+    if default is None:
+        raise RequestError(400, f"Missing parameter '{name}'.")
+    return default
+
+
+def _int(query, name, default):
+    return int(_param(query, name, str(default)))
+
+
+def _float(query, name, default):
+    return float(_param(query, name, str(default)))
+
+
+def _book_json(isbn, details):
+    return {'isbn': isbn, 'title': details['title'], 'author': details['author'], 'year': details['year'],
+            'ratings': len(details['ratings'])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the recommendation engine over HTTP/JSON.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--books', default='Books.csv', help='path of Books.csv')
+    parser.add_argument('--ratings', default='Book-Ratings.csv', help='path of Book-Ratings.csv')
+    parser.add_argument('--threads', type=int, default=4, help='executor threads running the batches')
+    parser.add_argument('--window-ms', type=float, default=BATCH_WINDOW * 1000, help='micro-batching window')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument('--no-reload', action='store_true', help='do not reload when the CSV files change')
+    parser.add_argument('--metrics', action='store_true', help='record timings, served on /metrics')
+    parser.add_argument('--profile-dir', help='profile every query, writing the profiles to this directory')
+    parser.add_argument('--profile-mode', choices=profiling_module.MODES, default='cprofile')
+    parser.add_argument('--profile-keep', type=int, default=profiling_module.DEFAULT_KEEP,
+                        help='number of most recent profiles kept')
+    parser.add_argument('--profile-min-ms', type=float, default=0.0, help='only keep profiles of slower queries')
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics_module.enable()
+    if args.profile_dir:
+        profiling_module.enable(args.profile_dir, args.profile_mode, args.profile_keep, args.profile_min_ms / 1000)
+
+    start = time.perf_counter()
+    engine = RecommendationEngine(args.books, args.ratings)
+    print(f"Loaded dataset in {time.perf_counter() - start:.2f}s")
+    if not args.no_reload:
+        engine.start()
+    service = RecommendationService(engine, args.threads, args.window_ms / 1000, args.max_batch)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+
+
+if __name__ == '__main__':
+    main()
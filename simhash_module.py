@@ -0,0 +1,187 @@
+import math
+import random
+from array import array
+from operator import mul
+
+from topk_module import top_k
+
+DEFAULT_BITS = 128
+
+
+def _repeat_mask(pattern, pattern_bits, total_bits):
+    """
+    Return a total_bits wide integer made of pattern repeated every pattern_bits bits.
+    """
+    return int.from_bytes(pattern.to_bytes(pattern_bits // 8, 'little') * (total_bits // pattern_bits), 'little')
+
+
+class SimHashIndex:
+    """
+    Fixed-size sign-random-projection (SimHash) signature of every book's rating vector.
+
+    Bit j of a book's signature is the sign of the dot product of its ratings with a random
+    +1/-1 vector over users. The fraction of differing bits between two books estimates the
+    angle between their rating vectors, so cosine ~ cos(pi * hamming / bits).
+
+    The estimate is for the cosine of the full rating vectors (unrated counted as 0), which differs from
+    similarity_module.cosine_similarity (co-rated entries only); use it to pre-filter candidates for the exact metric.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - bits (int): Signature size in bits (a multiple of 64); 128 bits for 270k books take about 4 MB.
+    - seed (int): Seed of the random projections.
+    - prefilter_size (int): How many books candidates() returns.
+    """
+
+    def __init__(self, store, bits=DEFAULT_BITS, seed=1, prefilter_size=200):
+        if bits % 64:
+            raise ValueError("The number of signature bits must be a multiple of 64.")
+        self.store = store
+        self.bits = bits
+        self.prefilter_size = prefilter_size
+        self.signature_bytes = bits // 8
+        self.signatures = _signatures(store, bits, seed)
+        # All signatures as one big integer, so a scan is a handful of whole-index integer operations
+        self.packed = int.from_bytes(self.signatures, 'little')
+        self._masks = None
+        self._masks_bits = 0
+
+    def nbytes(self):
+        return len(self.signatures)
+
+    @property
+    def num_rows(self):
+        """
+        The number of books with a signature: those in the store when the index was built.
+        """
+        return len(self.signatures) // self.signature_bytes
+
+    def signature(self, item):
+        start = item * self.signature_bytes
+        return int.from_bytes(self.signatures[start:start + self.signature_bytes], 'little')
+
+    def hamming(self, item1, item2):
+        return (self.signature(item1) ^ self.signature(item2)).bit_count()
+
+    def estimate_cosine(self, item1, item2):
+        """
+        Estimate the cosine similarity of two books' rating vectors from their signatures.
+        """
+        return math.cos(math.pi * self.hamming(item1, item2) / self.bits)
+
+    def scan(self, item):
+        """
+        Return the Hamming distance between the target's signature and every book's signature.
+
+        XOR and popcount run on the whole packed index at once (SWAR bit counting on big integers),
+        so the scan is bound by memory bandwidth rather than a Python loop per book.
+        Only the books indexed at build time are scanned (see num_rows), and the target must be one of them.
+
+        Returns:
+        - list: Hamming distance per indexed book ID.
+        """
+        num_items = self.num_rows
+        total_bits = num_items * self.bits
+        masks = self._lane_masks(total_bits)
+
+        target = self.signatures[item * self.signature_bytes:(item + 1) * self.signature_bytes]
+        x = self.packed ^ int.from_bytes(target * num_items, 'little')
+
+        # Per-byte popcounts, then fold neighbouring fields together until each lane holds its total
+        x = x - ((x >> 1) & masks[0])
+        x = (x & masks[1]) + ((x >> 2) & masks[1])
+        x = (x + (x >> 4)) & masks[2]
+        shift = 8
+        for mask in masks[3:]:
+            x = (x & mask) + ((x >> shift) & mask)
+            shift *= 2
+
+        counts = memoryview(x.to_bytes(total_bits // 8, 'little')).cast('Q')
+        return list(counts[::self.bits // 64])
+
+    def _lane_masks(self, total_bits):
+        if self._masks_bits != total_bits:
+            masks = [_repeat_mask(0x5555555555555555, 64, total_bits),
+                     _repeat_mask(0x3333333333333333, 64, total_bits),
+                     _repeat_mask(0x0F0F0F0F0F0F0F0F, 64, total_bits)]
+            width = 16
+            while width <= self.bits:
+                masks.append(_repeat_mask((1 << (width // 2)) - 1, width, total_bits))
+                width *= 2
+            self._masks = masks
+            self._masks_bits = total_bits
+        return self._masks
+
+    def nearest(self, item, n):
+        """
+        Return the n books with the highest estimated cosine similarity to the target.
+
+        Returns:
+        - list: (book ID, estimated cosine) tuples, most similar first.
+        """
+        distances = self.scan(item)
+        count = self.store.item_stats.count
+        norm = self.store.item_stats.norm
+        candidates = (other for other in range(len(distances)) if other != item and count[other] and norm[other])
+        return [(other, math.cos(math.pi * distances[other] / self.bits))
+                for other in top_k(candidates, n, key=distances.__getitem__, largest=False)]
+
+    def candidates(self, item):
+        """
+        Return the prefilter_size books with the highest estimated cosine, in ascending ID order.
+
+        Books added to the store after the index was built have no signature, so they cannot be
+        pre-filtered: they are all returned, for the exact metric to score. A target added after the
+        build is compared with every rated book the same way.
+        """
+        count = self.store.item_stats.count
+        num_rows = self.num_rows
+        if item >= num_rows:
+            return [other for other in range(self.store.num_items) if other != item and count[other]]
+        newer = (other for other in range(num_rows, self.store.num_items) if count[other])
+        return sorted(other for other, _ in self.nearest(item, self.prefilter_size)) + list(newer)
+
+
+def _signatures(store, bits, seed):
+    """
+    Compute the packed signatures of every book (bits / 8 bytes per book, little-endian bit order).
+    """
+    rng = random.Random(seed)
+    num_items, num_users = store.num_items, store.num_users
+    item_slice = store.item_slice
+    signature_bytes = bits // 8
+    signatures = bytearray(num_items * signature_bytes)
+
+    for bit in range(bits):
+        # A random +1/-1 weight for every user
+        weights = array('b', [1 if rng.getrandbits(1) else -1 for _ in range(num_users)])
+        lookup = weights.__getitem__
+        byte_offset, bit_value = bit // 8, 1 << (bit % 8)
+        for item in range(num_items):
+            item_users, item_ratings, lo, hi = item_slice(item)
+            if lo < hi and sum(map(mul, item_ratings[lo:hi], map(lookup, item_users[lo:hi]))) > 0:
+                signatures[item * signature_bytes + byte_offset] |= bit_value
+
+    return bytes(signatures)
+
+
+def approximate_cosine(isbn1, isbn2, index):
+    """
+    Estimate the cosine similarity between two books from their SimHash signatures.
+
+    Parameters:
+    - isbn1 (str): The ID of the first book.
+    - isbn2 (str): The ID of the second book.
+    - index (SimHashIndex): The signature index.
+
+    Returns:
+    - tuple: The estimated cosine similarity and an explanation string.
+    """
+    item1 = index.store.items.get(isbn1)
+    item2 = index.store.items.get(isbn2)
+    if item1 is None or item2 is None:
+        return 0, "One or both books not found in data."
+
+    estimate = index.estimate_cosine(item1, item2)
+    explanation = f"Estimated Cosine Similarity: {estimate:.2f}\nEstimated from {index.bits}-bit random-projection signatures."
+    return estimate, explanation
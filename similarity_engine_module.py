@@ -0,0 +1,334 @@
+import math
+from array import array
+from collections import Counter
+
+import metrics_module
+from rating_store_module import RATING_TYPECODE
+from topk_module import TopK, top_k
+
+# Metrics supported by the one-vs-all engine, split by how they rank
+DISTANCE_METRICS = ('euclidean', 'manhattan', 'minkowski')
+SIMILARITY_METRICS = ('cosine', 'pearson')
+METRICS = DISTANCE_METRICS + SIMILARITY_METRICS
+
+# Marks users that did not rate the target book in its dense rating vector
+_UNRATED = -1
+
+
+def check_metric(metric):
+    """
+    Raise a ValueError if the metric is not supported by the engine.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}'. Choose one of: {', '.join(METRICS)}.")
+
+
+def finish_metric(metric, n, sum1, sum2, sum1_sq, sum2_sq, product_sum, power_sum, p=1):
+    """
+    Turn the sums accumulated over co-rated entries into a metric value.
+
+    The formulas match the pairwise functions in similarity_module, including returning 0
+    when there are no common ratings or the value is undefined. Cosine and Pearson values are
+    clamped to [-1, 1].
+
+    Parameters:
+    - metric (str): One of METRICS.
+    - n (int): The number of co-rated entries.
+    - sum1, sum2 (float): The sums of the first and second ratings.
+    - sum1_sq, sum2_sq (float): The sums of the squared first and second ratings.
+    - product_sum (float): The sum of the products of the ratings.
+    - power_sum (float): The sum of |rating1 - rating2| ** p (only used by Minkowski).
+    - p (float): The Minkowski order.
+
+    Returns:
+    - float: The metric value.
+    """
+    if n == 0:
+        return 0
+
+    if metric == 'euclidean':
+        return math.sqrt(max(sum1_sq - 2 * product_sum + sum2_sq, 0))
+
+    if metric == 'manhattan' or metric == 'minkowski':
+        return power_sum ** (1 / p)
+
+    if metric == 'cosine':
+        magnitude1 = math.sqrt(sum1_sq)
+        magnitude2 = math.sqrt(sum2_sq)
+        if magnitude1 == 0 or magnitude2 == 0:
+            return 0
+        return _clamp(product_sum / (magnitude1 * magnitude2))
+
+    # Pearson correlation coefficient
+    num = product_sum - (sum1 * sum2 / n)
+    den_squared = (sum1_sq - sum1 ** 2 / n) * (sum2_sq - sum2 ** 2 / n)
+    if den_squared <= 0:
+        return 0
+    return _clamp(num / math.sqrt(den_squared))
+
+
+def _clamp(value):
+    # Rounding can push a correlation a few ulps outside [-1, 1]; ranking bounds rely on it staying inside
+    return max(-1.0, min(1.0, value))
+
+
+def target_vector(store, item):
+    """
+    Return a dense vector, indexed by user ID, holding the target book's ratings (-1 where unrated).
+    """
+    return dense_vector(store.num_users, store.item_view(item))
+
+
+def dense_vector(size, view):
+    """
+    Return a dense vector of the given size holding the ratings of a row view (-1 where unrated).
+    """
+    vector = array(RATING_TYPECODE, [_UNRATED]) * size
+    ids, values = view.row()
+    for idx, rating in zip(ids, values):
+        vector[idx] = rating
+    return vector
+
+
+def _score_row(store, vector, other, metric, p):
+    """
+    Walk the CSR row of one book against the target's dense vector.
+
+    Returns:
+    - tuple: (number of co-rated users, metric value).
+    """
+    return score_sparse_row(vector, *store.item_slice(other), metric, p)
+
+
+def score_sparse_row(vector, ids, values, start, stop, metric, p=1):
+    """
+    Walk one sparse row (ids[start:stop], values[start:stop]) against a dense target vector.
+
+    Works on either axis: book rows against a user-indexed vector, or user rows against a book-indexed one.
+
+    Returns:
+    - tuple: (number of co-rated entries, metric value).
+    """
+    n = sum1 = sum2 = sum1_sq = sum2_sq = product_sum = power_sum = 0
+    for pos in range(start, stop):
+        rating1 = vector[ids[pos]]
+        if rating1 == _UNRATED:
+            continue
+        rating2 = values[pos]
+        n += 1
+        sum1 += rating1
+        sum2 += rating2
+        sum1_sq += rating1 * rating1
+        sum2_sq += rating2 * rating2
+        product_sum += rating1 * rating2
+        power_sum += abs(rating1 - rating2) ** p
+
+    if not n:
+        return 0, 0
+    return n, finish_metric(metric, n, sum1, sum2, sum1_sq, sum2_sq, product_sum, power_sum, p)
+
+
+def score_against_all(store, item, metric='euclidean', p=1):
+    """
+    Score one book against every book in the store in a single sparse matrix-vector pass.
+
+    The target book becomes a dense rating vector over users; each row of the CSR
+    book-by-user matrix is then walked once, accumulating the co-rated sums every metric needs.
+    top_similar_items gives the same scores for the books sharing raters with the target while
+    walking only those rows; this whole-catalogue pass serves callers that want every score.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - item (int): The dense ID of the target book.
+    - metric (str): One of METRICS.
+    - p (float): The Minkowski order (Manhattan always uses 1).
+
+    Returns:
+    - tuple: Two arrays indexed by book ID: the metric values and the number of co-rated users.
+    """
+    check_metric(metric)
+    if metric == 'manhattan':
+        p = 1
+
+    vector = target_vector(store, item)
+    num_items = store.num_items
+    scores = array('d', bytes(8 * num_items))
+    overlaps = array('i', bytes(4 * num_items))
+    for other in range(num_items):
+        n, score = _score_row(store, vector, other, metric, p)
+        if n:
+            overlaps[other] = n
+            scores[other] = score
+
+    return scores, overlaps
+
+
+def _co_rater_counts(store, item, max_raters=None):
+    """
+    Count, for every book sharing a rater with the target, how many of the target's raters rated it.
+    """
+    raters, _ = store.item_view(item).row()
+
+    if max_raters is not None and len(raters) > max_raters:
+        count = store.user_stats.count
+        raters = sorted(raters, key=lambda user: (count[user], user))[:max_raters]
+
+    co_raters = Counter()
+    user_slice = store.user_slice
+    for user in raters:
+        user_items, _, start, stop = user_slice(user)
+        co_raters.update(user_items[start:stop])
+    co_raters.pop(item, None)
+    return co_raters
+
+
+def candidate_items(store, item, max_raters=None, max_candidates=None):
+    """
+    Generate the books that share at least one rater with the target, using the user rows as an inverted index.
+
+    Target book -> its raters -> every book those raters rated. Only these books can have
+    common ratings with the target, so the cost depends on its neighbourhood, not the catalogue size.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - item (int): The dense ID of the target book.
+    - max_raters (int): Expand at most this many raters, preferring those with the fewest ratings.
+    - max_candidates (int): Keep at most this many candidates, preferring those with the most co-raters.
+
+    Returns:
+    - list: Candidate book IDs (excluding the target) in ascending order.
+    """
+    return _limit_candidates(_co_rater_counts(store, item, max_raters), max_candidates)
+
+
+def _limit_candidates(co_raters, max_candidates=None):
+    if max_candidates is not None and len(co_raters) > max_candidates:
+        best = top_k(co_raters.items(), max_candidates, key=lambda entry: (entry[1], -entry[0]))
+        return sorted(other for other, _ in best)
+    return sorted(co_raters)
+
+
+def score_bound(metric, overlap=None):
+    """
+    Return the best value a candidate can reach under the metric, given its number of co-rated entries if known.
+
+    Ratings are non-negative, so cosine similarity is at most 1 and distances at least 0.
+    Pearson needs at least two co-rated entries; with fewer its denominator is zero and the value is 0.
+    """
+    if metric in DISTANCE_METRICS:
+        return 0
+    if metric == 'pearson' and overlap is not None and overlap < 2:
+        return 0
+    return 1
+
+
+def top_similar_items(store, item, k, metric='euclidean', p=1, max_raters=None, max_candidates=None, min_support=1):
+    """
+    Return the k books most similar to the target, keeping only O(k) results in memory.
+
+    Candidates come from the inverted index and are kept in a bounded heap. A candidate is
+    skipped without walking its ratings when its best achievable value (see score_bound)
+    cannot beat the current k-th result; once that holds for every remaining candidate, scoring stops early.
+    The result equals a full sort of all candidate scores (ties in book ID order) cut to k entries.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - item (int): The dense ID of the target book.
+    - k (int): The number of books to return.
+    - metric (str): One of METRICS.
+    - p (float): The Minkowski order (Manhattan always uses 1).
+    - max_raters (int): Cap on the raters expanded during candidate generation.
+    - max_candidates (int): Cap on the candidates scored.
+    - min_support (int): The minimum number of co-rated users a book needs to be returned.
+
+    Returns:
+    - list: (book ID, metric value) tuples, most similar first.
+    """
+    check_metric(metric)
+    with metrics_module.timer('similarity.one_vs_all.candidates', metric=metric):
+        co_raters = _co_rater_counts(store, item, max_raters)
+        candidates = _limit_candidates(co_raters, max_candidates)
+    # Co-rater counts are the exact overlaps only when every rater was expanded
+    overlaps = co_raters if max_raters is None else None
+    return rank_candidates(store, item, candidates, k, metric, p, min_support, overlaps)
+
+
+def top_similar_items_batch(store, item, queries, max_raters=None, max_candidates=None):
+    """
+    Answer several top_similar_items queries about the same target book, sharing the work they have in common.
+
+    The candidates and the target's dense vector are built once; queries differing only in k are
+    ranked once with the largest k and cut, since a shorter result is a prefix of a longer one.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - item (int): The dense ID of the target book.
+    - queries (list): (k, metric, p, min_support) tuples.
+    - max_raters (int): Cap on the raters expanded during candidate generation.
+    - max_candidates (int): Cap on the candidates scored.
+
+    Returns:
+    - list: One result per query, as top_similar_items returns it.
+    """
+    for _, metric, _, _ in queries:
+        check_metric(metric)
+    with metrics_module.timer('similarity.one_vs_all.candidates', metric='batch'):
+        co_raters = _co_rater_counts(store, item, max_raters)
+        candidates = _limit_candidates(co_raters, max_candidates)
+    overlaps = co_raters if max_raters is None else None
+    vector = target_vector(store, item)
+
+    largest = {}
+    for k, metric, p, min_support in queries:
+        setting = (metric, p, min_support)
+        largest[setting] = max(k, largest.get(setting, 0))
+    ranked = {setting: rank_candidates(store, item, candidates, k, *setting, overlaps, vector)
+              for setting, k in largest.items()}
+    return [ranked[metric, p, min_support][:k] for k, metric, p, min_support in queries]
+
+
+def rank_candidates(store, item, candidates, k, metric='euclidean', p=1, min_support=1, overlaps=None, vector=None):
+    """
+    Score the given candidate books against the target and return the k best, pruning as top_similar_items does.
+
+    Parameters:
+    - store (RatingStore): The rating store.
+    - item (int): The dense ID of the target book.
+    - candidates (iterable): Candidate book IDs, in the order ties should be broken.
+    - k (int): The number of books to return.
+    - metric (str): One of METRICS.
+    - p (float): The Minkowski order (Manhattan always uses 1).
+    - min_support (int): The minimum number of co-rated users a book needs to be returned.
+    - overlaps (dict): Optional exact number of co-rated users per candidate, used to skip candidates early.
+    - vector (array): Optional dense vector of the target's ratings, as target_vector returns it.
+
+    Returns:
+    - list: (book ID, metric value) tuples, most similar first.
+    """
+    check_metric(metric)
+    if metric == 'manhattan':
+        p = 1
+
+    with metrics_module.timer('similarity.one_vs_all.scoring', metric=metric):
+        if vector is None:
+            vector = target_vector(store, item)
+        top = TopK(k, largest=metric not in DISTANCE_METRICS)
+        best_possible = score_bound(metric)
+        scored = 0
+        for other in candidates:
+            if other == item:
+                continue
+            if not top.could_enter(best_possible):
+                break
+            if overlaps is not None:
+                overlap = overlaps[other]
+                if overlap < min_support or not top.could_enter(score_bound(metric, overlap)):
+                    continue
+            n, score = _score_row(store, vector, other, metric, p)
+            scored += 1
+            if n and n >= min_support:
+                top.push(other, score)
+    metrics_module.increment('similarity.one_vs_all.scored_candidates', scored, metric=metric)
+
+    with metrics_module.timer('similarity.one_vs_all.sorting', metric=metric):
+        return top.results()
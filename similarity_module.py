@@ -1,8 +1,96 @@
+import functools
+import inspect
 import math
+import time
+import weakref
+
+import intersection_module
+import metrics_module
+import similarity_engine_module
+from lru_module import LruCache
+from rating_store_module import BookProfile, UserProfile
+
+PAIR_CACHE_SIZE = 4096
+
+# One memo of pairwise results per rating store, dropped together with the store
+_pair_caches = weakref.WeakKeyDictionary()
+
+
+def _store_of(data):
+    """
+    Return the rating store behind book or user data, raising a TypeError for anything else.
+    """
+    if not isinstance(data, (BookProfile, UserProfile)):
+        raise TypeError(f"Expected the book data (BookProfile) or the user data (UserProfile) returned by the "
+                        f"loaders, got {type(data).__name__}.")
+    return data.store
+
+
+def pair_cache(data):
+    """
+    Return the memo of pairwise results for the rating store behind the book or user data.
+
+    The memo is emptied whenever the store's version changes; its stats() report hits, misses and evictions.
+    """
+    store = _store_of(data)
+    cache = _pair_caches.get(store)
+    if cache is None:
+        cache = LruCache(PAIR_CACHE_SIZE, store.version)
+        _pair_caches[store] = cache
+    cache.check_version(store.version)
+    return cache
+
+
+def _memoized(function):
+    """
+    Memoize a pairwise function per rating store, keyed on (function, parameters, ordered ID pair).
+
+    Every pairwise measure is symmetric, so (a, b) and (b, a) share one entry.
+    """
+    signature = inspect.signature(function)
+    defaults = tuple((name, parameter.default) for name, parameter in list(signature.parameters.items())[3:])
+
+    @functools.wraps(function)
+    def wrapper(id1, id2, data, *args, **kwargs):
+        # Instrumentation is checked once, so the disabled path costs a single attribute lookup
+        started = time.perf_counter() if metrics_module.enabled else None
+        cache = pair_cache(data)
+        # Normalize the parameters so positional and keyword calls share entries
+        parameters = defaults
+        if args or kwargs:
+            bound = signature.bind(id1, id2, data, *args, **kwargs)
+            bound.apply_defaults()
+            parameters = tuple(bound.arguments.items())[3:]
+        pair = (id1, id2) if id1 <= id2 else (id2, id1)
+        key = (function.__name__, type(data).__name__, parameters) + pair
+
+        result = cache.get(key)
+        outcome = 'hit'
+        if result is None:
+            result = function(id1, id2, data, *args, **kwargs)
+            cache.put(key, result)
+            outcome = 'miss'
+
+        if started is not None:
+            metrics_module.observe('similarity.pair', time.perf_counter() - started, metric=function.__name__)
+            metrics_module.increment('similarity.pair_cache', metric=function.__name__, result=outcome)
+        return result
+
+    return wrapper
+
+
+def _ratings_of(data, key, ratings='all'):
+    """
+    Return the ratings of a book or user in data, over all interactions or explicit ratings only.
+    """
+    store = _store_of(data).select(ratings)
+    if isinstance(data, BookProfile):
+        return store.book_ratings(key)
+    return store.ratings_by_user(key)
 
-import math
 
-def euclidean_distance(book1, book2, data):
+@_memoized
+def euclidean_distance(book1, book2, data, ratings='all'):
     """
     Calculate the Euclidean distance between two books based on their ratings.
     
@@ -16,33 +104,23 @@ def euclidean_distance(book1, book2, data):
     - book1 (str): The ID of the first book.
     - book2 (str): The ID of the second book.
     - data (dict): A dictionary containing user ratings for books.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
 
     Returns:
     - tuple: A tuple containing the Euclidean distance between the two books and an explanation string.
     
     """
 
-    common_ratings = {}
-    
     # Check if both books exist in the data
     if book1 in data and book2 in data:
-        ratings1 = data[book1]['ratings']
-        ratings2 = data[book2]['ratings']
-        
-        # Remove double quotes from keys and values
-        ratings1 = {key.strip('"'): float(value.strip('"')) for key, value in ratings1.items()}
-        ratings2 = {key.strip('"'): float(value.strip('"')) for key, value in ratings2.items()}
-        
-        # print(f"Ratings 1: {ratings1}\nRatings 2: {ratings2}")
-        
-        common_ratings = {key: (ratings1.get(key, 0), ratings2.get(key, 0)) for key in set(ratings1) & set(ratings2)}
-        # print(f"\nCommon Ratings:{common_ratings}\n")
-        
-        
-        if not common_ratings:
+        # Accumulate the sums over the co-rated users in a single pass
+        n, _, _, sum1_sq, sum2_sq, product_sum, _ = intersection_module.co_rated_sums(
+            _ratings_of(data, book1, ratings), _ratings_of(data, book2, ratings))
+
+        if not n:
             return 0, "No common ratings found."
 
-        squared_diff = sum((rating1 - rating2) ** 2 for rating1, rating2 in common_ratings.values())
+        squared_diff = sum1_sq - 2 * product_sum + sum2_sq
         euclidean_dist = math.sqrt(squared_diff)
 
         explanation = f"Euclidean Distance: {euclidean_dist:.2f}\nA lower Euclidean distance implies greater similarity."
@@ -52,7 +130,8 @@ def euclidean_distance(book1, book2, data):
         return 0, "One or both books not found in data."
 
 
-def pearson_correlation_coefficient(user1, user2, data):
+@_memoized
+def pearson_correlation_coefficient(user1, user2, data, ratings='all'):
     """
     Calculate the Pearson correlation coefficient between two users based on their ratings.
 
@@ -69,6 +148,7 @@ def pearson_correlation_coefficient(user1, user2, data):
     - user1 (str): The ID of the first user.
     - user2 (str): The ID of the second user.
     - data (dict): A dictionary containing user ratings for items.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
 
     Returns:
     - tuple: A tuple containing the Pearson correlation coefficient between the two users and an explanation string.
@@ -76,32 +156,15 @@ def pearson_correlation_coefficient(user1, user2, data):
     """
 
     if user1 in data and user2 in data:
-        
-        common_ratings = {}
-    
-        # Extract ratings for user1 and user2
-        ratings1 = data[user1]
-        ratings2 = data[user2]
-    
-        # print(f"Ratings 1: {ratings1}\nRatings 2: {ratings2}")
+        # Accumulate the sums over the co-rated books in a single pass
+        n, sum1, sum2, sum1_sq, sum2_sq, product_sum, _ = intersection_module.co_rated_sums(
+            _ratings_of(data, user1, ratings), _ratings_of(data, user2, ratings))
     
-        # Find common ratings
-        common_users = set(ratings1.keys()) & set(ratings2.keys())
-        common_ratings = {user: (float(ratings1[user].strip('"')), float(ratings2[user].strip('"'))) for user in common_users}
-        # print(f"\nCommon Ratings:{common_ratings}\n")
-    
-        if not common_ratings:
+        if not n:
             return 0, "No common ratings found."
     
-        n = len(common_ratings)
-        sum1 = sum(rating1 for rating1, _ in common_ratings.values())
-        sum2 = sum(rating2 for _, rating2 in common_ratings.values())
-        sum1_sq = sum(rating1 ** 2 for rating1, _ in common_ratings.values())
-        sum2_sq = sum(rating2 ** 2 for _, rating2 in common_ratings.values())
-        product_sum = sum(rating1 * rating2 for rating1, rating2 in common_ratings.values())
-    
         num = product_sum - (sum1 * sum2 / n)
-        den = math.sqrt((sum1_sq - sum1 ** 2 / n) * (sum2_sq - sum2 ** 2 / n))
+        den = math.sqrt(max((sum1_sq - sum1 ** 2 / n) * (sum2_sq - sum2 ** 2 / n), 0))
     
         if den == 0:
             return 0, "Denominator is zero."
@@ -114,7 +177,8 @@ def pearson_correlation_coefficient(user1, user2, data):
         return 0, "One or both users not found in data."
 
 
-def cosine_similarity(book1, book2, data):
+@_memoized
+def cosine_similarity(book1, book2, data, ratings='all'):
     """
     Calculate the cosine similarity between two items books based on their ratings.
 
@@ -131,34 +195,25 @@ def cosine_similarity(book1, book2, data):
     - book1 (str): The ID of the first book.
     - book2 (str): The ID of the second book.
     - data (dict): A dictionary containing user ratings for books.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
 
     Returns:
     - tuple: A tuple containing the cosine similarity between the two books and an explanation string.
     
     """
 
-    common_ratings = {}
-    
     # Check if both books exist in the data
     if book1 in data and book2 in data:
-        ratings1 = data[book1]['ratings']
-        ratings2 = data[book2]['ratings']
-        
-        # Remove double quotes from keys and values
-        ratings1 = {key.strip('"'): float(value.strip('"')) for key, value in ratings1.items()}
-        ratings2 = {key.strip('"'): float(value.strip('"')) for key, value in ratings2.items()}
-        
-        # print(f"Ratings 1: {ratings1}\nRatings 2: {ratings2}")
-        
-        common_ratings = {key: (ratings1.get(key, 0), ratings2.get(key, 0)) for key in set(ratings1) & set(ratings2)}
-        # print(f"\nCommon Ratings:{common_ratings}\n")
-        
-        if not common_ratings:
+        # Accumulate the sums over the co-rated users in a single pass
+        n, _, _, sum1_sq, sum2_sq, product_sum, _ = intersection_module.co_rated_sums(
+            _ratings_of(data, book1, ratings), _ratings_of(data, book2, ratings))
+
+        if not n:
             return 0, "No common ratings found."
 
-        dot_product = sum(rating1 * rating2 for rating1, rating2 in common_ratings.values())
-        magnitude_item1 = math.sqrt(sum(rating ** 2 for rating, _ in common_ratings.values()))
-        magnitude_item2 = math.sqrt(sum(rating ** 2 for _, rating in common_ratings.values()))
+        dot_product = product_sum
+        magnitude_item1 = math.sqrt(sum1_sq)
+        magnitude_item2 = math.sqrt(sum2_sq)
 
         if magnitude_item1 == 0 or magnitude_item2 == 0:
             return 0, "Magnitude of one or both items is zero."
@@ -171,7 +226,8 @@ def cosine_similarity(book1, book2, data):
         return 0, "One or both books not found in data."
 
 
-def manhattan_distance(user1, user2, data):
+@_memoized
+def manhattan_distance(user1, user2, data, ratings='all'):
     """
     Calculate the Manhattan distance between two items (users or books) based on their ratings.
 
@@ -186,38 +242,30 @@ def manhattan_distance(user1, user2, data):
     - user1 (str): The ID of the first user.
     - user2 (str): The ID of the second user.
     - data (dict): A dictionary containing user ratings for items.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
 
     Returns:
      - tuple: A tuple containing the Manhattan distance between the two users and an explanation string.
     
     """
 
-    common_ratings = {}
-    
     if user1 in data and user2 in data:
-        # Extract ratings for user1 and user2
-        ratings1 = data[user1]
-        ratings2 = data[user2]
-    
-        # print(f"Ratings 1: {ratings1}\nRatings 2: {ratings2}")
-        
-        # Find common ratings
-        common_users = set(ratings1.keys()) & set(ratings2.keys())
-        common_ratings = {user: (float(ratings1[user].strip('"')), float(ratings2[user].strip('"'))) for user in common_users}
-    
-        # print(f"\nCommon Ratings:{common_ratings}\n")
+        # Accumulate the sums over the co-rated books in a single pass
+        n, _, _, _, _, _, abs_diff_sum = intersection_module.co_rated_sums(
+            _ratings_of(data, user1, ratings), _ratings_of(data, user2, ratings), p=1)
         
-        if not common_ratings:
+        if not n:
             return 0, "No common ratings found."
     
-        manhattan_dist = sum(abs(rating1 - rating2) for rating1, rating2 in common_ratings.values())
+        manhattan_dist = float(abs_diff_sum)
         explanation = f"Manhattan Distance: {manhattan_dist:.2f}\nA lower Manhattan distance implies greater similarity."
         return manhattan_dist, explanation
     else:
         return 0, "One or both users not found in data."
 
 
-def minkowski_distance(book1, book2, data, p=1):
+@_memoized
+def minkowski_distance(book1, book2, data, p=1, ratings='all'):
     """
     Calculate the Minkowski distance between two books based on their ratings.
 
@@ -233,115 +281,201 @@ def minkowski_distance(book1, book2, data, p=1):
     - book1 (str): The ID of the first book.
     - book2 (str): The ID of the second book.
     - data (dict): A dictionary containing user ratings for books.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
 
     Returns:
     - tuple: A tuple containing the Minkowski distance between the two books and an explanation string.
     
     """
-    common_ratings = {}
-    
+
     # Check if both books exist in the data
     if book1 in data and book2 in data:
-        ratings1 = data[book1]['ratings']
-        ratings2 = data[book2]['ratings']
-        
-        # Remove double quotes from keys and values
-        ratings1 = {key.strip('"'): float(value.strip('"')) for key, value in ratings1.items()}
-        ratings2 = {key.strip('"'): float(value.strip('"')) for key, value in ratings2.items()}
-        
-        # print(f"Ratings 1: {ratings1}\nRatings 2: {ratings2}")
-        
-        common_ratings = {key: (ratings1.get(key, 0), ratings2.get(key, 0)) for key in set(ratings1) & set(ratings2)}
-        # print(f"\nCommon Ratings:{common_ratings}\n")
-        
-        if not common_ratings:
+        # Accumulate the sums over the co-rated users in a single pass
+        n, _, _, _, _, _, power_sum = intersection_module.co_rated_sums(
+            _ratings_of(data, book1, ratings), _ratings_of(data, book2, ratings), p)
+
+        if not n:
             return 0, "No common ratings found."
 
-    minkowski_dist = sum(abs(rating1 - rating2) ** p for rating1, rating2 in common_ratings.values()) ** (1 / p)
-    explanation = f"Minkowski Distance (p={p}): {minkowski_dist:.2f}\nSmaller values imply greater similarity."
+        minkowski_dist = power_sum ** (1 / p)
+        explanation = f"Minkowski Distance (p={p}): {minkowski_dist:.2f}\nSmaller values imply greater similarity."
 
-    return minkowski_dist, explanation
+        return minkowski_dist, explanation
+    else:
+        return 0, "One or both books not found in data."
 
 
-def find_n_similar_books(book_id, num_books, data):
+def compare_all_metrics(id1, id2, data, p_values=(1, 2, 3), ratings='all'):
     """
-    Find similar books to a given book based on Euclidean distance.
+    Calculate every similarity measure between two books or two users in a single pass over their common ratings.
+
+    This is the cheap way to compare measures side by side: the IDs are looked up and the
+    common ratings intersected once, instead of once per measure.
+
+    Parameters:
+    - id1 (str): The ID of the first book or user.
+    - id2 (str): The ID of the second book or user.
+    - data (dict): The book data (ISBN -> details with 'ratings') or the user data (user ID -> ratings).
+    - p_values (sequence): The orders for which to report the Minkowski distance.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
+
+    Returns:
+    - tuple: A tuple containing a dictionary of results ('euclidean', 'cosine', 'pearson', 'manhattan'
+      and 'minkowski', the latter mapping each p to its distance) and an explanation string.
+    
+    """
+
+    # Only the loaders' book and user data are supported (a TypeError otherwise)
+    _store_of(data)
+    if id1 not in data or id2 not in data:
+        return {}, "One or both IDs not found in data."
+
+    with metrics_module.timer('similarity.compare_all.intersection'):
+        sums = intersection_module.co_rated_sums_multi(_ratings_of(data, id1, ratings),
+                                                       _ratings_of(data, id2, ratings), p_values)
+    n, sum1, sum2, sum1_sq, sum2_sq, product_sum, abs_diff_sum, power_sums = sums
+
+    if not n:
+        return {}, "No common ratings found."
+
+    finish = similarity_engine_module.finish_metric
+    results = {
+        'euclidean': finish('euclidean', n, sum1, sum2, sum1_sq, sum2_sq, product_sum, 0),
+        'cosine': finish('cosine', n, sum1, sum2, sum1_sq, sum2_sq, product_sum, 0),
+        'pearson': finish('pearson', n, sum1, sum2, sum1_sq, sum2_sq, product_sum, 0),
+        'manhattan': float(abs_diff_sum),
+        'minkowski': {p: power_sum ** (1 / p) for p, power_sum in zip(p_values, power_sums)}
+    }
+
+    lines = [f"Common ratings: {n}",
+             f"Euclidean Distance: {results['euclidean']:.2f}",
+             f"Cosine Similarity: {results['cosine']:.2f}",
+             f"Pearson Correlation Coefficient: {results['pearson']:.2f}",
+             f"Manhattan Distance: {results['manhattan']:.2f}"]
+    lines.extend(f"Minkowski Distance (p={p}): {distance:.2f}" for p, distance in results['minkowski'].items())
+    explanation = "\n".join(lines)
+
+    return results, explanation
+
+
+# The pairwise functions behind compare_pair, by metric name
+PAIR_FUNCTIONS = {
+    'euclidean': euclidean_distance,
+    'cosine': cosine_similarity,
+    'minkowski': minkowski_distance,
+    'pearson': pearson_correlation_coefficient,
+    'manhattan': manhattan_distance
+}
+
+
+def compare_pair(id1, id2, data, metric='all', p=1, ratings='all'):
+    """
+    Compare two books or two users on one metric, or on every metric at once ('all').
+
+    Parameters:
+    - id1 (str): The ID of the first book or user.
+    - id2 (str): The ID of the second book or user.
+    - data (dict): The book data or the user data, as for the pairwise functions.
+    - metric (str): 'all' or one of PAIR_FUNCTIONS.
+    - p (float): The order of the Minkowski distance (used by 'minkowski' only).
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
+
+    Returns:
+    - tuple: The metric value (for 'all', the results dictionary of compare_all_metrics) and an explanation string.
+    """
+    if metric == 'all':
+        return compare_all_metrics(id1, id2, data, ratings=ratings)
+    function = PAIR_FUNCTIONS.get(metric)
+    if function is None:
+        raise ValueError(f"Unknown metric '{metric}'. Choose one of: all, {', '.join(PAIR_FUNCTIONS)}.")
+    if metric == 'minkowski':
+        return function(id1, id2, data, p, ratings=ratings)
+    return function(id1, id2, data, ratings=ratings)
+
+
+def find_n_similar_books(book_id, num_books, data, metric='euclidean', p=1, max_raters=None, max_candidates=None,
+                         knn_table=None, candidate_index=None, min_support=1, rater_sets=None,
+                         ratings='all'):
+    """
+    Find similar books to a given book based on Euclidean distance (or another metric).
+
+    Only books that share at least one rater with the given book are scored; they are found
+    through the users' ratings, so books without common ratings never appear in the results.
 
     Parameters:
     - book_id (str): The ID of the book for which to find similar books.
+    - num_books (int): The number of similar books to return.
     - data (dict): A dictionary containing book data.
+    - metric (str): 'euclidean', 'manhattan', 'minkowski', 'cosine' or 'pearson'.
+    - p (float): The Minkowski order.
+    - max_raters (int): Optional cap on how many of the book's raters are expanded into candidates.
+    - max_candidates (int): Optional cap on how many candidate books are scored.
+    - knn_table (KnnTable): Optional precomputed neighbour table; books it covers are answered from it
+      without scoring when it was built with the same metric and min_support, books added after it
+      was built are scored live.
+    - candidate_index (LshIndex or SimHashIndex): Optional approximate index; when given, only the books
+      returned by its candidates() are scored exactly (MinHash/LSH bucket-mates, or the SimHash pre-filter
+      of books with the highest estimated cosine; see lsh_module.measure_recall for the recall).
+    - min_support (int): The minimum number of co-rated users a book needs to be returned.
+    - rater_sets (RaterSets): Optional rater bitsets; with candidate_index, candidates below min_support
+      are dropped by a bitwise overlap count before any metric is computed.
+    - ratings (str): 'all' to treat implicit interactions (rating 0) as zero ratings, 'explicit' to ignore them.
+      The knn_table, candidate_index and rater_sets must have been built over the same ratings.
 
     Returns:
-    - list: A list of tuples containing (book_id, euclidean_distance) for the similar books.
+    - list: A list of tuples containing (book_id, score) for the similar books.
     """
 
-    # Print book details
-    print("BOOK DETAILS:")
-    print("--------------")
-    print("Book ID:", book_id)
-    print("Title:", data[book_id]['title'])
-    print("Author:", data[book_id]['author'])
-    print("Year:", data[book_id]['year'])
-    print()
-
-    def euclidean_distance(book1, book2, data):
-        """
-        Calculate the Euclidean distance between two books based on their ratings.
-
-        Parameters:
-        - book1 (str): The ID of the first book.
-        - book2 (str): The ID of the second book.
-        - data (dict): A dictionary containing user ratings for books.
-
-        Returns:
-        - float: The Euclidean distance between the two books.
-        """
-
-        common_ratings = {}
-
-        # Check if both books exist in the data
-        if book1 in data and book2 in data:
-            ratings1 = data[book1]['ratings']
-            ratings2 = data[book2]['ratings']
-
-            # Remove double quotes from keys and values
-            ratings1 = {key.strip('"'): float(value.strip('"')) for key, value in ratings1.items()}
-            ratings2 = {key.strip('"'): float(value.strip('"')) for key, value in ratings2.items()}
-
-            common_ratings = {key: (ratings1.get(key, 0), ratings2.get(key, 0)) for key in set(ratings1) & set(ratings2)}
-
-            if not common_ratings:
-                return 0
-
-            squared_diff = sum((rating1 - rating2) ** 2 for rating1, rating2 in common_ratings.values())
-            return math.sqrt(squared_diff)
-        else:
-            return 0
-
-    valid_books = {}
-    for book_id, book_data in data.items():
-        if 'ratings' in book_data:
-            # Check if all ratings are valid numerical values
-            ratings = book_data['ratings']
-            if all(isinstance(rating, int) or isinstance(rating, float) for rating in ratings.values()):
-                valid_books[book_id] = book_data
-
-    # Compute Euclidean distance between the given book and all other valid books
-    distances = [(other_book_id, euclidean_distance(book_id, other_book_id, data)) for other_book_id in valid_books.keys() if other_book_id != book_id]
-
-    # Sort the distances in ascending order
-    distances.sort(key=lambda x: x[1])
-
-    # Return the n most similar books
-    similar_books = distances[:num_books]
-
-    # Print details of the similar books
-    print("SIMILAR BOOKS:")
-    print("--------------")
-    for similar_book_id, euclidean_distance in similar_books:
-        print("Book ID:", similar_book_id)
-        print("Title:", data[similar_book_id]['title'])
-        print("Author:", data[similar_book_id]['author'])
-        print("Year:", data[similar_book_id]['year'])
-        print("Euclidean Distance:", euclidean_distance)
-        print()
\ No newline at end of file
+    if book_id not in data:
+        print("Book not found in data.")
+        return []
+
+    start = time.perf_counter()
+    with metrics_module.timer('similarity.one_vs_all.printing', metric=metric):
+        # Print book details
+        print("BOOK DETAILS:")
+        print("--------------")
+        print("Book ID:", book_id)
+        print("Title:", data[book_id]['title'])
+        print("Author:", data[book_id]['author'])
+        print("Year:", data[book_id]['year'])
+        print()
+
+    similar_books = None
+    if knn_table is not None and knn_table.answers(metric, p, num_books, min_support):
+        similar_books = knn_table.neighbours_of(book_id, num_books)
+        metrics_module.increment('similarity.one_vs_all.knn_table_hits', metric=metric)
+
+    if similar_books is None:
+        # Keep the n best of the books sharing at least one rater with the given book
+        store = _store_of(data).select(ratings)
+        item = store.items.get(book_id)
+        ranked = []
+        if item is not None and candidate_index is not None:
+            with metrics_module.timer('similarity.one_vs_all.candidates', metric=metric):
+                candidates = candidate_index.candidates(item)
+                overlaps = None
+                if rater_sets is not None:
+                    overlaps = rater_sets.overlaps(item, candidates, min_support)
+                    candidates = [other for other in candidates if other in overlaps]
+            ranked = similarity_engine_module.rank_candidates(store, item, candidates, num_books, metric, p,
+                                                              min_support, overlaps)
+        elif item is not None:
+            ranked = similarity_engine_module.top_similar_items(store, item, num_books, metric, p, max_raters,
+                                                                max_candidates, min_support)
+        similar_books = [(store.items.name(other), score) for other, score in ranked]
+
+    with metrics_module.timer('similarity.one_vs_all.printing', metric=metric):
+        # Print details of the similar books
+        print("SIMILAR BOOKS:")
+        print("--------------")
+        for similar_book_id, score in similar_books:
+            print("Book ID:", similar_book_id)
+            print("Title:", data[similar_book_id]['title'])
+            print("Author:", data[similar_book_id]['author'])
+            print("Year:", data[similar_book_id]['year'])
+            print(f"{metric.capitalize()} {'Distance' if metric in similarity_engine_module.DISTANCE_METRICS else 'Similarity'}:", score)
+            print()
+
+    metrics_module.observe('similarity.one_vs_all', time.perf_counter() - start, metric=metric)
+    return similar_books
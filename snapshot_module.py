@@ -0,0 +1,485 @@
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import zlib
+from array import array
+
+from rating_stats_module import RatingStats
+from rating_store_module import ID_TYPECODE, OFFSET_TYPECODE, RatingStore
+
+# Binary snapshot layout:
+#   magic (8 bytes) | format version (uint32) | header length (uint32) | JSON header | sections
+# Every section starts on an 8-byte boundary so it can be cast straight out of the memory map.
+SNAPSHOT_MAGIC = b'ISRESNAP'
+SNAPSHOT_VERSION = 4
+SNAPSHOT_SUFFIX = '.snapshot'
+_PREAMBLE = struct.Struct('<8sII')
+_ALIGNMENT = 8
+
+# Block size used when hashing the source CSV files
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Field separator used for book records in the metadata snapshot
+RECORD_SEPARATOR = '\x1f'
+
+
+def fingerprint(source_path, with_hash=True):
+    """
+    Describe a source CSV file by its size, modification time and (optionally) content hash.
+    """
+    info = os.stat(source_path)
+    result = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(source_path, 'rb') as file:
+            for block in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(block)
+        result['hash'] = digest.hexdigest()
+    return result
+
+
+def write_snapshot(snapshot_path, source_path, sections, metadata=None):
+    """
+    Write named array sections to a versioned snapshot file tied to a source CSV file.
+
+    Parameters:
+    - snapshot_path (str): The path of the snapshot file to write.
+    - source_path (str): The CSV file the sections were parsed from (None if the file is not tied to one).
+    - sections (dict): Section name -> array (or bytes) holding the data.
+    - metadata (dict): Optional JSON-serialisable values stored in the header.
+    """
+    header = {
+        'source': fingerprint(source_path) if source_path else None,
+        'metadata': metadata or {},
+        'sections': {}
+    }
+
+    # Lay the sections out back to back, each aligned for casting
+    layout = []
+    offset = 0
+    for name, data in sections.items():
+        if isinstance(data, (bytes, bytearray)):
+            data = array('B', data)
+        offset = _align(offset)
+        header['sections'][name] = [offset, data.typecode, len(data)]
+        layout.append((offset, data))
+        offset += len(data) * data.itemsize
+
+    header_bytes = json.dumps(header).encode('ascii')
+    data_start = _align(_PREAMBLE.size + len(header_bytes))
+
+    # Write to a temporary file first so readers never see a half-written snapshot
+    temp_path = f'{snapshot_path}.tmp{os.getpid()}'
+    with open(temp_path, 'wb') as file:
+        file.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+        file.write(header_bytes)
+        for offset, data in layout:
+            file.seek(data_start + offset)
+            data.tofile(file)
+    os.replace(temp_path, snapshot_path)
+
+
+def map_snapshot(snapshot_path):
+    """
+    Memory-map a snapshot file without checking it against its source.
+
+    Returns:
+    - tuple: The header dictionary and the sections (name -> memoryview cast to the section's type),
+      or None if the file is missing or has another format version.
+    """
+    try:
+        with open(snapshot_path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+    if len(view) < _PREAMBLE.size:
+        return None
+    magic, version, header_length = _PREAMBLE.unpack_from(view)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        return None
+    header = json.loads(bytes(view[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+
+    data_start = _align(_PREAMBLE.size + header_length)
+    sections = {}
+    for name, (offset, typecode, length) in header['sections'].items():
+        start = data_start + offset
+        size = length * array(typecode).itemsize
+        sections[name] = view[start:start + size].cast(typecode)
+    return header, sections
+
+
+def read_snapshot(snapshot_path, source_path, verify_hash=False):
+    """
+    Memory-map a snapshot file and return its sections, or None if it is missing or stale.
+
+    A snapshot is stale if its format version differs or the source CSV's size changed.
+    If the modification time changed too (or verify_hash is True) the content hash decides;
+    when only the modification time changed, the snapshot's fingerprint is brought up to date
+    so later loads do not hash the file again.
+
+    Returns:
+    - dict: Section name -> memoryview cast to the section's type, or None.
+    """
+    mapped = map_snapshot(snapshot_path)
+    if mapped is None:
+        return None
+
+    header, sections = mapped
+    recorded = header['source']
+    current = _current_fingerprint(recorded, source_path, verify_hash) if recorded else None
+    if current is None:
+        return None
+
+    # The content is unchanged but the file was touched (e.g. by a checkout): record the new fingerprint
+    if current['mtime_ns'] != recorded['mtime_ns']:
+        try:
+            refresh_source(snapshot_path, current)
+        except (OSError, ValueError) as e:
+            print(f'Error updating snapshot: {e}')
+    return sections
+
+
+def _current_fingerprint(recorded, source_path, verify_hash):
+    """
+    Return the source's current fingerprint if it still matches the recorded one, else None.
+    """
+    try:
+        current = fingerprint(source_path, with_hash=False)
+    except OSError:
+        return None
+    if current['size'] != recorded['size']:
+        return None
+    if current['mtime_ns'] == recorded['mtime_ns'] and not verify_hash:
+        return current
+    try:
+        current = fingerprint(source_path)
+    except OSError:
+        return None
+    return current if current['hash'] == recorded['hash'] else None
+
+
+def refresh_source(snapshot_path, source):
+    """
+    Rewrite the source fingerprint recorded in a snapshot file, keeping its sections.
+
+    The file is replaced atomically, so processes that already mapped the old one are not affected.
+
+    Parameters:
+    - snapshot_path (str): The path of the snapshot file.
+    - source (dict): The new fingerprint, as returned by fingerprint().
+    """
+    temp_path = f'{snapshot_path}.tmp{os.getpid()}'
+    with open(snapshot_path, 'rb') as file:
+        magic, version, header_length = _PREAMBLE.unpack(file.read(_PREAMBLE.size))
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f'{snapshot_path} is not a version {SNAPSHOT_VERSION} snapshot')
+        header = json.loads(file.read(header_length))
+        header['source'] = source
+        header_bytes = json.dumps(header).encode('ascii')
+
+        # Copy the sections unchanged after the new header
+        file.seek(_align(_PREAMBLE.size + header_length))
+        with open(temp_path, 'wb') as out:
+            out.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header_bytes)))
+            out.write(header_bytes)
+            out.seek(_align(_PREAMBLE.size + len(header_bytes)))
+            shutil.copyfileobj(file, out, _HASH_CHUNK_SIZE)
+    os.replace(temp_path, snapshot_path)
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+class MappedNames:
+    """
+    Sequence of names decoded on demand from an offset-indexed blob.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, idx):
+        return bytes(self.blob[self.offsets[idx]:self.offsets[idx + 1]]).decode('latin-1')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class MappedIdTable:
+    """
+    Read-only ID table served from a snapshot through an open-addressing hash table.
+
+    It has the same lookup interface as IdTable, without building a dictionary at startup.
+    """
+
+    def __init__(self, offsets, blob, slots):
+        self.names = MappedNames(offsets, blob)
+        self.offsets = offsets
+        self.blob = blob
+        self.slots = slots
+        self.mask = len(slots) - 1
+
+    def get(self, name, default=None):
+        try:
+            key = name.encode('latin-1')
+        except (UnicodeEncodeError, AttributeError):
+            return default
+
+        slot = zlib.crc32(key) & self.mask
+        while True:
+            entry = self.slots[slot]
+            if entry == 0:
+                return default
+            idx = entry - 1
+            if self.blob[self.offsets[idx]:self.offsets[idx + 1]] == key:
+                return idx
+            slot = (slot + 1) & self.mask
+
+    def name(self, idx):
+        return self.names[idx]
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def id_table_sections(prefix, table):
+    """
+    Encode an ID table as name offsets, a name blob and an open-addressing hash table.
+    """
+    encoded = [name.encode('latin-1') for name in table]
+    offsets = array(OFFSET_TYPECODE, [0])
+    for key in encoded:
+        offsets.append(offsets[-1] + len(key))
+
+    # Keep the table at most half full so probes stay short
+    size = 1
+    while size < 2 * len(encoded):
+        size *= 2
+    slots = array(ID_TYPECODE, bytes(size * array(ID_TYPECODE).itemsize))
+    mask = size - 1
+    for idx, key in enumerate(encoded):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = idx + 1
+
+    return {
+        f'{prefix}_offsets': offsets,
+        f'{prefix}_blob': b''.join(encoded),
+        f'{prefix}_slots': slots
+    }
+
+
+def mapped_id_table(prefix, sections):
+    """
+    Rebuild an ID table written by id_table_sections from mapped snapshot sections.
+    """
+    return MappedIdTable(sections[f'{prefix}_offsets'], sections[f'{prefix}_blob'], sections[f'{prefix}_slots'])
+
+
+_STATS_COLUMNS = ('count', 'total', 'total_sq', 'mean', 'norm')
+
+
+def _stats_sections(prefix, stats):
+    return {f'{prefix}_{column}': getattr(stats, column) for column in _STATS_COLUMNS}
+
+
+def _stats_from_sections(prefix, sections):
+    return RatingStats(*(sections[f'{prefix}_{column}'] for column in _STATS_COLUMNS))
+
+
+def save_store_snapshot(snapshot_path, ratings_path, store):
+    """
+    Write a rating store to a snapshot tied to the ratings CSV it was parsed from.
+    """
+    (item_ptr, item_users, item_ratings), (user_ptr, user_items, user_ratings) = store.columns()
+    sections = {
+        'item_ptr': item_ptr,
+        'item_users': item_users,
+        'item_ratings': item_ratings,
+        'user_ptr': user_ptr,
+        'user_items': user_items,
+        'user_ratings': user_ratings
+    }
+    sections.update(_stats_sections('item_stats', store.item_stats))
+    sections.update(_stats_sections('user_stats', store.user_stats))
+    sections.update(id_table_sections('item_names', store.items))
+    sections.update(id_table_sections('user_names', store.users))
+    write_snapshot(snapshot_path, ratings_path, sections)
+
+
+def load_store_snapshot(snapshot_path, ratings_path, verify_hash=False):
+    """
+    Map a rating store snapshot, or return None if it is missing or stale.
+    """
+    sections = read_snapshot(snapshot_path, ratings_path, verify_hash)
+    if sections is None:
+        return None
+
+    items = mapped_id_table('item_names', sections)
+    users = mapped_id_table('user_names', sections)
+    return RatingStore(items, users,
+                       sections['item_ptr'], sections['item_users'], sections['item_ratings'],
+                       sections['user_ptr'], sections['user_items'], sections['user_ratings'],
+                       _stats_from_sections('item_stats', sections), _stats_from_sections('user_stats', sections))
+
+
+class BookCatalog:
+    """
+    Books.csv records (isbn, title, author, year) kept as one encoded blob and decoded on demand.
+
+    An open-addressing hash table maps each ISBN to its record; when Books.csv repeats an ISBN the
+    last record wins, as it did with the old dictionary. The order section holds the record of every
+    distinct ISBN, in the order the ISBNs first appear in the file.
+
+    Parameters:
+    - offsets (sequence): Start of every record in the blob, plus the end of the last one.
+    - blob (bytes-like): The records, fields joined by RECORD_SEPARATOR, Latin-1 encoded.
+    - slots (sequence): The hash table: record index + 1, or 0 for an empty slot.
+    - order (sequence): The record index of every distinct ISBN.
+    """
+
+    _SEPARATOR = ord(RECORD_SEPARATOR)
+
+    def __init__(self, offsets, blob, slots, order):
+        self.offsets = offsets
+        self.blob = blob
+        self.slots = slots
+        self.order = order
+        self.mask = len(slots) - 1
+
+    def index(self, isbn):
+        """
+        Return the record index of an ISBN, or None if it is not in the catalog.
+        """
+        try:
+            key = isbn.encode('latin-1')
+        except (UnicodeEncodeError, AttributeError):
+            return None
+
+        blob, offsets, slots, mask = self.blob, self.offsets, self.slots, self.mask
+        end = len(key)
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return None
+            start = offsets[entry - 1]
+            stop = start + end
+            if stop < offsets[entry] and blob[stop] == self._SEPARATOR and blob[start:stop] == key:
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def record(self, idx):
+        """
+        Decode one record into its [isbn, title, author, year] fields.
+        """
+        return bytes(self.blob[self.offsets[idx]:self.offsets[idx + 1]]).decode('latin-1').split(RECORD_SEPARATOR)
+
+    def details(self, isbn):
+        """
+        Return the (title, author, year) of a book, or None if it is not in the catalog.
+        """
+        idx = self.index(isbn)
+        if idx is None:
+            return None
+        _, title, author, year = self.record(idx)
+        return title, author, year
+
+    def records(self):
+        """
+        Generate the record of every distinct ISBN, in file order.
+        """
+        for idx in self.order:
+            yield self.record(idx)
+
+    def nbytes(self):
+        return sum(len(section) * getattr(section, 'itemsize', 1)
+                   for section in (self.offsets, self.blob, self.slots, self.order))
+
+    def __contains__(self, isbn):
+        return self.index(isbn) is not None
+
+    def __iter__(self):
+        for record in self.records():
+            yield record[0]
+
+    def __len__(self):
+        return len(self.order)
+
+
+def book_catalog_sections(records):
+    """
+    Encode Books.csv records (isbn, title, author, year) as the sections of a BookCatalog.
+    """
+    offsets = array(OFFSET_TYPECODE, [0])
+    blob = bytearray()
+    keys = {}
+    order = array(ID_TYPECODE)
+    for idx, record in enumerate(records):
+        blob += RECORD_SEPARATOR.join(record).encode('latin-1')
+        offsets.append(len(blob))
+        # A repeated ISBN keeps its first position in the order but points to its last record
+        key = record[0].encode('latin-1')
+        position = keys.get(key)
+        if position is None:
+            keys[key] = len(order)
+            order.append(idx)
+        else:
+            order[position] = idx
+
+    # Keep the table at most half full so probes stay short
+    size = 1
+    while size < 2 * len(keys):
+        size *= 2
+    slots = array(ID_TYPECODE, bytes(size * array(ID_TYPECODE).itemsize))
+    mask = size - 1
+    for key, position in keys.items():
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = order[position] + 1
+
+    return {'book_offsets': offsets, 'book_blob': bytes(blob), 'book_slots': slots, 'book_order': order}
+
+
+def book_catalog(records):
+    """
+    Build an in-memory BookCatalog from Books.csv records, for when no snapshot is used.
+    """
+    sections = book_catalog_sections(records)
+    return BookCatalog(sections['book_offsets'], sections['book_blob'], sections['book_slots'], sections['book_order'])
+
+
+def save_books_snapshot(snapshot_path, books_path, records):
+    """
+    Write parsed Books.csv records (isbn, title, author, year) to a snapshot tied to the CSV file.
+    """
+    write_snapshot(snapshot_path, books_path, book_catalog_sections(records))
+
+
+def load_books_snapshot(snapshot_path, books_path, verify_hash=False):
+    """
+    Map a Books.csv snapshot as a BookCatalog, or return None if it is missing or stale.
+    """
+    sections = read_snapshot(snapshot_path, books_path, verify_hash)
+    if sections is None:
+        return None
+    return BookCatalog(sections['book_offsets'], sections['book_blob'], sections['book_slots'], sections['book_order'])
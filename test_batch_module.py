@@ -0,0 +1,67 @@
+import threading
+
+import batch_module
+from engine_module import Dataset
+from rating_store_module import BookProfile, RatingStoreBuilder
+from snapshot_module import book_catalog
+
+
+def build_dataset(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    store = builder.build()
+    catalog = book_catalog([(isbn, f'Title {isbn}', 'Author', '2000') for isbn in store.items])
+    return Dataset(BookProfile(store, catalog), {})
+
+
+RATINGS = [('1', 'A', 5), ('2', 'A', 7), ('1', 'B', 4), ('2', 'B', 8), ('3', 'B', 2), ('1', 'C', 9), ('3', 'C', 6)]
+
+
+def test_ordered_results_follow_the_input():
+    dataset = build_dataset(RATINGS)
+    queries = [(index, {'op': 'top-users', 'n': index % 3 + 1, 'id': index}) for index in range(40)]
+    records = list(batch_module.run_batch(queries, dataset, workers=3, executor='thread', ordered=True, chunk_size=2))
+    assert [record['index'] for record in records] == list(range(40))
+    assert [len(record['result']) for record in records] == [index % 3 + 1 for index in range(40)]
+
+
+def test_bad_queries_give_error_records():
+    dataset = build_dataset(RATINGS)
+    queries = list(enumerate([
+        {'op': 'similarity', 'id1': 'A', 'id2': 'B', 'metric': 'minkowski', 'p': 0},
+        {'op': 'similarity', 'id1': 'A', 'id2': 'B', 'metric': 'hamming'},
+        {'op': 'nope'},
+        {'op': None, 'malformed': 'Malformed query line: bad'},
+        {'op': 'similarity', 'id1': 'A', 'id2': 'B', 'metric': 'cosine'}
+    ]))
+    records = list(batch_module.run_batch(queries, dataset, workers=1, executor='thread', ordered=True))
+    assert records[0]['error'].startswith('ZeroDivisionError')
+    assert records[1]['error'].startswith('ValueError')
+    assert records[2]['error'].startswith('ValueError')
+    assert records[3]['error'] == 'ValueError: Malformed query line: bad'
+    assert 'error' not in records[4] and records[4]['result']['value'] > 0
+
+
+def test_ordered_window_is_bounded_behind_a_slow_chunk(monkeypatch):
+    dataset = build_dataset(RATINGS)
+    release = threading.Event()
+    started = []
+    run_chunk = batch_module._run_chunk
+
+    def slow_first_chunk(chunk):
+        started.append(chunk[0][0])
+        if chunk[0][0] == 0:
+            release.wait(5)
+        return run_chunk(chunk)
+
+    monkeypatch.setattr(batch_module, '_run_chunk', slow_first_chunk)
+    queries = [(index, {'op': 'top-books', 'n': 1}) for index in range(200)]
+    results = batch_module.run_batch(queries, dataset, workers=2, executor='thread', ordered=True, chunk_size=1)
+    threading.Timer(0.3, release.set).start()
+    first = next(results)
+
+    # While the first chunk was held up, no more than the window was ever submitted
+    assert first['index'] == 0
+    assert len(started) <= 2 * batch_module.CHUNKS_IN_FLIGHT + 1
+    assert [record['index'] for record in results] == list(range(1, 200))
@@ -0,0 +1,32 @@
+import random
+
+from bitset_module import RaterSets
+from rating_store_module import RatingStoreBuilder
+
+
+def random_store(seed=1, num_ratings=2000):
+    rng = random.Random(seed)
+    builder = RatingStoreBuilder()
+    for _ in range(num_ratings):
+        # A few popular books give the store both dense and sparse rows
+        book = int(rng.paretovariate(1.0)) % 200
+        builder.add(str(rng.randrange(300)), f'B{book}', rng.randint(0, 10))
+    return builder.build()
+
+
+def test_overlaps_match_set_intersections():
+    store = random_store()
+    raters = RaterSets(store, min_dense=40)
+    assert raters.bitmaps and len(raters.bitmaps) < store.num_items
+
+    sets = [set(raters.members(item)) for item in range(store.num_items)]
+    for row in range(store.num_items):
+        expected = {other: len(sets[row] & sets[other]) for other in range(store.num_items)
+                    if other != row and len(sets[row] & sets[other]) >= 2}
+        assert raters.overlaps(row, range(store.num_items), min_support=2) == expected
+        for other in range(0, store.num_items, 7):
+            common = len(sets[row] & sets[other])
+            assert raters.overlap(row, other) == common
+            assert raters.has_overlap(row, other) == bool(common)
+            union = len(sets[row] | sets[other])
+            assert raters.jaccard(row, other) == (common / union if union else 0.0)
@@ -0,0 +1,52 @@
+import load_dataset_module
+from engine_module import RecommendationEngine
+
+
+def write_csvs(directory, ratings):
+    books_path, ratings_path = directory / 'Books.csv', directory / 'Book-Ratings.csv'
+    books_path.write_text('"ISBN";"Book-Title";"Book-Author";"Year-Of-Publication";"Publisher"\n'
+                          '"A";"Title A";"Author";"2000";"Pub"\n"B";"Title B";"Author";"2001";"Pub"\n',
+                          encoding='latin-1')
+    ratings_path.write_text('"User-ID";"ISBN";"Book-Rating"\n' +
+                            ''.join(f'"{user}";"{isbn}";"{rating}"\n' for user, isbn, rating in ratings),
+                            encoding='latin-1')
+    return str(books_path), str(ratings_path)
+
+
+RATINGS = [('1', 'A', 5), ('2', 'A', 7), ('1', 'B', 4)]
+
+
+def test_reload_swaps_the_dataset_and_in_flight_readers_keep_theirs(tmp_path):
+    books_path, ratings_path = write_csvs(tmp_path, RATINGS)
+    engine = RecommendationEngine(books_path, ratings_path, use_snapshot=False)
+    in_flight = engine.dataset
+
+    write_csvs(tmp_path, RATINGS + [('3', 'B', 9)])
+    assert engine.reload()
+    assert engine.dataset is not in_flight and engine.dataset.generation == 1
+    assert dict(engine.dataset.books['B']['ratings']) == {'1': 4, '3': 9}
+    assert dict(in_flight.books['B']['ratings']) == {'1': 4}
+    assert in_flight.store.num_ratings == 3
+
+
+def test_failed_reload_keeps_the_current_dataset(tmp_path):
+    books_path, ratings_path = write_csvs(tmp_path, RATINGS)
+    engine = RecommendationEngine(books_path, ratings_path, use_snapshot=False)
+    current = engine.dataset
+
+    (tmp_path / 'Book-Ratings.csv').unlink()
+    assert not engine.reload()
+    assert engine.dataset is current
+
+
+def test_engines_do_not_share_the_process_wide_store(tmp_path):
+    books_path, ratings_path = write_csvs(tmp_path, RATINGS)
+    shared = load_dataset_module.load_rating_store(ratings_path, use_snapshot=False)
+    first = RecommendationEngine(books_path, ratings_path, use_snapshot=False)
+    second = RecommendationEngine(books_path, ratings_path, use_snapshot=False)
+    assert len({id(shared), id(first.dataset.store), id(second.dataset.store)}) == 3
+
+    # A writer on the process-wide store leaves the engines' datasets unchanged
+    shared.add_rating('9', 'A', 1)
+    assert load_dataset_module.load_rating_store(ratings_path, use_snapshot=False) is shared
+    assert first.dataset.store.num_ratings == 3
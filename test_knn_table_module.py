@@ -0,0 +1,39 @@
+import contextlib
+import io
+
+import knn_table_module
+import similarity_module
+from rating_store_module import BookProfile, RatingStoreBuilder
+from snapshot_module import book_catalog
+
+
+def build_books(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    store = builder.build()
+    return BookProfile(store, book_catalog([(isbn, f'Title {isbn}', 'Author', '2000') for isbn in store.items]))
+
+
+RATINGS = [('1', 'A', 5), ('2', 'A', 7), ('1', 'B', 4), ('2', 'B', 8), ('3', 'B', 2), ('1', 'C', 9)]
+
+
+def test_book_added_after_build_is_not_in_table():
+    books = build_books(RATINGS)
+    table = knn_table_module.build_knn_table(books.store, k=2, min_support=1)
+    books.store.add_rating('3', 'D', 6)
+    assert table.neighbours_of('D') is None
+    assert table.neighbours_of('A') is not None
+
+
+def test_table_answers_only_its_min_support():
+    books = build_books(RATINGS)
+    table = knn_table_module.build_knn_table(books.store, k=2, min_support=2)
+    assert table.answers('cosine', 1, 2, min_support=2)
+    assert not table.answers('cosine', 1, 2, min_support=1)
+
+    # With min_support=1 the table is bypassed, so the result matches the live computation
+    with contextlib.redirect_stdout(io.StringIO()):
+        live = similarity_module.find_n_similar_books('A', 2, books, 'cosine')
+        served = similarity_module.find_n_similar_books('A', 2, books, 'cosine', knn_table=table)
+    assert served == live
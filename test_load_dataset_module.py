@@ -0,0 +1,52 @@
+import load_dataset_module
+
+
+def write_ratings(path, lines):
+    path.write_text('"User-ID";"ISBN";"Book-Rating"\n' + ''.join(line + '\n' for line in lines),
+                    encoding='ISO-8859-1')
+
+
+def test_out_of_range_ratings_are_malformed(tmp_path):
+    ratings_path = tmp_path / 'Book-Ratings.csv'
+    write_ratings(ratings_path, ['"1";"A";"5"', '"2";"A";"300"', '"3";"B";"-1"', '"4";"B";"11"', '"5";"B";"0"'])
+
+    store, stats = load_dataset_module.ingest_ratings(str(ratings_path))
+    assert stats['rows'] == 2
+    assert stats['malformed'] == 3
+    assert dict(store.book_ratings('A')) == {'1': 5}
+    assert dict(store.book_ratings('B')) == {'5': 0}
+
+
+def test_parallel_ingest_rejects_out_of_range_ratings(tmp_path):
+    ratings_path = tmp_path / 'Book-Ratings.csv'
+    write_ratings(ratings_path, ['"1";"A";"5"', '"2";"A";"300"', '"3";"B";"10"'] * 50)
+
+    store, stats = load_dataset_module.ingest_ratings_parallel(str(ratings_path), workers=2)
+    assert stats['rows'] == 100
+    assert stats['malformed'] == 50
+    assert dict(store.book_ratings('A')) == {'1': 5}
+
+
+def test_parallel_ingest_matches_serial_ingest(tmp_path):
+    ratings_path = tmp_path / 'Book-Ratings.csv'
+    # Repeated (user, book) pairs land in different byte ranges; the last rating must win in both ingests
+    lines = [f'"{user % 7}";"B{(user * 3) % 11}";"{user % 11}"' for user in range(300)]
+    write_ratings(ratings_path, lines + ['"noise"'] + lines[::-1])
+
+    serial, serial_stats = load_dataset_module.ingest_ratings(str(ratings_path))
+    parallel, parallel_stats = load_dataset_module.ingest_ratings_parallel(str(ratings_path), workers=3)
+    assert (parallel_stats['rows'], parallel_stats['malformed']) == (serial_stats['rows'], serial_stats['malformed'])
+    assert list(parallel.items) == list(serial.items)
+    assert list(parallel.users) == list(serial.users)
+    for name in ('item_ptr', 'item_users', 'item_ratings', 'user_ptr', 'user_items', 'user_ratings'):
+        assert list(getattr(parallel, name)) == list(getattr(serial, name)), name
+    for name in ('count', 'total', 'total_sq', 'mean', 'norm'):
+        assert list(getattr(parallel.item_stats, name)) == list(getattr(serial.item_stats, name)), name
+        assert list(getattr(parallel.user_stats, name)) == list(getattr(serial.user_stats, name)), name
+
+
+def test_listings_of_a_failed_load_are_empty(capsys):
+    # The loaders return empty dictionaries when the CSV files cannot be read
+    assert load_dataset_module.n_top_users(3, {}) == []
+    assert load_dataset_module.n_top_books(3, {}) == []
+    assert 'User ID' not in capsys.readouterr().out
@@ -0,0 +1,93 @@
+import json
+import random
+
+import pytest
+
+import metrics_module
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics_module, 'enabled', True)
+    metrics_module.reset()
+    yield
+    metrics_module.reset()
+
+
+def test_quantiles_stay_within_a_bucket_of_the_exact_value():
+    rng = random.Random(5)
+    values = sorted(rng.uniform(1e-5, 1e-1) for _ in range(5000))
+    histogram = metrics_module.Histogram()
+    for value in values:
+        histogram.observe(value)
+
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert exact / 2 <= histogram.quantile(q) <= exact * 2, q
+    assert histogram.quantile(0) == values[0]
+    assert histogram.quantile(1) == values[-1]
+
+
+def test_quantiles_are_clamped_to_the_observed_range():
+    histogram = metrics_module.Histogram()
+    assert histogram.quantile(0.5) == 0.0
+    for _ in range(10):
+        histogram.observe(3e-6)
+    assert histogram.quantile(0.01) == histogram.quantile(0.99) == 3e-6
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 10 and snapshot['min'] == snapshot['max'] == 3e-6
+
+
+def test_values_beyond_the_last_bucket_are_counted():
+    histogram = metrics_module.Histogram()
+    histogram.observe(1000.0)
+    assert histogram.counts[-1] == 1
+    assert histogram.quantile(0.5) == 1000.0
+
+
+def test_nothing_is_recorded_while_disabled(monkeypatch):
+    monkeypatch.setattr(metrics_module, 'enabled', False)
+    metrics_module.increment('calls')
+    metrics_module.observe('stage', 0.5)
+    with metrics_module.timer('stage'):
+        pass
+    data = metrics_module.snapshot()
+    assert data['counters'] == [] and data['histograms'] == []
+
+
+def test_json_dump(tmp_path):
+    metrics_module.increment('calls', 2, op='top-users')
+    metrics_module.increment('calls', op='top-users')
+    metrics_module.observe('stage', 0.25, metric='cosine')
+    path = tmp_path / 'metrics.json'
+    metrics_module.dump(str(path))
+
+    data = json.loads(path.read_text())
+    assert data['counters'] == [{'name': 'calls', 'labels': {'op': 'top-users'}, 'value': 3}]
+    [histogram] = data['histograms']
+    assert histogram['name'] == 'stage' and histogram['labels'] == {'metric': 'cosine'}
+    assert histogram['count'] == 1 and histogram['sum'] == 0.25 and histogram['p50'] == 0.25
+    assert len(histogram['buckets']) == len(data['bucket_bounds']) + 1
+
+
+def test_prometheus_dump(tmp_path):
+    metrics_module.increment('batch.queries', op='a"b')
+    metrics_module.observe('similarity.scoring', 3e-6, metric='cosine')
+    metrics_module.observe('similarity.scoring', 100.0, metric='cosine')
+    path = tmp_path / 'metrics.prom'
+    metrics_module.dump(str(path))
+
+    lines = path.read_text().splitlines()
+    assert '# TYPE bookrec_batch_queries_total counter' in lines
+    assert 'bookrec_batch_queries_total{op="a\\"b"} 1' in lines
+    assert '# TYPE bookrec_similarity_scoring_seconds histogram' in lines
+
+    # Buckets are cumulative, end with +Inf at the total count, and are followed by _sum and _count
+    buckets = [line for line in lines if line.startswith('bookrec_similarity_scoring_seconds_bucket')]
+    assert len(buckets) == len(metrics_module.BUCKETS) + 1
+    counts = [int(line.rsplit(' ', 1)[1]) for line in buckets]
+    assert counts == sorted(counts) and counts[0] == 0 and counts[-2] == 1
+    assert buckets[2] == 'bookrec_similarity_scoring_seconds_bucket{metric="cosine",le="4e-06"} 1'
+    assert buckets[-1] == 'bookrec_similarity_scoring_seconds_bucket{metric="cosine",le="+Inf"} 2'
+    assert 'bookrec_similarity_scoring_seconds_sum{metric="cosine"} 100.000003' in lines
+    assert 'bookrec_similarity_scoring_seconds_count{metric="cosine"} 2' in lines
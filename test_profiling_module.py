@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+
+import profiling_module
+
+
+def busy():
+    return sum(i * i for i in range(20000))
+
+
+def test_prune_keeps_the_most_recent_profiles(tmp_path):
+    for sequence in range(5):
+        for extension in profiling_module.EXTENSIONS:
+            (tmp_path / f'20260101-000000-1-{sequence:06d}-query{extension}').write_text('')
+    (tmp_path / 'notes.md').write_text('')
+
+    profiling_module.prune(str(tmp_path), 2)
+    # The cap counts queries, not files, and unrelated files are left alone
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [f'20260101-000000-1-{sequence:06d}-query{extension}'
+         for sequence in (3, 4) for extension in profiling_module.EXTENSIONS] + ['notes.md'])
+
+
+def test_profiled_queries_are_pruned_to_keep(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling_module, 'settings', None)
+    profiling_module.enable(str(tmp_path), keep=2)
+    paths = []
+    for index in range(4):
+        with profiling_module.profiled(f'query {index}') as profile:
+            busy()
+        paths.append(profile.path)
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(path) + extension for path in paths[2:] for extension in ('.pstats', '.folded'))
+
+
+def test_profiles_do_not_nest(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling_module, 'settings', profiling_module.ProfileSettings(str(tmp_path)))
+    with profiling_module.profiled('outer') as outer:
+        with profiling_module.profiled('inner') as inner:
+            busy()
+    assert inner.path is None and outer.path is not None
+
+
+def test_overlapping_samplers_restore_the_original_switch_interval():
+    original = sys.getswitchinterval()
+    first = profiling_module.StackSampler(threading.get_ident(), 0.001)
+    second = profiling_module.StackSampler(threading.get_ident(), 0.0005)
+
+    first.start()
+    assert sys.getswitchinterval() == 0.001
+    second.start()
+    assert sys.getswitchinterval() == 0.0005
+    first.stop()
+    # The second sampler still runs, so its interval stays in force
+    assert sys.getswitchinterval() == 0.0005
+    second.stop()
+    assert sys.getswitchinterval() == original
+    assert profiling_module._samplers_running == 0
+
+
+def test_sample_mode_writes_folded_stacks_and_hot_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling_module, 'settings', None)
+    profiling_module.enable(str(tmp_path), mode='sample')
+    original = sys.getswitchinterval()
+    with profiling_module.profiled('sampled') as profile:
+        for _ in range(20):
+            busy()
+
+    assert sys.getswitchinterval() == original
+    with open(profile.path + '.txt') as file:
+        assert file.readline().startswith('sampled: ')
+    assert os.path.exists(profile.path + '.folded')
@@ -0,0 +1,145 @@
+import pytest
+
+from rating_store_module import PLACEHOLDER_DETAILS, BookProfile, BookRatingsView, RatingStoreBuilder
+from snapshot_module import book_catalog
+
+
+def build_store(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    return builder.build()
+
+
+def test_ratings_view_mapping_methods():
+    store = build_store([('1', 'A', 5), ('2', 'A', 0), ('1', 'B', 8)])
+
+    book = store.book_ratings('A')
+    assert sorted(book.keys()) == ['1', '2']
+    assert sorted(book.values()) == [0, 5]
+    assert sorted(book.items()) == [('1', 5), ('2', 0)]
+
+    user = store.ratings_by_user('1')
+    assert sorted(user.keys()) == ['A', 'B']
+    assert sorted(user.values()) == [5, 8]
+    assert sorted(user.items()) == [('A', 5), ('B', 8)]
+
+
+def test_book_ratings_view_mapping_methods():
+    store = build_store([('1', 'A', 5), ('2', 'A', 0)])
+    view = BookRatingsView(store, 'A')
+    assert sorted(view.values()) == [0, 5]
+    assert sorted(view.items()) == [('1', 5), ('2', 0)]
+
+    # The view follows the store as ratings are added
+    store.add_rating('3', 'A', 7)
+    assert sorted(view.keys()) == ['1', '2', '3']
+    assert sorted(view.values()) == [0, 5, 7]
+
+
+def assert_same_ratings(store, reference):
+    assert list(store.items) == list(reference.items)
+    assert list(store.users) == list(reference.users)
+    assert store.num_ratings == reference.num_ratings
+    for isbn in reference.items:
+        assert dict(store.book_ratings(isbn)) == dict(reference.book_ratings(isbn))
+    for user_id in reference.users:
+        assert dict(store.ratings_by_user(user_id)) == dict(reference.ratings_by_user(user_id))
+    for name in ('count', 'total', 'total_sq'):
+        assert list(getattr(store.item_stats, name)) == list(getattr(reference.item_stats, name))
+        assert list(getattr(store.user_stats, name)) == list(getattr(reference.user_stats, name))
+
+
+def test_added_ratings_are_visible_before_and_after_merging():
+    triples = [(str(user), f'B{(user * 7) % 13}', user % 11) for user in range(40)]
+    store = build_store(triples)
+    explicit, implicit = store.explicit, store.implicit
+
+    added = [(str(user % 50), f'B{user % 17}', (user * 3) % 11) for user in range(60)]
+    for triple in added:
+        store.add_rating(*triple)
+    reference = build_store(triples + added)
+
+    # Row lookups see the buffered changes without merging them
+    assert store._pending_items
+    assert_same_ratings(store, reference)
+    assert_same_ratings(explicit, reference.explicit)
+    for item in range(reference.num_items):
+        assert list(implicit.item_row(item)) == list(reference.implicit.item_row(item))
+
+    # Reading a whole column does not merge them; the writer's merge does
+    assert store.columns()[0] == (reference.item_ptr, reference.item_users, reference.item_ratings)
+    assert store._pending_items
+    for data in (store, explicit, implicit):
+        data.merge()
+    assert not store._pending_items
+    for name in ('item_ptr', 'item_users', 'item_ratings', 'user_ptr', 'user_items', 'user_ratings'):
+        assert list(getattr(store, name)) == list(getattr(reference, name)), name
+        assert list(getattr(explicit, name)) == list(getattr(reference.explicit, name)), name
+    for name in ('item_ptr', 'item_users', 'user_ptr', 'user_items'):
+        assert list(getattr(implicit, name)) == list(getattr(reference.implicit, name)), name
+    assert implicit.num_interactions == reference.implicit.num_interactions
+
+
+def test_rows_held_across_an_append_stay_valid():
+    triples = [(str(user), f'B{user % 5}', user % 11) for user in range(30)]
+    store = build_store(triples)
+    ids, values = store.book_ratings('B1').row()
+    held = list(zip(ids, values))
+
+    added = [(str(user), f'B{user % 7}', 7) for user in range(20, 60)]
+    store.add_ratings(added)
+    store.merge()
+
+    # The held views still show the row as it was, and the store is intact
+    assert list(zip(ids, values)) == held
+    assert_same_ratings(store, build_store(triples + added))
+    del ids, values
+    assert_same_ratings(store, build_store(triples + added))
+
+
+def test_invalid_batch_changes_nothing():
+    store = build_store([('1', 'A', 5)])
+    version, count = store.version, list(store.item_stats.count)
+    for bad in (300, -1, 5.5, '7'):
+        try:
+            store.add_ratings([('2', 'A', 4), ('3', 'B', bad)])
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{bad!r} was accepted')
+    assert store.version == version
+    assert list(store.item_stats.count) == count
+    assert list(store.users) == ['1'] and list(store.items) == ['A']
+    assert dict(store.book_ratings('A')) == {'1': 5}
+
+
+def test_book_profile_gives_placeholders_to_uncatalogued_books():
+    store = build_store([('1', 'A', 5), ('2', 'X', 7)])
+    profile = BookProfile(store, book_catalog([('A', 'Title A', 'Ann', '1990'), ('B', 'Title B', 'Bob', '2001')]))
+
+    assert profile['A']['title'] == 'Title A' and dict(profile['A']['ratings']) == {'1': 5}
+    assert profile['B']['author'] == 'Bob' and dict(profile['B']['ratings']) == {}
+    assert (profile['X']['title'], profile['X']['author'], profile['X']['year']) == PLACEHOLDER_DETAILS
+    assert 'Z' not in profile and profile.get('Z') is None
+    with pytest.raises(KeyError):
+        profile['Z']
+
+    # Catalogued books first, in file order, then the rated books missing from the catalog
+    assert list(profile) == ['A', 'B', 'X'] and len(profile) == 3
+
+
+def test_book_profile_follows_books_rated_after_loading():
+    store = build_store([('1', 'A', 5)])
+    profile = BookProfile(store, book_catalog([('A', 'Title A', 'Ann', '1990')]))
+    assert len(profile) == 1
+
+    store.add_ratings([('2', 'Y', 3), ('3', 'A', 9)])
+    assert 'Y' in profile and profile.details('Y') == PLACEHOLDER_DETAILS
+    assert dict(profile['Y']['ratings']) == {'2': 3}
+    assert list(profile) == ['A', 'Y'] and len(profile) == 2
+
+    # Explicitly assigned entries are listed and counted too
+    profile['Z'] = {'title': 'Z', 'author': 'Zed', 'year': '2020', 'ratings': {}}
+    assert list(profile) == ['A', 'Y', 'Z'] and len(profile) == 3
+    assert list(profile.titles()) == [('A', 'Title A'), ('Y', 'N/A'), ('Z', 'Z')]
@@ -0,0 +1,51 @@
+import pytest
+
+import recommend_module
+from lru_module import LruCache
+from rating_store_module import RatingStoreBuilder, UserProfile
+
+
+def build_users(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    return UserProfile(builder.build())
+
+
+RATINGS = [('1', 'A', 8), ('1', 'B', 6), ('2', 'A', 9), ('2', 'B', 5), ('2', 'C', 9),
+           ('3', 'A', 7), ('3', 'B', 7), ('3', 'D', 2)]
+
+
+def cache_key(store, user_id):
+    return (store.users.get(user_id), recommend_module.DEFAULT_NEIGHBOURS, 'pearson', 2, None)
+
+
+def test_recommendations_follow_the_neighbours_deviations():
+    users = build_users(RATINGS)
+    # User 2 correlates perfectly with user 1; user 3's flat ratings give no correlation
+    recommended = recommend_module.recommend_for_user('1', 5, users)
+    assert recommended == [('C', pytest.approx(7 + (9 - 23 / 3)))]
+    assert recommend_module.recommend_for_user('unknown', 5, users) == []
+
+
+def test_added_ratings_drop_only_the_affected_neighbourhoods():
+    users = build_users(RATINGS)
+    store = users.store.explicit
+    cache = recommend_module.neighbourhood_cache(store)
+    for user_id in ('1', '2', '3'):
+        recommend_module.recommend_for_user(user_id, 5, users)
+    assert all(cache_key(store, user_id) in cache for user_id in ('1', '2', '3'))
+
+    # Book C is rated by users 2 and 3 only, so user 1's neighbourhood stays cached
+    users.store.add_rating('3', 'C', 10)
+    assert cache_key(store, '1') in cache
+    assert cache_key(store, '2') not in cache and cache_key(store, '3') not in cache
+
+    # Book B is rated by everyone: user 3 now correlates with user 1 and recommends D
+    users.store.add_rating('3', 'B', 3)
+    assert cache_key(store, '1') not in cache
+    recommended = recommend_module.recommend_for_user('1', 5, users)
+    assert [isbn for isbn, _ in recommended] == ['C', 'D']
+    for user_id in ('1', '2', '3'):
+        assert (recommend_module.recommend_for_user(user_id, 5, users)
+                == recommend_module.recommend_for_user(user_id, 5, users, cache=LruCache(0)))
@@ -0,0 +1,90 @@
+import asyncio
+import types
+
+import recommend_module
+import similarity_engine_module
+from engine_module import Dataset
+from rating_store_module import BookProfile, RatingStoreBuilder
+from service_module import MicroBatcher, RecommendationService
+from snapshot_module import book_catalog
+
+
+def build_dataset(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    store = builder.build()
+    catalog = book_catalog([(isbn, f'Title {isbn}', 'Author', '2000') for isbn in store.items])
+    return Dataset(BookProfile(store, catalog), {})
+
+
+RATINGS = [(str(user), f'B{(user * book) % 9}', (user + book) % 10 + 1) for user in range(12) for book in range(5)]
+
+
+def test_batches_match_unbatched_calls():
+    dataset = build_dataset(RATINGS)
+    service = RecommendationService(types.SimpleNamespace(dataset=dataset), threads=2)
+    store = dataset.store
+    similar = [(isbn, n, metric, 2 if metric == 'minkowski' else 1, 1, 'all')
+               for isbn in ('B1', 'B2', 'B3') for n in (2, 4) for metric in ('cosine', 'minkowski', 'pearson')]
+    recommend = [(str(user), n) for user in range(4) for n in (1, 3)]
+
+    async def run():
+        similar_books, recommendations = service.batchers['similar-books'], service.batchers['recommend']
+        requests = [similar_books.submit(key) for key in similar + similar[:3]]
+        requests += [recommendations.submit(key) for key in recommend] + [similar_books.submit(('B1', 3, 'x', 1, 1, 'all'))]
+        return await asyncio.gather(*requests, return_exceptions=True)
+
+    results = asyncio.run(run())
+    service.executor.shutdown()
+    for key, result in zip(similar + similar[:3], results):
+        isbn, n, metric, p, min_support, _ = key
+        expected = similarity_engine_module.top_similar_items(store, store.items.get(isbn), n, metric, p,
+                                                              min_support=min_support)
+        assert result == [{'isbn': store.items.name(other), 'score': score} for other, score in expected]
+    for (user_id, n), result in zip(recommend, results[len(similar) + 3:]):
+        expected = recommend_module.recommend_for_user(user_id, n, dataset.users)
+        assert result == [{'isbn': isbn, 'predicted_rating': predicted} for isbn, predicted in expected]
+    assert isinstance(results[-1], ValueError)
+
+    # Duplicates are answered once, and keys about the same book or user are grouped
+    assert service.batchers['similar-books'].stats()['groups'] == 3
+    assert service.batchers['recommend'].stats()['groups'] == 4
+
+
+def test_groups_share_the_batch_snapshot():
+    seen = []
+
+    def handler(state, keys):
+        seen.append((state, sorted(keys)))
+        return [key * 10 for key in keys]
+
+    async def run():
+        states = iter(['first', 'second'])
+        batcher = MicroBatcher(handler, None, window=0.01, snapshot=lambda: next(states), group=lambda key: key % 2)
+        return await asyncio.gather(*(batcher.submit(key) for key in (1, 2, 3, 3, 4)))
+
+    assert asyncio.run(run()) == [10, 20, 30, 30, 40]
+    assert sorted(seen) == [('first', [1, 3]), ('first', [2, 4])]
+
+
+def test_invalid_content_length_is_a_bad_request():
+    service = RecommendationService(types.SimpleNamespace(dataset=build_dataset(RATINGS)), threads=1)
+
+    async def request(length):
+        server = await asyncio.start_server(service.handle_connection, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET /health HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+            await writer.drain()
+            status = await reader.readline()
+            response = await reader.read()
+            writer.close()
+        return status, response
+
+    for length in ('abc', '-5'):
+        status, response = asyncio.run(request(length))
+        assert status.startswith(b'HTTP/1.1 400')
+        assert b'Connection: close' in response and b'Content-Length' in response
+    service.executor.shutdown()
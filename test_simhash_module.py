@@ -0,0 +1,31 @@
+import random
+
+from rating_store_module import RatingStoreBuilder
+from simhash_module import SimHashIndex
+
+
+def build_store(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    return builder.build()
+
+
+def test_books_added_after_the_build_fall_through_to_exact_scoring():
+    rng = random.Random(7)
+    store = build_store([(str(rng.randrange(40)), f'B{rng.randrange(30)}', rng.randrange(1, 11)) for _ in range(400)])
+    index = SimHashIndex(store, bits=64, prefilter_size=5)
+    num_rows = store.num_items
+
+    store.add_ratings([('1', 'NEW1', 8), ('2', 'NEW1', 6), ('3', 'NEW2', 4)])
+    new1, new2 = store.items.get('NEW1'), store.items.get('NEW2')
+    assert index.num_rows == num_rows
+    assert len(index.scan(0)) == num_rows
+
+    # An indexed target gets its pre-filtered books plus every newer book
+    candidates = index.candidates(0)
+    assert len(candidates) == 5 + 2 and candidates[-2:] == [new1, new2]
+    assert all(other < num_rows for other in candidates[:5])
+
+    # A newer target is compared with every rated book
+    assert index.candidates(new1) == [other for other in range(store.num_items) if other != new1]
@@ -0,0 +1,35 @@
+import random
+
+import similarity_engine_module
+from rating_store_module import RatingStoreBuilder
+
+
+def build_store(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    return builder.build()
+
+
+def ranked_from_all_scores(store, item, k, metric, p):
+    # The whole-catalogue scores, sorted the way top_similar_items ranks them
+    scores, overlaps = similarity_engine_module.score_against_all(store, item, metric, p)
+    sign = 1 if metric in similarity_engine_module.DISTANCE_METRICS else -1
+    scored = [(other, scores[other]) for other in range(store.num_items) if overlaps[other] and other != item]
+    return sorted(scored, key=lambda entry: (sign * entry[1], entry[0]))[:k]
+
+
+def test_score_against_all_matches_top_similar_items():
+    rng = random.Random(3)
+    store = build_store([(str(rng.randrange(30)), f'B{rng.randrange(25)}', rng.randrange(11)) for _ in range(300)])
+    for metric, p in (('euclidean', 1), ('cosine', 1), ('pearson', 1), ('manhattan', 1), ('minkowski', 3)):
+        for item in range(store.num_items):
+            expected = similarity_engine_module.top_similar_items(store, item, 5, metric, p)
+            assert ranked_from_all_scores(store, item, 5, metric, p) == expected, (metric, item)
+
+
+def test_score_against_all_leaves_books_without_common_raters_at_zero():
+    store = build_store([('1', 'A', 5), ('2', 'A', 7), ('1', 'B', 4), ('3', 'C', 9)])
+    scores, overlaps = similarity_engine_module.score_against_all(store, store.items.get('A'), 'cosine')
+    assert list(overlaps) == [2, 1, 0]
+    assert scores[store.items.get('C')] == 0
@@ -0,0 +1,47 @@
+import pytest
+
+import similarity_module
+from rating_store_module import BookProfile, RatingStoreBuilder, UserProfile
+from snapshot_module import book_catalog
+
+
+def build_profiles(triples):
+    builder = RatingStoreBuilder()
+    for user_id, isbn, rating in triples:
+        builder.add(user_id, isbn, rating)
+    store = builder.build()
+    catalog = book_catalog([(isbn, f'Title {isbn}', 'Author', '2000') for isbn in store.items])
+    return BookProfile(store, catalog), UserProfile(store)
+
+
+RATINGS = [('1', 'A', 5), ('2', 'A', 7), ('1', 'B', 4), ('2', 'B', 8), ('3', 'B', 2), ('1', 'C', 9)]
+
+
+def test_pair_functions_dispatch_on_the_data_type():
+    books, users = build_profiles(RATINGS)
+    assert similarity_module.euclidean_distance('A', 'B', books)[0] == pytest.approx((1 + 1) ** 0.5)
+    assert similarity_module.manhattan_distance('1', '2', users)[0] == 6
+    _, explanation = similarity_module.compare_all_metrics('A', 'B', books)
+    assert explanation.startswith('Common ratings: 2')
+
+
+def test_plain_dictionaries_are_rejected():
+    users = {'1': {'A': 5, 'B': 4}, '2': {'A': 7, 'B': 8}}
+    books = {'A': {'ratings': {'1': 5, '2': 7}}, 'B': {'ratings': {'1': 4, '2': 8}}}
+    for data, id1, id2 in ((users, '1', '2'), (books, 'A', 'B')):
+        with pytest.raises(TypeError):
+            similarity_module.euclidean_distance(id1, id2, data)
+        with pytest.raises(TypeError):
+            similarity_module.compare_all_metrics(id1, id2, data)
+
+
+def test_pair_cache_is_symmetric_and_follows_the_store_version():
+    books, _ = build_profiles(RATINGS)
+    cache = similarity_module.pair_cache(books)
+    cache.clear()
+    first = similarity_module.cosine_similarity('A', 'B', books)
+    assert similarity_module.cosine_similarity('B', 'A', books) == first
+    assert cache.stats()['hits'] == 1
+
+    books.store.add_rating('3', 'A', 9)
+    assert similarity_module.cosine_similarity('A', 'B', books) != first
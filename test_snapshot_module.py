@@ -0,0 +1,70 @@
+import os
+from array import array
+
+import snapshot_module
+
+
+def test_touched_source_refreshes_fingerprint(tmp_path, monkeypatch):
+    source = tmp_path / 'Book-Ratings.csv'
+    source.write_text('"User-ID";"ISBN";"Book-Rating"\n"1";"A";"5"\n')
+    snapshot_path = str(source) + snapshot_module.SNAPSHOT_SUFFIX
+    snapshot_module.write_snapshot(snapshot_path, str(source), {'numbers': array('q', [1, 2, 3])})
+
+    info = os.stat(source)
+    os.utime(source, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+    sections = snapshot_module.read_snapshot(snapshot_path, str(source))
+    assert list(sections['numbers']) == [1, 2, 3]
+
+    # The new modification time was recorded, so the next read does not hash the file
+    hashed = []
+    fingerprint = snapshot_module.fingerprint
+    monkeypatch.setattr(snapshot_module, 'fingerprint',
+                        lambda path, with_hash=True: hashed.append(with_hash) or fingerprint(path, with_hash))
+    sections = snapshot_module.read_snapshot(snapshot_path, str(source))
+    assert list(sections['numbers']) == [1, 2, 3]
+    assert True not in hashed
+
+
+def test_changed_source_is_stale(tmp_path):
+    source = tmp_path / 'Book-Ratings.csv'
+    source.write_text('"1";"A";"5"\n')
+    snapshot_path = str(source) + snapshot_module.SNAPSHOT_SUFFIX
+    snapshot_module.write_snapshot(snapshot_path, str(source), {'numbers': array('q', [1])})
+
+    source.write_text('"1";"A";"6"\n')
+    assert snapshot_module.read_snapshot(snapshot_path, str(source)) is None
+
+
+RECORDS = [('A', 'First', 'Ann', '1990'), ('B', 'Second', 'Bob', '2001'), ('A', 'Again', 'Ann', '1991'),
+           ('C', 'Élan', 'Cé', '0')]
+
+
+def check_catalog(catalog):
+    # A repeated ISBN keeps its first position but its last record
+    assert list(catalog) == ['A', 'B', 'C']
+    assert len(catalog) == 3
+    assert catalog.details('A') == ('Again', 'Ann', '1991')
+    assert catalog.details('C') == ('Élan', 'Cé', '0')
+    assert list(catalog.records()) == [['A', 'Again', 'Ann', '1991'], ['B', 'Second', 'Bob', '2001'],
+                                       ['C', 'Élan', 'Cé', '0']]
+    assert 'B' in catalog and 'D' not in catalog and 'AB' not in catalog and '' not in catalog
+    assert catalog.details('D') is None and catalog.details('€') is None and catalog.index(None) is None
+
+
+def test_book_catalog_lookups():
+    check_catalog(snapshot_module.book_catalog(RECORDS))
+
+
+def test_book_catalog_lookups_from_a_snapshot(tmp_path):
+    source = tmp_path / 'Books.csv'
+    source.write_text('placeholder\n')
+    snapshot_path = str(source) + snapshot_module.SNAPSHOT_SUFFIX
+    snapshot_module.save_books_snapshot(snapshot_path, str(source), RECORDS)
+    check_catalog(snapshot_module.load_books_snapshot(snapshot_path, str(source)))
+
+
+def test_book_catalog_with_many_books():
+    records = [(f'{index:010d}', f'Title {index}', 'Author', '2000') for index in range(5000)]
+    catalog = snapshot_module.book_catalog(records)
+    assert all(catalog.details(isbn) == (title, author, year) for isbn, title, author, year in records)
+    assert catalog.details('0000005000') is None
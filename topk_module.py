@@ -0,0 +1,78 @@
+import heapq
+from itertools import count
+
+
+class TopK:
+    """
+    Bounded heap that keeps the k best (key, score) entries seen so far in O(k) memory.
+
+    Ties go to the entry pushed first, so the results match a stable full sort cut to k entries.
+
+    Parameters:
+    - k (int): The number of entries to keep.
+    - largest (bool): True to keep the highest scores (similarities), False for the lowest (distances).
+    """
+
+    def __init__(self, k, largest=True):
+        self.k = max(k, 0)
+        self.sign = 1 if largest else -1
+        self.heap = []
+        self.sequence = count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    @property
+    def full(self):
+        return len(self.heap) >= self.k
+
+    def threshold(self):
+        """
+        Return the score a new entry has to beat to get in, or None while the heap is not full.
+        """
+        if not self.full or not self.heap:
+            return None
+        return self.sign * self.heap[0][0]
+
+    def could_enter(self, bound):
+        """
+        Return whether an entry whose score can at best reach bound could still make the top k.
+        """
+        if self.k == 0:
+            return False
+        if not self.full:
+            return True
+        return self.sign * bound > self.heap[0][0]
+
+    def push(self, key, score):
+        """
+        Offer an entry; return True if it is (for now) in the top k.
+        """
+        if self.k == 0:
+            return False
+        # Earlier entries get larger tie-breakers, so they win ties against later ones
+        entry = (self.sign * score, -next(self.sequence), key)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            return True
+        if entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        return False
+
+    def results(self):
+        """
+        Return the kept entries as (key, score) tuples, best first.
+        """
+        return [(key, self.sign * signed_score) for signed_score, _, key in sorted(self.heap, reverse=True)]
+
+
+def top_k(iterable, k, key=None, largest=True):
+    """
+    Return the k best items of an iterable in O(k) memory, best first.
+
+    Equivalent to sorted(iterable, key=key, reverse=largest)[:k], including the order of ties.
+    """
+    if largest:
+        return heapq.nlargest(k, iterable, key=key)
+    return heapq.nsmallest(k, iterable, key=key)